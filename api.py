@@ -0,0 +1,274 @@
+"""Headless HTTP API for the video knowledge base (no Streamlit required)
+
+    GET    /health              liveness check
+    GET    /videos              list stored videos
+    POST   /videos              {"url", "remove_fillers"?, "summarize"?} add a video
+    DELETE /videos/<id>         delete a video
+    POST   /ask                 {"video", "question", "stream"?, "model"?, "context"?, "top_k"?, "extractive"?}
+
+/ask answers as JSON, or as server-sent events ("data: {"content": ...}" lines
+ending with "data: [DONE]") when "stream" is true. With "extractive" (or when no
+endpoint is configured) it answers locally with timestamped transcript passages. The store, semantic index,
+endpoint pool and admission limiter are shared with the Streamlit UI.
+"""
+import argparse
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from utils.coalesce import coalesced_stream_chat
+from utils.extractive_qa import extract_passages, format_extractive_answer
+from utils.ingest import IngestError, ingest_video
+from utils.llm_client import DEFAULT_ENDPOINT, DEFAULT_MODEL, complete_chat
+from utils.llm_metrics import configure_metrics_log
+from utils.semantic_index import remove_video_from_indexes
+from utils.video_artifacts import artifacts_dir_for, get_artifacts, question_context, remove_artifacts
+from utils.video_store import find_video, read_videos, remove_video, video_key
+
+APP_BASE_DIR = Path(sys.executable).parent if getattr(sys, 'frozen', False) else Path(__file__).parent.resolve()
+DEFAULT_PORT = 8600
+MAX_BODY_BYTES = 1024 * 1024
+MAX_TOP_K = 20
+
+
+class ApiConfig:
+    """Settings shared by all request handlers of one server"""
+
+    def __init__(self, data_path: Path, endpoint: str, model: str):
+        self.data_path = Path(data_path)
+        self.index_dir = self.data_path.parent / "semantic_index"
+        self.artifacts_dir = artifacts_dir_for(self.data_path)
+        self.endpoint = endpoint
+        self.model = model
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_top_k(body: dict, default: int) -> int:
+    """'top_k' from a request body as an int in 1..MAX_TOP_K"""
+    value = body.get("top_k", default)
+    try:
+        top_k = int(value) if isinstance(value, (int, str)) and not isinstance(value, bool) else None
+    except ValueError:
+        top_k = None
+    if top_k is None or not 1 <= top_k <= MAX_TOP_K:
+        raise ApiError(400, f"'top_k' must be an integer between 1 and {MAX_TOP_K}")
+    return top_k
+
+
+def video_summary(video: dict) -> dict:
+    return {
+        "id": video_key(video),
+        "title": video.get("title"),
+        "url": video.get("url"),
+        "timestamp": video.get("timestamp"),
+        "tokens": video.get("tokens"),
+    }
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: ApiConfig = None
+
+    def log_message(self, format, *args):
+        print(f"[API] {self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "Request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            raise ApiError(400, f"Invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        return body
+
+    def _dispatch(self, routes: dict):
+        path = urlparse(self.path).path.rstrip('/') or '/'
+        try:
+            for prefix, handler in routes.items():
+                if prefix.endswith('/') and path.startswith(prefix):
+                    return handler(unquote(path[len(prefix):]))
+                if path == prefix:
+                    return handler()
+            raise ApiError(404, f"Not found: {path}")
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._dispatch({"/health": self.get_health, "/videos": self.list_videos})
+
+    def do_POST(self):
+        self._dispatch({"/videos": self.add_video, "/ask": self.ask})
+
+    def do_DELETE(self):
+        self._dispatch({"/videos/": self.delete_video})
+
+    def get_health(self):
+        self._send_json(200, {"status": "ok"})
+
+    def list_videos(self):
+        videos = read_videos(self.config.data_path)
+        self._send_json(200, {"videos": [video_summary(video) for video in videos]})
+
+    def add_video(self):
+        body = self._read_json()
+        if not body.get("url"):
+            raise ApiError(400, "'url' is required")
+        try:
+            entry = ingest_video(
+                body["url"],
+                self.config.data_path,
+                self.config.index_dir,
+                self.config.endpoint,
+                self.config.model,
+                remove_fillers=body.get("remove_fillers", True),
+                summarize=body.get("summarize", True)
+            )
+        except IngestError as e:
+            raise ApiError(422, str(e))
+        self._send_json(201, {"video": video_summary(entry), "normalization": entry.get("normalization")})
+
+    def delete_video(self, key: str):
+        videos = read_videos(self.config.data_path)
+        if not key or find_video(videos, key) is None:
+            raise ApiError(404, f"Unknown video: {key}")
+        remove_video(self.config.data_path, key)
+        remove_video_from_indexes(self.config.index_dir, key)
+        remove_artifacts(self.config.artifacts_dir, key)
+        self._send_json(200, {"deleted": key})
+
+    def ask(self):
+        body = self._read_json()
+        question = (body.get("question") or "").strip()
+        if not question:
+            raise ApiError(400, "'question' is required")
+        video = find_video(read_videos(self.config.data_path), str(body.get("video", "")))
+        if video is None:
+            raise ApiError(404, f"Unknown video: {body.get('video')}")
+
+        extractive = body.get("extractive") or not self.config.endpoint
+        top_k = parse_top_k(body, 3 if extractive else 5)
+        if extractive:
+            artifacts = get_artifacts(self.config.artifacts_dir, video)
+            segment_map = video.get("segments") if "normalization" in video else None
+            passages = extract_passages(artifacts, question, k=top_k, segment_map=segment_map)
+            self._send_json(200, {
+                "answer": format_extractive_answer(artifacts, passages),
+                "passages": passages,
+                "metrics": None
+            })
+            return
+
+        model = body.get("model") or self.config.model
+        context = question_context(
+            get_artifacts(self.config.artifacts_dir, video),
+            question,
+            self.config.index_dir,
+            self.config.endpoint,
+            model,
+            passages=body.get("context") == "passages",
+            k=top_k
+        )
+
+        collected = []
+        if not body.get("stream"):
+            answer = complete_chat(question, context, self.config.endpoint, model, on_metrics=collected.append)
+            metrics = collected[-1].to_dict() if collected else None
+            self._send_json(200, {"answer": answer, "metrics": metrics})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        stream = coalesced_stream_chat(question, context, self.config.endpoint, model, on_metrics=collected.append)
+        try:
+            for chunk in stream:
+                self._send_event({"content": chunk})
+            if collected:
+                self._send_event({"metrics": collected[-1].to_dict()})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass    # Client went away; closing the generator cancels the upstream request
+        except Exception as e:
+            # The status line is already sent: report the error inside the event stream
+            # instead of letting _dispatch write a second response
+            try:
+                self._send_event({"error": str(e)})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except OSError:
+                pass
+        finally:
+            stream.close()
+
+    def _send_event(self, body: dict):
+        self.wfile.write(f"data: {json.dumps(body, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+
+def create_server(host: str, port: int, config: ApiConfig) -> ThreadingHTTPServer:
+    configure_metrics_log(config.data_path.parent / "llm_metrics.jsonl")
+    handler = type("ConfiguredApiHandler", (ApiHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(host: str, port: int, config: ApiConfig) -> ThreadingHTTPServer:
+    """Serve the API from a daemon thread (used when running next to the UI)"""
+    server = create_server(host, port, config)
+    threading.Thread(target=server.serve_forever, name="api-server", daemon=True).start()
+    return server
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Headless API for YouTube Video Chat")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--data", default=str(APP_BASE_DIR / "video_data.json"), help="Path to video_data.json")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT,
+                        help="LLM endpoint URL(s), separated by commas")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Model name used for API calls")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    config = ApiConfig(args.data, args.endpoint, args.model)
+    server = create_server(args.host, args.port, config)
+    print(f"[INFO] API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
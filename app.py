@@ -4,6 +4,11 @@
 YouTube Chat Application Setup & Start Script
 """
 
+import argparse
+import contextlib
+import json
+import logging
+import logging.handlers
 import os
 import re
 import socket
@@ -13,6 +18,7 @@ import time
 import webbrowser
 import atexit
 import tempfile
+import threading
 import traceback
 
 # 在模块级检查是否是子进程（通过环境变量）
@@ -72,39 +78,112 @@ def ensure_venv_in_path():
             return True
     return False
 
+LAUNCHER_CACHE_FILE = '.launcher_cache.json'   # 工具检查结果缓存（项目根目录）
+REQUIREMENTS_STAMP_FILE = '.requirements_stamp.json'  # 依赖安装记录（虚拟环境目录内，删除 venv 即失效）
+
+def _read_json_file(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_json_file(path, data):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+    except OSError as e:
+        print(f"[WARNING] Could not write {path}: {e}")
+
+def _tool_fingerprint(executable):
+    """工具可执行文件的路径与修改时间；找不到时返回 None"""
+    import shutil
+    path = shutil.which(executable)
+    if not path:
+        return None
+    try:
+        return f"{os.path.realpath(path)}:{os.path.getmtime(path)}"
+    except OSError:
+        return None
+
+def _tool_available(executable):
+    """检查工具是否可用；结果按可执行文件路径和修改时间缓存，未变化时不再启动子进程"""
+    fingerprint = _tool_fingerprint(executable)
+    if fingerprint is None:
+        return False
+    cache_path = os.path.join(get_project_root(), LAUNCHER_CACHE_FILE)
+    cache = _read_json_file(cache_path)
+    if cache.get('tools', {}).get(executable) == fingerprint:
+        return True
+    try:
+        subprocess.check_call([executable, '--version'], stdout=subprocess.PIPE)
+    except (subprocess.CalledProcessError, OSError):
+        return False
+    cache.setdefault('tools', {})[executable] = fingerprint
+    _write_json_file(cache_path, cache)
+    return True
+
+_checked_tools = set()
+
 def check_python():
     """检查 Python（仅在开发环境中）"""
     # 打包后的 exe 不需要检查 Python，因为已经打包了 Python 运行时
-    if getattr(sys, 'frozen', False):
+    if getattr(sys, 'frozen', False) or 'python' in _checked_tools:
         return
     
-    try:
-        subprocess.check_call(['python', '--version'], stdout=subprocess.PIPE)
+    if _tool_available('python') or _tool_available('python3'):
         print("[SUCCESS] Python found")
-    except subprocess.CalledProcessError:
+        _checked_tools.add('python')
+    else:
         print("[ERROR] Python is not installed or not in PATH. Please install Python 3.8+ first.")
         sys.exit(1)
 
 def check_uv():
     """检查 uv（仅在开发环境中）"""
     # 打包后的 exe 不需要检查 uv，因为所有依赖都已打包
-    if getattr(sys, 'frozen', False):
+    if getattr(sys, 'frozen', False) or 'uv' in _checked_tools:
         return
     
-    try:
-        subprocess.check_call(['uv', '--version'], stdout=subprocess.PIPE)
+    if _tool_available('uv'):
         print("[SUCCESS] uv found")
-    except subprocess.CalledProcessError:
+    else:
         print("[WARNING] uv is not installed. Installing uv...")
         try:
             subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'uv'])
             print("[SUCCESS] uv installed successfully")
-        except subprocess.CalledProcessError:
+        except (subprocess.CalledProcessError, OSError):
             print("[ERROR] Failed to install uv. Please install it manually with: pip install uv")
             sys.exit(1)
+    _checked_tools.add('uv')
+
+def requirements_stamp(req_file, venv_path):
+    """依赖状态指纹：requirements 文件哈希 + 虚拟环境解释器版本 + 虚拟环境路径"""
+    import hashlib
+    with open(req_file, 'rb') as f:
+        req_hash = hashlib.sha256(f.read()).hexdigest()
+    # pyvenv.cfg 中记录了虚拟环境的解释器版本，读取它比启动解释器快得多
+    interpreter = None
+    try:
+        with open(os.path.join(venv_path, 'pyvenv.cfg'), 'r', encoding='utf-8') as f:
+            for line in f:
+                key, _, value = line.partition('=')
+                if key.strip() in ('version', 'version_info'):
+                    interpreter = value.strip()
+                    break
+    except OSError:
+        pass
+    return {
+        'requirements': os.path.basename(req_file),
+        'requirements_sha256': req_hash,
+        'interpreter': interpreter,
+        'venv_path': os.path.normcase(os.path.abspath(venv_path)),
+    }
 
-def check_virtual_env():
-    """检查并创建虚拟环境（仅在开发环境中）"""
+def check_virtual_env(force_install=False):
+    """检查并创建虚拟环境（仅在开发环境中）
+    
+    依赖只在 requirements 文件、解释器版本或虚拟环境路径变化时安装（或 force_install）。
+    """
     # 打包后的 exe 不需要虚拟环境，因为所有依赖都已打包
     if getattr(sys, 'frozen', False):
         print("[INFO] Running as packaged exe, skipping virtual environment setup")
@@ -131,6 +210,11 @@ def check_virtual_env():
     # 优先使用 requirements_all.txt，如果不存在则使用 requirements.txt
     req_file = os.path.join(project_root, 'requirements_all.txt') if os.path.exists(os.path.join(project_root, 'requirements_all.txt')) else os.path.join(project_root, 'requirements.txt')
     if os.path.exists(req_file):
+        stamp_path = os.path.join(venv_path, REQUIREMENTS_STAMP_FILE)
+        stamp = requirements_stamp(req_file, venv_path)
+        if venv_exists and not force_install and _read_json_file(stamp_path) == stamp:
+            print(f"[SUCCESS] Dependencies up to date ({os.path.basename(req_file)} unchanged), skipping install")
+            return
         if venv_exists:
             print(f"[INFO] Virtual environment found. Installing/updating dependencies from {req_file}...")
         else:
@@ -140,6 +224,7 @@ def check_virtual_env():
             # Use uv pip install with the virtual environment
             subprocess.check_call(['uv', 'pip', 'install', '-r', req_file])
             print("[SUCCESS] All dependencies installed using uv")
+            _write_json_file(stamp_path, stamp)
         except subprocess.CalledProcessError as e:
             print(f"[WARNING] uv pip install failed: {e}")
             print("[INFO] Trying alternative method with pip...")
@@ -151,6 +236,7 @@ def check_virtual_env():
                     pip_path = os.path.join(venv_path, 'bin', 'pip')
                 subprocess.check_call([pip_path, 'install', '-r', req_file])
                 print("[SUCCESS] All dependencies installed using pip")
+                _write_json_file(stamp_path, stamp)
             except Exception as e2:
                 print(f"[ERROR] pip install also failed: {e2}")
     else:
@@ -230,33 +316,200 @@ def check_required_files():
     
     print(f"[SUCCESS] All {len(found_files)} required files found")
 
-def get_streamlit_port(log_file='streamlit.log', max_wait=30, default_port=8501):
-    """Detect the actual port Streamlit is running on by reading the log file"""
-    # Try to read from log file
-    for i in range(max_wait):
-        if os.path.exists(log_file):
+# Streamlit 日志轮转设置（main() 根据命令行参数更新）
+LOG_SETTINGS = {
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 3,
+    'level': 'info',
+}
+LOG_LEVEL_ENV = 'YTCHAT_LOG_LEVEL'   # 传给 main.py 的日志级别
+LIMITER_SHARE_ENV = 'YTCHAT_LIMITER_SHARE'   # 分摊 LLM 端点并发预算的进程数（utils/admission.py）
+
+class RotatingLogWriter(logging.handlers.RotatingFileHandler):
+    """类文件对象：把原始输出（print、子进程 stdout）写入按大小和数量轮转的日志文件"""
+    
+    def __init__(self, path, max_bytes=None, backup_count=None):
+        super().__init__(
+            path,
+            maxBytes=LOG_SETTINGS['max_bytes'] if max_bytes is None else max_bytes,
+            backupCount=LOG_SETTINGS['backup_count'] if backup_count is None else backup_count,
+            encoding='utf-8',
+            errors='ignore'
+        )
+    
+    def write(self, text):
+        if not isinstance(text, str):
+            # 与文本流一致：click 等库用 write(b'') 判断是否为二进制流
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        if not text:
+            return 0
+        self.acquire()
+        try:
+            if self.shouldRollover(logging.makeLogRecord({'msg': text})):
+                self.doRollover()
+            self.stream.write(text)
+            self.stream.flush()  # 启动器实时读取日志中的端口和计时标记
+        except (OSError, ValueError):
+            pass  # 日志写入失败不能影响 Streamlit 本身
+        finally:
+            self.release()
+        return len(text)
+    
+    def rollover_if_full(self):
+        """日志已达到上限时立即轮转（启动前调用，使本次启动从新文件开始）"""
+        self.acquire()
+        try:
+            if self.maxBytes > 0 and os.path.exists(self.baseFilename) \
+                    and os.path.getsize(self.baseFilename) >= self.maxBytes:
+                self.doRollover()
+        finally:
+            self.release()
+    
+    def isatty(self):
+        return False
+    
+    def fileno(self):
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.fileno()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def prepare_launch_log(log_file):
+    """启动前准备日志：必要时轮转，并记录本次启动日志的起始位置"""
+    log_dir = os.path.dirname(log_file)
+    if log_dir and not os.path.exists(log_dir):
+        os.makedirs(log_dir, exist_ok=True)
+    with RotatingLogWriter(log_file) as writer:
+        writer.rollover_if_full()
+    remember_log_offset(log_file)
+
+def pump_output(stream, writer):
+    """把子进程的输出逐行写入轮转日志（在后台线程中运行）"""
+    try:
+        for line in iter(stream.readline, b''):
+            writer.write(line.decode('utf-8', errors='ignore'))
+    except (OSError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+STREAMLIT_PORT_RE = re.compile(
+    r'(?:Local URL:\s*http://[^:]+:|Network URL:\s*http://[^:]+:|http://localhost:|http://127\.0\.0\.1:)(\d+)'
+)
+# 子进程绑定端口失败（端口在检查之后被其他进程抢占）时的日志
+PORT_TAKEN_RE = re.compile(r'Port \d+ is (?:not available|already in use)|Address already in use')
+PORT_TAKEN_RETRIES = 2
+
+# 每个日志文件本次启动前的大小（只扫描本次启动写入的内容）
+_log_launch_offsets = {}
+
+def remember_log_offset(log_file):
+    """记录日志文件当前大小，作为本次启动的起始位置"""
+    try:
+        _log_launch_offsets[os.path.abspath(log_file)] = os.path.getsize(log_file)
+    except OSError:
+        _log_launch_offsets[os.path.abspath(log_file)] = 0
+
+class LogTail:
+    """增量读取日志：记住读取位置，每次只读取新增的字节"""
+    
+    def __init__(self, path, offset=None):
+        self.path = path
+        # 默认从本次启动记录的位置开始；没有记录时从文件末尾开始
+        if offset is None:
+            offset = _log_launch_offsets.get(os.path.abspath(path))
+        if offset is None:
             try:
-                with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    # Look for port patterns in streamlit output
-                    # Pattern: "Local URL: http://localhost:8501" or "Network URL: http://192.168.x.x:8501"
-                    patterns = [
-                        r'Local URL:\s*http://[^:]+:(\d+)',
-                        r'Network URL:\s*http://[^:]+:(\d+)',
-                        r'http://localhost:(\d+)',
-                        r'http://127\.0\.0\.1:(\d+)',
-                    ]
-                    for pattern in patterns:
-                        matches = re.findall(pattern, content)
-                        if matches:
-                            port = int(matches[-1])  # Get the last match (most recent)
-                            # Verify port is actually in use
-                            if is_port_in_use(port):
-                                return port
-            except Exception as e:
-                pass
-        
-        time.sleep(1)
+                offset = os.path.getsize(path)
+            except OSError:
+                offset = 0
+        self.offset = offset
+        self._partial = b''
+        self._inode = self._file_id()
+    
+    def _file_id(self):
+        try:
+            return os.stat(self.path).st_ino
+        except OSError:
+            return None
+    
+    def read_lines(self):
+        """返回自上次读取以来新增的完整行"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        inode = self._file_id()
+        if size < self.offset or inode != self._inode:
+            # 文件被截断或轮转，从头开始
+            self.offset = 0
+            self._partial = b''
+            self._inode = inode
+        if size == self.offset:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        self.offset += len(data)
+        data = self._partial + data
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+        return [line.decode('utf-8', errors='ignore') for line in lines]
+    
+    def find(self, pattern):
+        """在新增的行中查找第一个匹配，返回 match 或 None"""
+        for line in self.read_lines():
+            match = pattern.search(line)
+            if match:
+                return match
+        return None
+
+def tail_lines(path, count=100, block_size=8192):
+    """从文件末尾向前读取最后 count 行（不读取整个文件）"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b''
+            while position > 0 and data.count(b'\n') <= count:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+    except OSError:
+        return []
+    lines = data.decode('utf-8', errors='ignore').split('\n')
+    return [line for line in lines[-count - 1:] if line.strip()][-count:]
+
+def print_log_tail(log_file, count=100):
+    """打印日志文件的最后几行"""
+    lines = tail_lines(log_file, count)
+    if lines:
+        print(f"[INFO] Last {count} lines of log:")
+        for line in lines:
+            print(f"  {line}")
+
+def get_streamlit_port(log_file='streamlit.log', max_wait=30, default_port=8501):
+    """Detect the actual port Streamlit is running on by reading the log file
+    
+    只扫描本次启动写入的新内容（增量读取），找到第一个端口即返回
+    """
+    tail = LogTail(log_file)
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        # Pattern: "Local URL: http://localhost:8501" or "Network URL: http://192.168.x.x:8501"
+        match = tail.find(STREAMLIT_PORT_RE)
+        if match:
+            port = int(match.group(1))
+            # Verify port is actually in use
+            if is_port_in_use(port):
+                return port
+        time.sleep(0.25)
     
     # Fallback: try common streamlit ports
     for port in range(default_port, default_port + 5):
@@ -276,39 +529,286 @@ def is_port_in_use(port, host='localhost'):
         except:
             return False
 
+def _find_port_process_linux(port):
+    """Linux：从 /proc/net/tcp(6) 找到监听该端口的 socket inode，再在 /proc/<pid>/fd 中查找所属进程"""
+    inodes = set()
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table, 'r') as f:
+                next(f, None)  # 跳过表头
+                for line in f:
+                    fields = line.split()
+                    # fields[1] = 本地地址:端口（十六进制），fields[3] = 状态（0A = LISTEN），fields[9] = inode
+                    if len(fields) > 9 and fields[3] == '0A' and int(fields[1].rsplit(':', 1)[1], 16) == port:
+                        inodes.add(f'socket:[{fields[9]}]')
+        except OSError:
+            continue
+    if not inodes:
+        return None
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        fd_dir = f'/proc/{pid}/fd'
+        try:
+            for fd in os.listdir(fd_dir):
+                if os.readlink(os.path.join(fd_dir, fd)) in inodes:
+                    return pid
+        except OSError:
+            continue  # 进程已退出或无权限
+    return None
+
+def _find_port_process_windows(port):
+    """Windows：通过 iphlpapi.GetExtendedTcpTable 查询监听该端口的进程（无需 netstat 子进程）"""
+    import ctypes
+    from ctypes import wintypes
+    
+    class MIB_TCPROW_OWNER_PID(ctypes.Structure):
+        _fields_ = [
+            ('dwState', wintypes.DWORD),
+            ('dwLocalAddr', wintypes.DWORD),
+            ('dwLocalPort', wintypes.DWORD),
+            ('dwRemoteAddr', wintypes.DWORD),
+            ('dwRemotePort', wintypes.DWORD),
+            ('dwOwningPid', wintypes.DWORD),
+        ]
+    
+    AF_INET = 2
+    TCP_TABLE_OWNER_PID_LISTENER = 3
+    get_table = ctypes.windll.iphlpapi.GetExtendedTcpTable
+    size = wintypes.DWORD(0)
+    get_table(None, ctypes.byref(size), False, AF_INET, TCP_TABLE_OWNER_PID_LISTENER, 0)
+    buffer = ctypes.create_string_buffer(size.value)
+    if get_table(buffer, ctypes.byref(size), False, AF_INET, TCP_TABLE_OWNER_PID_LISTENER, 0) != 0:
+        return None
+    count = wintypes.DWORD.from_buffer(buffer).value
+    rows = ctypes.cast(
+        ctypes.byref(buffer, ctypes.sizeof(wintypes.DWORD)),
+        ctypes.POINTER(MIB_TCPROW_OWNER_PID * count)
+    ).contents
+    for row in rows:
+        # 端口以网络字节序存放在低 16 位
+        if socket.ntohs(row.dwLocalPort & 0xFFFF) == port:
+            return str(row.dwOwningPid)
+    return None
+
+def _find_port_process_lsof(port):
+    """macOS 等其他平台：使用 lsof 查询监听该端口的进程"""
+    result = subprocess.run(
+        ['lsof', '-nP', f'-iTCP:{port}', '-sTCP:LISTEN', '-t'],
+        capture_output=True,
+        text=True,
+        timeout=5
+    )
+    pids = result.stdout.split()
+    return pids[0] if pids else None
+
 def find_port_process(port):
-    """查找占用指定端口的进程（Windows）"""
+    """查找占用指定端口的进程，返回 PID（字符串）或 None"""
     try:
-        import subprocess
-        # 使用 netstat 查找占用端口的进程
-        result = subprocess.run(
-            ['netstat', '-ano'],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore'
-        )
-        for line in result.stdout.split('\n'):
-            if f':{port}' in line and 'LISTENING' in line:
-                parts = line.split()
-                if len(parts) >= 5:
-                    pid = parts[-1]
-                    return pid
+        if sys.platform == 'win32':
+            return _find_port_process_windows(port)
+        if sys.platform.startswith('linux') and os.path.exists('/proc/net/tcp'):
+            return _find_port_process_linux(port)
+        return _find_port_process_lsof(port)
+    except Exception:
         return None
-    except:
+
+def try_reserve_port(port, host=''):
+    """尝试绑定并监听端口：成功时返回占住端口的 socket，失败返回 None
+    
+    绑定选项与 Streamlit（tornado）一致：POSIX 上允许 TIME_WAIT 端口重用，
+    Windows 上使用独占绑定。POSIX 上必须 listen：只绑定不监听的 SO_REUSEADDR socket
+    挡不住其他进程绑定同一端口。
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        if sys.platform == 'win32':
+            sock.setsockopt(socket.SOL_SOCKET, getattr(socket, 'SO_EXCLUSIVEADDRUSE', -5), 1)
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(1)
+        return sock
+    except OSError:
+        sock.close()
         return None
 
-def find_available_port(start_port=8501, max_attempts=10):
-    """查找下一个可用的端口"""
-    port = start_port
-    for _ in range(max_attempts):
-        if not is_port_in_use(port):
-            return port
-        port += 1
-    return None  # 如果找不到可用端口，返回 None
+def reserve_port(preferred_port=8501, max_attempts=30):
+    """查找一个可用端口：依次尝试 preferred_port 起的端口，最后由系统分配
+    
+    返回 (port, socket)；socket 在选端口期间占住端口，调用方在启动 Streamlit 前一刻关闭它。
+    这只是尽力而为的检查：关闭之后到子进程绑定之前，端口仍可能被其他进程抢占，
+    因此 start_streamlit 在子进程报告端口被占用时换端口重试。
+    """
+    for port in range(preferred_port, preferred_port + max_attempts + 1):
+        sock = try_reserve_port(port)
+        if sock:
+            return port, sock
+    sock = try_reserve_port(0)
+    if sock:
+        return sock.getsockname()[1], sock
+    return None, None
+
+STARTUP_PROFILE_FILE = 'startup_profile.json'
+STARTUP_PROFILE_RE = re.compile(r'\[STREAMLIT_PROFILE\] (\w+) ([\d.]+)')
+
+class StartupProfile:
+    """记录启动各阶段耗时（单调时钟），每次启动写入 startup_profile.json"""
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.phases = []
+        self._open = []   # 正在计时的阶段（用于记录嵌套关系）
+    
+    @contextlib.contextmanager
+    def phase(self, name):
+        """计时一个启动阶段（with 语句）"""
+        start = time.monotonic()
+        self._open.append(name)
+        try:
+            yield
+        finally:
+            self._open.pop()
+            self.record(name, time.monotonic() - start)
+    
+    def record(self, name, seconds, process='launcher'):
+        parent = self._open[-1] if self._open else None
+        self.phases.append({'name': name, 'seconds': round(seconds, 3), 'process': process, 'parent': parent})
+    
+    def record_child_markers(self, log_file):
+        """从 Streamlit 日志中读取子进程输出的计时标记（本次启动写入的部分）"""
+        for line in LogTail(log_file).read_lines():
+            match = STARTUP_PROFILE_RE.search(line)
+            if match:
+                self.record(match.group(1), float(match.group(2)), process='streamlit')
+    
+    def to_dict(self):
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'frozen': bool(getattr(sys, 'frozen', False)),
+            'platform': sys.platform,
+            'python': sys.version.split()[0],
+            'total_s': round(time.monotonic() - self.started, 3),
+            'phases': self.phases,
+            'log_offsets': dict(_log_launch_offsets),  # 本次启动日志在各日志文件中的起始位置
+        }
+    
+    def write(self, path):
+        profile = self.to_dict()
+        _write_json_file(path, profile)
+        return profile
+    
+    def print_summary(self, profile, top=3):
+        """打印总耗时和最慢的几个阶段（只比较不含子阶段的阶段，避免重复计算）"""
+        total = profile['total_s']
+        parents = {phase['parent'] for phase in profile['phases']}
+        leaves = [phase for phase in profile['phases'] if phase['name'] not in parents]
+        slowest = sorted(leaves, key=lambda phase: -phase['seconds'])[:top]
+        print(f"[INFO] Startup took {total:.1f}s. Slowest phases:")
+        for phase in slowest:
+            share = f" ({phase['seconds'] / total:.0%})" if total > 0 else ""
+            label = f"{phase['name']} [{phase['process']}]" if phase['process'] != 'launcher' else phase['name']
+            print(f"    {label}: {phase['seconds']:.2f}s{share}")
+
+# 本次启动的计时记录（main() 开始时重置）
+startup_profile = StartupProfile()
+
+IMPORT_PROFILE_FILE = 'import_profile.json'
+IMPORT_PROFILE_ENV = 'YTCHAT_PROFILE_IMPORTS'   # 设置后 Streamlit 子进程输出每个模块的导入耗时
+# python -X importtime 的输出格式：自身耗时 | 累计耗时 | 缩进表示嵌套层级的模块名（单位微秒）
+IMPORT_TIME_RE = re.compile(r'import time:\s*(\d+) \|\s*(\d+) \| ( *)(\S+)')
+
+def read_import_times(log_file):
+    """从日志中读取本次启动子进程输出的导入耗时"""
+    modules = []
+    for line in LogTail(log_file).read_lines():
+        match = IMPORT_TIME_RE.search(line)
+        if match:
+            modules.append({
+                'module': match.group(4),
+                'self_ms': int(match.group(1)) / 1000,
+                'cumulative_ms': int(match.group(2)) / 1000,
+                'depth': len(match.group(3)) // 2,
+            })
+    return modules
+
+def write_import_profile(path, log_files):
+    """按进程汇总导入耗时（每个模块及按顶层包合计），写入 import_profile.json"""
+    processes = {}
+    for log_file in log_files:
+        modules = read_import_times(log_file)
+        if not modules:
+            continue
+        packages = {}
+        for module in modules:
+            package = packages.setdefault(module['module'].split('.')[0], {'self_ms': 0.0, 'modules': 0})
+            package['self_ms'] += module['self_ms']
+            package['modules'] += 1
+        processes[os.path.splitext(os.path.basename(log_file))[0]] = {
+            'total_ms': round(sum(module['self_ms'] for module in modules), 1),
+            'packages': sorted(({'package': name, 'self_ms': round(package['self_ms'], 1), 'modules': package['modules']}
+                                for name, package in packages.items()), key=lambda package: -package['self_ms']),
+            'modules': sorted(modules, key=lambda module: -module['self_ms']),
+        }
+    profile = {
+        'written_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'frozen': bool(getattr(sys, 'frozen', False)),
+        'processes': processes,
+    }
+    _write_json_file(path, profile)
+    return profile
+
+def print_import_profile(profile, top=10):
+    """打印每个进程导入最慢的几个顶层包"""
+    if not profile['processes']:
+        print("[WARNING] No import times found in the Streamlit logs")
+    for name, process in profile['processes'].items():
+        print(f"[INFO] Imports in {name}: {process['total_ms'] / 1000:.2f}s. Slowest packages:")
+        for package in process['packages'][:top]:
+            print(f"    {package['package']}: {package['self_ms']:.0f}ms ({package['modules']} modules)")
+
+STREAMLIT_READY_TIMEOUT = 60      # 慢机器（或打包后首次解压）也足够
+STREAMLIT_HEALTH_PATHS = ('/_stcore/health', '/healthz')  # 新版 / 旧版 Streamlit
+
+def probe_streamlit_health(port, host='127.0.0.1', timeout=1.0):
+    """请求 Streamlit 健康检查端点，返回 True 表示服务已就绪"""
+    import urllib.request
+    import urllib.error
+    for path in STREAMLIT_HEALTH_PATHS:
+        try:
+            with urllib.request.urlopen(f'http://{host}:{port}{path}', timeout=timeout) as response:
+                if response.status == 200:
+                    return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                continue  # 旧版本没有该路径，尝试下一个
+            return False
+        except (urllib.error.URLError, OSError):
+            return False
+    return False
+
+def wait_for_streamlit_ready(port, process=None, timeout=STREAMLIT_READY_TIMEOUT):
+    """以指数退避探测健康检查端点，直到就绪、进程退出或超时
+
+    返回 True 表示就绪；进程提前退出或超时返回 False。
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        if probe_streamlit_health(port):
+            return True
+        if process is not None and not _process_is_alive(process):
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
 
 # 模块级别的函数，用于 multiprocessing（Windows 需要）
-def run_streamlit_process_worker(streamlit_path, temp_script_path, log_file_path, env):
+def run_streamlit_process_worker(streamlit_path, temp_script_path, log_file_path, env,
+                                 max_bytes=None, backup_count=None):
     """在獨立進程中執行 Streamlit 啟動腳本"""
     try:
         # 設置環境變量
@@ -326,7 +826,8 @@ def run_streamlit_process_worker(streamlit_path, temp_script_path, log_file_path
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir, exist_ok=True)
         
-        with open(log_file_path, 'a', encoding='utf-8', errors='ignore') as log_file:
+        # 按大小轮转的日志（每次写入后立即 flush，启动器实时读取端口和计时标记）
+        with RotatingLogWriter(log_file_path, max_bytes, backup_count) as log_file:
             original_stdout = sys.stdout
             original_stderr = sys.stderr
             try:
@@ -389,70 +890,74 @@ def check_process_status(process_name, process):
         return_code = _process_exit_code(process)
         return f"{process_name}: Exited with code {return_code} (PID: {getattr(process, 'pid', 'N/A')})"
 
+def _terminate_process(proc):
+    """终止一个 multiprocessing.Process 或 subprocess.Popen（先 terminate，超时后 kill）"""
+    # 检查是否是 multiprocessing.Process（使用 is_alive()）还是 subprocess.Popen（使用 poll()）
+    if hasattr(proc, 'is_alive'):
+        if proc.is_alive():  # multiprocessing.Process
+            try:
+                proc.terminate()
+                proc.join(timeout=2)
+            except:
+                try:
+                    proc.kill()
+                    proc.join(timeout=1)
+                except:
+                    pass
+    elif hasattr(proc, 'poll'):
+        if proc.poll() is None:  # subprocess.Popen
+            try:
+                proc.terminate()
+                proc.wait(timeout=2)
+            except:
+                try:
+                    proc.kill()
+                except:
+                    pass
+
 def cleanup_processes():
     """清理已启动的进程（在程序退出时调用）"""
     global _started_processes
     for name, proc in _started_processes.items():
         if proc:
-            # 检查是否是 multiprocessing.Process（使用 is_alive()）还是 subprocess.Popen（使用 poll()）
-            if hasattr(proc, 'is_alive'):
-                if proc.is_alive():  # multiprocessing.Process
-                    try:
-                        proc.terminate()
-                        proc.join(timeout=2)
-                    except:
-                        try:
-                            proc.kill()
-                            proc.join(timeout=1)
-                        except:
-                            pass
-            elif hasattr(proc, 'poll'):
-                if proc.poll() is None:  # subprocess.Popen
-                    try:
-                        proc.terminate()
-                        proc.wait(timeout=2)
-                    except:
-                        try:
-                            proc.kill()
-                        except:
-                            pass
+            _terminate_process(proc)
 
 # 注册退出时的清理函数
 atexit.register(cleanup_processes)
 
-def start_streamlit():
-    """启动 Streamlit 服务"""
+def start_streamlit(open_browser=True, name='streamlit', preferred_port=8501, port_retries=PORT_TAKEN_RETRIES):
+    """启动 Streamlit 服务（监控模式重启时不再打开浏览器）
+    
+    name 区分多个工作进程（--workers）：进程记录在 _started_processes[name]，
+    日志写入 <name>.log（打包后为 <name>_debug.log）。
+    子进程因端口已被占用而退出时，从下一个端口起重新选择并重试（最多 port_retries 次）。
+    """
     # 检查是否在打包后的 exe 中运行
     is_frozen = getattr(sys, 'frozen', False)
     
     # 检查服务是否已经在运行（通过端口检查）
     global _started_processes, _started_threads
     
-    # 检查 Streamlit 端口是否被占用（默认 8501）
-    streamlit_default_port = 8501
-    streamlit_already_running = is_port_in_use(streamlit_default_port)
-    
-    # 如果默认端口被占用，查找下一个可用端口
-    streamlit_port = streamlit_default_port
-    if streamlit_already_running:
+    # 选择 Streamlit 端口（默认 8501，被占用时顺延，最后由系统分配）
+    # 通过绑定检测而不是连接探测，并占住端口直到启动 Streamlit 前一刻（尽力而为，见 reserve_port）
+    streamlit_default_port = preferred_port
+    with startup_profile.phase('reserve_port'):
+        streamlit_port, port_reservation = reserve_port(streamlit_default_port, max_attempts=30)
+    if streamlit_port is None:
+        print("[ERROR] Could not find an available port. Please close some processes and try again.")
+        return None
+    if streamlit_port != streamlit_default_port:
         print(f"[WARNING] Port {streamlit_default_port} (Streamlit) is already in use.")
         pid = find_port_process(streamlit_default_port)
         if pid:
             print(f"[INFO] Process ID using port {streamlit_default_port}: {pid}")
-            print(f"[INFO] Finding next available port...")
         else:
-            print("[INFO] Could not find the process ID. Finding next available port...")
-        
-        # 查找下一个可用端口
-        available_port = find_available_port(start_port=streamlit_default_port + 1, max_attempts=30)
-        if available_port:
-            streamlit_port = available_port
-            print(f"[INFO] Found available port: {streamlit_port}")
-        else:
-            print("[ERROR] Could not find an available port. Please close some processes and try again.")
-            return None
+            print("[INFO] Could not find the process ID.")
+        print(f"[INFO] Found available port: {streamlit_port}")
     
     print("[INFO] Starting Streamlit UI in background...")
+    spawn_started = time.monotonic()
+    launch_log = None
     
     # 根据是否打包选择不同的启动方式
     if is_frozen:
@@ -513,6 +1018,11 @@ def start_streamlit():
 # This script is executed by the exe to start Streamlit in a child process
 import sys
 import os
+import time
+# Time from the launcher spawning this process until the script runs (wall clock across processes)
+_launch_time = os.environ.get('STREAMLIT_LAUNCH_TIME')
+if _launch_time:
+    print(f"[STREAMLIT_PROFILE] child_bootstrap {{max(0.0, time.time() - float(_launch_time)):.3f}}")
 # Print debug information
 print("[STREAMLIT_STARTUP] Starting Streamlit startup script...")
 print(f"[STREAMLIT_STARTUP] Python executable: {{sys.executable}}")
@@ -529,6 +1039,36 @@ if hasattr(sys, '_MEIPASS'):
         sys.path.insert(0, sys._MEIPASS)
     print(f"[STREAMLIT_STARTUP] Added sys._MEIPASS to path: {{sys._MEIPASS}}")
 print(f"[STREAMLIT_STARTUP] sys.path (first 3): {{sys.path[:3]}}")
+# Import-time profiling (launcher --profile-imports), printed in the python -X importtime format.
+# The frozen interpreter ignores PYTHONPROFILEIMPORTTIME, so imports are timed through builtins.__import__;
+# submodules loaded by importlib.import_module or a from-import are counted in the importing module.
+if os.environ.get('{IMPORT_PROFILE_ENV}') == '1':
+    import builtins
+    import importlib.util
+    import threading
+    _original_import = builtins.__import__
+    _import_state = threading.local()
+    def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = name
+        if level:
+            try:
+                module_name = importlib.util.resolve_name('.' * level + name, (globals or {{}}).get('__package__'))
+            except (ImportError, ValueError):
+                pass
+        if module_name in sys.modules:
+            return _original_import(name, globals, locals, fromlist, level)
+        stack = _import_state.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return _original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            sys.stderr.write(f"import time: {{int((elapsed - children) * 1e6):>9}} | {{int(elapsed * 1e6):>10}} | {{'  ' * len(stack)}}{{module_name}}\\n")
+    builtins.__import__ = _timed_import
 # Patch importlib.metadata before importing streamlit
 print("[STREAMLIT_STARTUP] Patching importlib.metadata...")
 import importlib.metadata
@@ -544,7 +1084,9 @@ importlib.metadata.version = patched_version
 # Import and run streamlit
 print("[STREAMLIT_STARTUP] Importing streamlit...")
 try:
+    _import_started = time.perf_counter()
     import streamlit.web.cli as stcli
+    print(f"[STREAMLIT_PROFILE] import_streamlit_cli {{time.perf_counter() - _import_started:.3f}}")
     print("[STREAMLIT_STARTUP] Streamlit imported successfully")
 except Exception as e:
     print(f"[STREAMLIT_STARTUP] ERROR: Failed to import streamlit: {{e}}")
@@ -574,7 +1116,8 @@ sys.argv = [
     'streamlit', 'run', streamlit_path,
     '--server.headless', 'true',
     '--global.developmentMode', 'false',
-    '--server.port', str(streamlit_port)
+    '--server.port', str(streamlit_port),
+    '--logger.level', {LOG_SETTINGS['level']!r}
 ]
 print(f"[STREAMLIT_STARTUP] sys.argv set to: {{sys.argv}}")
 # Run streamlit (this will block)
@@ -598,7 +1141,7 @@ except Exception as e:
             
             try:
                 # 检查是否已经有Streamlit进程在运行
-                if 'streamlit' in _started_processes and _process_is_alive(_started_processes['streamlit']):
+                if name in _started_processes and _process_is_alive(_started_processes[name]):
                     print("[WARNING] Streamlit process already running, skipping startup")
                     # 清理临时脚本
                     try:
@@ -612,6 +1155,8 @@ except Exception as e:
                     env = os.environ.copy()
                     env['STREAMLIT_CHILD_PROCESS'] = '1'
                     env['STREAMLIT_CHILD_MARKER'] = child_marker
+                    env['STREAMLIT_LAUNCH_TIME'] = repr(time.time())  # 子进程据此计算启动耗时
+                    env[LOG_LEVEL_ENV] = LOG_SETTINGS['level']
                     # 设置 PYTHONPATH 确保能找到打包的模块
                     if hasattr(sys, '_MEIPASS'):
                         if 'PYTHONPATH' in env:
@@ -619,13 +1164,10 @@ except Exception as e:
                         else:
                             env['PYTHONPATH'] = sys._MEIPASS
                     
-                    # 創建日志文件路径
-                    log_file_path = os.path.join(get_project_root(), 'streamlit_debug.log')
-                    log_dir = os.path.dirname(log_file_path)
-                    if log_dir and not os.path.exists(log_dir):
-                        os.makedirs(log_dir, exist_ok=True)
-                    # 確保日志文件存在
-                    open(log_file_path, 'a', encoding='utf-8').close()
+                    # 創建日志文件路径（必要时先轮转，并记录本次启动的起始位置）
+                    log_file_path = os.path.join(get_project_root(), f'{name}_debug.log')
+                    prepare_launch_log(log_file_path)
+                    launch_log = log_file_path
                     print(f"[DEBUG] Streamlit log file: {log_file_path}")
                     
                     # 打印启动信息
@@ -636,9 +1178,11 @@ except Exception as e:
                     print(f"  Working directory: {os.path.dirname(streamlit_path) if os.path.dirname(streamlit_path) else os.getcwd()}")
                     
                     import multiprocessing
+                    port_reservation.close()  # 释放端口，交给 Streamlit 绑定
                     streamlit_process = multiprocessing.Process(
                         target=run_streamlit_process_worker,
-                        args=(streamlit_path, temp_script, log_file_path, env),
+                        args=(streamlit_path, temp_script, log_file_path, env,
+                              LOG_SETTINGS['max_bytes'], LOG_SETTINGS['backup_count']),
                         name='StreamlitProcess'
                     )
                     streamlit_process.start()
@@ -647,35 +1191,9 @@ except Exception as e:
                     print(f"[DEBUG] Streamlit file: {streamlit_path}")
                     print(f"[DEBUG] Log file: {log_file_path}")
                     
-                    _started_processes['streamlit'] = streamlit_process
+                    _started_processes[name] = streamlit_process
                     print("[SUCCESS] Streamlit UI started in background process")
                     
-                    # 等待一下，检查进程是否真的启动了
-                    time.sleep(2)
-                    
-                    # 检查进程状态（multiprocessing.Process 使用 is_alive()）
-                    if not _process_is_alive(streamlit_process):
-                        # 进程已经退出
-                        return_code = _process_exit_code(streamlit_process)
-                        print(f"[ERROR] Streamlit process exited immediately with code: {return_code}")
-                        if os.path.exists(log_file_path):
-                            print(f"[INFO] Check log file for details: {log_file_path}")
-                            try:
-                                with open(log_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                    log_content = f.read()
-                                    if log_content:
-                                        print("[INFO] Last 50 lines of log:")
-                                        lines = log_content.split('\n')
-                                        for line in lines[-50:]:
-                                            if line.strip():
-                                                print(f"  {line}")
-                            except Exception as e:
-                                print(f"[WARNING] Could not read log file: {e}")
-                        else:
-                            print("[WARNING] Logging is disabled, cannot check error details")
-                        return None
-                    else:
-                        print(f"[DEBUG] Streamlit process is running, PID: {streamlit_process.pid}")
             except Exception as e:
                 print(f"[ERROR] Failed to start Streamlit process: {e}")
                 import traceback
@@ -692,30 +1210,48 @@ except Exception as e:
     else:
         # 开发环境，使用 uv run
         # 检查是否已经有Streamlit进程在运行
-        if 'streamlit' not in _started_processes or not _process_is_alive(_started_processes['streamlit']):
-            # 创建日志文件路径
-            log_file_path = os.path.join(get_project_root(), 'streamlit.log')
-            log_dir = os.path.dirname(log_file_path)
-            if log_dir and not os.path.exists(log_dir):
-                os.makedirs(log_dir, exist_ok=True)
-            
+        if name not in _started_processes or not _process_is_alive(_started_processes[name]):
+            # 创建日志文件路径（必要时先轮转，并记录本次启动的起始位置）
+            log_file_path = os.path.join(get_project_root(), f'{name}.log')
+            prepare_launch_log(log_file_path)
+            launch_log = log_file_path
+            streamlit_command = [
+                'uv', 'run', 'streamlit', 'run', 'main.py', '--server.headless', 'true',
+                '--server.port', str(streamlit_port), '--logger.level', LOG_SETTINGS['level']
+            ]
+            env = os.environ.copy()
+            env['PYTHONUNBUFFERED'] = '1'  # 输出经管道写入日志，不缓冲才能及时读到端口
+            env[LOG_LEVEL_ENV] = LOG_SETTINGS['level']
+            if env.get(IMPORT_PROFILE_ENV) == '1':
+                env['PYTHONPROFILEIMPORTTIME'] = '1'  # 相当于 python -X importtime，输出到 stderr（即日志）
+            port_reservation.close()  # 释放端口，交给 Streamlit 绑定
             try:
-                with open(log_file_path, 'a', encoding='utf-8') as log_file:
-                    _started_processes['streamlit'] = subprocess.Popen(
-                        ['uv', 'run', 'streamlit', 'run', 'main.py', '--server.headless', 'true', '--server.port', str(streamlit_port)],
-                        stdout=log_file,
-                        stderr=subprocess.STDOUT
-                    )
+                # 输出经管道由后台线程写入轮转日志（直接把文件交给子进程将无法轮转）
+                log_writer = RotatingLogWriter(log_file_path)
+                _started_processes[name] = subprocess.Popen(
+                    streamlit_command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    env=env
+                )
+                _started_threads[f'{name}_log'] = threading.Thread(
+                    target=pump_output,
+                    args=(_started_processes[name].stdout, log_writer),
+                    name=f'{name}-log',
+                    daemon=True
+                )
+                _started_threads[f'{name}_log'].start()
                 print(f"[SUCCESS] Streamlit UI started in background on port {streamlit_port} (logs: {log_file_path})")
             except Exception as e:
                 print(f"[ERROR] Failed to start Streamlit: {e}")
                 # Fallback: 不使用日志
                 try:
                     devnull = open(os.devnull, 'w')
-                    _started_processes['streamlit'] = subprocess.Popen(
-                        ['uv', 'run', 'streamlit', 'run', 'main.py', '--server.headless', 'true', '--server.port', str(streamlit_port)],
+                    _started_processes[name] = subprocess.Popen(
+                        streamlit_command,
                         stdout=devnull,
-                        stderr=devnull
+                        stderr=devnull,
+                        env=env
                     )
                     print(f"[SUCCESS] Streamlit UI started in background on port {streamlit_port} (logging disabled)")
                 except Exception as e2:
@@ -724,70 +1260,47 @@ except Exception as e:
         else:
             print("[WARNING] Streamlit process already running, skipping startup")
     
-    # 等待 Streamlit 启动
-    print("[INFO] Waiting for Streamlit to start...")
-    time.sleep(5)  # 给 Streamlit 一些时间启动
-    
-    # 检查 Streamlit 进程是否还在运行
-    if is_frozen and 'streamlit' in _started_processes:
-        streamlit_process = _started_processes['streamlit']
-        if not streamlit_process.is_alive():
-            # 进程已退出
-            return_code = streamlit_process.exitcode
-            print(f"[ERROR] Streamlit process exited with code: {return_code}")
-            log_file_path = os.path.join(get_project_root(), 'streamlit_debug.log')
-            if os.path.exists(log_file_path):
-                print(f"[INFO] Check log file for details: {log_file_path}")
-                try:
-                    with open(log_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        log_content = f.read()
-                        if log_content:
-                            print("[INFO] Last 50 lines of log:")
-                            lines = log_content.split('\n')
-                            for line in lines[-50:]:
-                                if line.strip():
-                                    print(f"  {line}")
-                except Exception as e:
-                    print(f"[WARNING] Could not read log file: {e}")
-            return None
-        else:
-            print(f"[DEBUG] Streamlit process is still running, PID: {streamlit_process.pid}")
+    port_reservation.close()  # 启动失败或跳过启动时同样释放
+    startup_profile.record('spawn_streamlit', time.monotonic() - spawn_started)
     
-    print(f"[INFO] Detecting Streamlit port (expected: {streamlit_port})...")
-    # 使用日志文件路径
-    log_file = os.path.join(get_project_root(), 'streamlit.log')
-    if not os.path.exists(log_file):
-        log_file = os.path.join(get_project_root(), 'streamlit_debug.log')
+    # 等待 Streamlit 就绪：探测健康检查端点（指数退避 + 总超时），就绪后立即打开浏览器
+    print(f"[INFO] Waiting for Streamlit to become ready on port {streamlit_port}...")
+    streamlit_process = _started_processes.get(name)
+    wait_started = time.monotonic()
+    final_port = None
+    if wait_for_streamlit_ready(streamlit_port, streamlit_process):
+        final_port = streamlit_port
+        print(f"[SUCCESS] Streamlit is ready after {time.monotonic() - wait_started:.1f}s")
+    startup_profile.record('streamlit_ready', time.monotonic() - wait_started)
+    if launch_log:
+        startup_profile.record_child_markers(launch_log)
+    
+    # 使用本次启动的日志文件路径
+    log_file = launch_log or os.path.join(get_project_root(), f'{name}.log')
     
-    # 尝试多次检测端口
-    max_attempts = 10
-    detected_port = None
-    for attempt in range(max_attempts):
-        # 首先检查我们设置的端口是否在使用
-        if is_port_in_use(streamlit_port):
-            detected_port = streamlit_port
-            print(f"[SUCCESS] Streamlit is running on port {detected_port}")
-            break
-        # 如果设置的端口不在使用，尝试从日志中读取
-        detected_port = get_streamlit_port(log_file=log_file)
-        if detected_port and is_port_in_use(detected_port):
+    if not final_port and _process_is_alive(streamlit_process):
+        # 进程仍在运行但预期端口未就绪：从日志中读取实际端口
+        with startup_profile.phase('detect_port_from_log'):
+            detected_port = get_streamlit_port(log_file=log_file, max_wait=5)
+            detected_ready = detected_port != streamlit_port and wait_for_streamlit_ready(detected_port, streamlit_process, timeout=5)
+        if detected_ready:
             print(f"[SUCCESS] Streamlit is running on port {detected_port} (detected from log)")
-            streamlit_port = detected_port  # 更新为检测到的端口
-            break
-        else:
-            print(f"[INFO] Attempt {attempt + 1}/{max_attempts}: Port {streamlit_port} not ready yet...")
-            time.sleep(2)
+            final_port = detected_port
     
-    # 使用检测到的端口或设置的端口
-    final_port = detected_port if detected_port else streamlit_port
+    if not final_port and port_retries > 0 and streamlit_process is not None \
+            and not _process_is_alive(streamlit_process) \
+            and any(PORT_TAKEN_RE.search(line) for line in LogTail(log_file).read_lines()):
+        # 端口在检查之后、子进程绑定之前被其他进程抢占：换一个端口重试
+        print(f"[WARNING] Port {streamlit_port} was taken before Streamlit could bind it, retrying on another port...")
+        return start_streamlit(open_browser=open_browser, name=name, preferred_port=streamlit_port + 1,
+                               port_retries=port_retries - 1)
     
-    if not final_port or not is_port_in_use(final_port):
-        print("[ERROR] Could not detect Streamlit port or port is not in use")
+    if not final_port:
+        print("[ERROR] Streamlit did not become ready")
         print("[INFO] Checking process status...")
-        if is_frozen and 'streamlit' in _started_processes:
-            streamlit_process = _started_processes['streamlit']
-            if not streamlit_process.is_alive():
-                print(f"[ERROR] Streamlit process has exited with code: {streamlit_process.exitcode}")
+        if streamlit_process is not None:
+            if not _process_is_alive(streamlit_process):
+                print(f"[ERROR] Streamlit process has exited with code: {_process_exit_code(streamlit_process)}")
             else:
                 print(f"[INFO] Streamlit process is still running (PID: {streamlit_process.pid})")
                 print("[INFO] But port is not listening. This might indicate:")
@@ -798,27 +1311,277 @@ except Exception as e:
         # 尝试读取日志
         if os.path.exists(log_file):
             print(f"[INFO] Reading log file: {log_file}")
-            try:
-                with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    log_content = f.read()
-                    if log_content:
-                        print("[INFO] Last 100 lines of log:")
-                        lines = log_content.split('\n')
-                        for line in lines[-100:]:
-                            if line.strip():
-                                print(f"  {line}")
-            except Exception as e:
-                print(f"[WARNING] Could not read log file: {e}")
+            print_log_tail(log_file, 100)
         
         return None
     
     streamlit_url = f'http://localhost:{final_port}'
     print(f"[SUCCESS] Streamlit is running on port {final_port}")
-    print(f"[INFO] Opening browser at {streamlit_url}...")
-    webbrowser.open(streamlit_url)
+    if open_browser:
+        print(f"[INFO] Opening browser at {streamlit_url}...")
+        webbrowser.open(streamlit_url)
     
     return final_port
 
+SUPERVISOR_INTERVAL = 5.0           # 检查间隔（秒）
+SUPERVISOR_HEALTH_FAILURES = 3      # 连续健康检查失败次数达到后视为卡死并重启
+SUPERVISOR_BACKOFF_MIN = 1.0
+SUPERVISOR_BACKOFF_MAX = 60.0
+SUPERVISOR_STABLE_SECONDS = 120     # 重启后稳定运行这么久，退避时间恢复为最小值
+SUPERVISOR_CPU_WARN_PERCENT = 90.0
+SUPERVISOR_STATE_FILE = 'supervisor_state.json'
+
+def _linux_process_stats():
+    """读取 /proc/<pid>/stat：返回 {pid: (ppid, cpu_seconds, rss_bytes)}"""
+    ticks = os.sysconf('SC_CLK_TCK')
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    stats = {}
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue  # 进程已退出
+        # 进程名可能包含空格和括号，从最后一个 ')' 之后开始解析
+        fields = data[data.rfind(b')') + 2:].split()
+        # fields[1] = ppid，fields[11]/[12] = utime/stime（时钟节拍），fields[21] = rss（页数）
+        stats[int(pid)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * page_size)
+    return stats
+
+def process_tree_usage(pid):
+    """进程及其所有子进程的 (内存 RSS 字节数, 累计 CPU 秒数)；不支持时返回 None
+    
+    开发环境中 Streamlit 运行在 uv 的子进程里，所以需要统计整棵进程树。
+    优先使用 psutil（如已安装），否则在 Linux 上读取 /proc。
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        rss = cpu = 0
+        for process in processes:
+            try:
+                rss += process.memory_info().rss
+                times = process.cpu_times()
+                cpu += times.user + times.system
+            except psutil.Error:
+                continue  # 子进程在统计期间退出
+        return rss, cpu
+    if not os.path.exists('/proc/self/stat'):
+        return None
+    stats = _linux_process_stats()
+    if pid not in stats:
+        return None
+    rss = cpu = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        _, current_cpu, current_rss = stats[current]
+        rss += current_rss
+        cpu += current_cpu
+        pending.extend(child for child, (ppid, _, _) in stats.items() if ppid == current)
+    return rss, cpu
+
+def _descendant_pids(pid):
+    """进程的所有子孙进程 PID（不支持时返回空列表）"""
+    try:
+        import psutil
+        return [child.pid for child in psutil.Process(pid).children(recursive=True)]
+    except ImportError:
+        pass
+    except Exception:
+        return []
+    if not os.path.exists('/proc/self/stat'):
+        return []
+    stats = _linux_process_stats()
+    descendants, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        children = [child for child, (ppid, _, _) in stats.items() if ppid == current]
+        descendants.extend(children)
+        pending.extend(children)
+    return descendants
+
+def stop_streamlit(name='streamlit'):
+    """停止 Streamlit 进程及其子进程（uv run 启动的 streamlit 是 uv 的子进程）"""
+    process = _started_processes.get(name)
+    if process is None:
+        return
+    descendants = _descendant_pids(process.pid) if process.pid else []
+    _terminate_process(process)
+    if sys.platform != 'win32':
+        import signal
+        for pid in descendants:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass  # 已随父进程退出
+
+class StreamlitSupervisor:
+    """监控 Streamlit 子进程：存活、健康检查端点、内存（RSS）和 CPU
+    
+    进程退出、健康检查连续失败或内存超过上限时按指数退避重启，
+    重启次数按原因记录在 supervisor_state.json 中（每个工作进程一项）。
+    on_restart(port) 在重启成功后调用（例如更新反向代理中该工作进程的端口）。
+    """
+    
+    def __init__(self, port, max_rss_mb=0, interval=SUPERVISOR_INTERVAL, name='streamlit', on_restart=None):
+        self.name = name
+        self.on_restart = on_restart
+        self.port = port
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.interval = interval
+        self.backoff = SUPERVISOR_BACKOFF_MIN
+        self.started = time.monotonic()
+        self.health_failures = 0
+        self.cpu_sample = None          # (时间, CPU 秒数)，用于计算 CPU 占用率
+        self.cpu_high_samples = 0
+        self.usage_supported = True
+        self.restarts = {'crash': 0, 'unhealthy': 0, 'memory': 0}
+        self.last_restart = None
+        self.state_path = os.path.join(get_project_root(), SUPERVISOR_STATE_FILE)
+    
+    def check(self):
+        """检查一次；需要重启时返回原因（'crash' / 'unhealthy' / 'memory'），否则返回 None"""
+        process = _started_processes.get(self.name)
+        if not _process_is_alive(process):
+            print(f"[ERROR] Streamlit process {self.name} exited with code {_process_exit_code(process)}")
+            return 'crash'
+        
+        if probe_streamlit_health(self.port, timeout=2.0):
+            self.health_failures = 0
+        else:
+            self.health_failures += 1
+            print(f"[WARNING] Streamlit {self.name} health check failed "
+                  f"({self.health_failures}/{SUPERVISOR_HEALTH_FAILURES})")
+            if self.health_failures >= SUPERVISOR_HEALTH_FAILURES:
+                return 'unhealthy'
+        
+        usage = process_tree_usage(process.pid) if self.usage_supported else None
+        if usage is None:
+            if self.usage_supported:
+                print("[WARNING] Memory/CPU monitoring unavailable (install psutil to enable it on this platform)")
+                self.usage_supported = False
+        else:
+            rss, cpu_seconds = usage
+            now = time.monotonic()
+            if self.cpu_sample is not None and now > self.cpu_sample[0]:
+                cpu_percent = 100.0 * (cpu_seconds - self.cpu_sample[1]) / (now - self.cpu_sample[0])
+                self.cpu_high_samples = self.cpu_high_samples + 1 if cpu_percent >= SUPERVISOR_CPU_WARN_PERCENT else 0
+                if self.cpu_high_samples == 3:
+                    print(f"[WARNING] Streamlit {self.name} has used {cpu_percent:.0f}% CPU "
+                          f"for {3 * self.interval:.0f}s")
+            self.cpu_sample = (now, cpu_seconds)
+            if self.max_rss_bytes and rss > self.max_rss_bytes:
+                print(f"[WARNING] Streamlit {self.name} memory {rss / 1024 / 1024:.0f} MB exceeds the "
+                      f"{self.max_rss_bytes / 1024 / 1024:.0f} MB limit")
+                return 'memory'
+        
+        # 稳定运行一段时间后，下次重启重新从最小退避开始
+        if time.monotonic() - self.started >= SUPERVISOR_STABLE_SECONDS:
+            self.backoff = SUPERVISOR_BACKOFF_MIN
+        return None
+    
+    def restart(self, reason):
+        self.restarts[reason] += 1
+        self.last_restart = {'reason': reason, 'at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self.write_state()
+        print(f"[INFO] Restarting Streamlit {self.name} ({reason}) in {self.backoff:.0f}s "
+              f"(restart #{sum(self.restarts.values())})")
+        stop_streamlit(self.name)
+        time.sleep(self.backoff)
+        self.backoff = min(self.backoff * 2, SUPERVISOR_BACKOFF_MAX)
+        port = start_streamlit(open_browser=False, name=self.name, preferred_port=self.port)
+        if port:
+            self.port = port
+            print(f"[SUCCESS] Streamlit {self.name} restarted on port {port}")
+            if self.on_restart:
+                self.on_restart(port)
+        self.started = time.monotonic()
+        self.health_failures = 0
+        self.cpu_sample = None
+        self.cpu_high_samples = 0
+    
+    def write_state(self):
+        state = _read_json_file(self.state_path)
+        state[self.name] = {
+            'port': self.port,
+            'restarts': self.restarts,
+            'total_restarts': sum(self.restarts.values()),
+            'last_restart': self.last_restart,
+        }
+        _write_json_file(self.state_path, state)
+
+def run_supervisors(supervisors, interval=SUPERVISOR_INTERVAL):
+    """监控循环（所有工作进程轮流检查），直到 Ctrl+C"""
+    if supervisors:
+        _write_json_file(supervisors[0].state_path, {})  # 清除上次启动的记录
+    for supervisor in supervisors:
+        supervisor.write_state()
+    while True:
+        time.sleep(interval)
+        for supervisor in supervisors:
+            reason = supervisor.check()
+            if reason:
+                supervisor.restart(reason)
+
+def start_streamlit_workers(count, public_port=8501, open_browser=True, budget_share=None):
+    """启动 count 个 Streamlit 工作进程，并在 public_port 上启动粘性会话反向代理
+    
+    每个工作进程是独立的解释器，会话分散到多个进程上并行执行；
+    所有进程共用同一份磁盘数据（video_data.json、语义索引、artifacts），这些数据都通过文件锁在进程间同步。
+    准入限流器、端点池和请求合并是每个进程各自一份：限流器的并发上限按 budget_share
+    （默认 count，即分摊预算的进程数）平分，所有工作进程加起来不超过单进程的预算；
+    相同问题的合并只在同一个工作进程内生效。
+    返回 (代理端口, 代理, 工作进程名列表)；失败时代理端口为 None。
+    """
+    import secrets
+    # 工作进程继承环境变量，各自的限流器只取预算的 1/budget_share
+    os.environ[LIMITER_SHARE_ENV] = str(budget_share or count)
+    # 所有工作进程使用同一个 cookie 密钥，XSRF cookie 在各进程之间通用
+    os.environ['STREAMLIT_SERVER_COOKIE_SECRET'] = secrets.token_hex(32)
+    proxy_port, proxy_reservation = reserve_port(public_port, max_attempts=30)
+    if proxy_port is None:
+        print("[ERROR] Could not find an available port for the proxy.")
+        return None, None, []
+    
+    names, ports = [], []
+    next_port = max(proxy_port, public_port) + 1
+    for i in range(count):
+        name = f'streamlit_{i + 1}'
+        print(f"[INFO] Starting Streamlit worker {i + 1}/{count}...")
+        port = start_streamlit(open_browser=False, name=name, preferred_port=next_port)
+        if port is None:
+            print(f"[ERROR] Streamlit worker {i + 1} did not start")
+            continue
+        names.append(name)
+        ports.append(port)
+        next_port = port + 1
+    proxy_reservation.close()
+    if not ports:
+        return None, None, []
+    
+    from utils.local_proxy import start_proxy_in_thread
+    try:
+        proxy = start_proxy_in_thread(ports, proxy_port)
+    except OSError as e:
+        print(f"[ERROR] Failed to start the proxy on port {proxy_port}: {e}")
+        return None, None, names
+    print(f"[SUCCESS] Proxy on port {proxy_port} -> {len(ports)} Streamlit workers (ports {', '.join(map(str, ports))})")
+    if open_browser:
+        streamlit_url = f'http://localhost:{proxy_port}'
+        print(f"[INFO] Opening browser at {streamlit_url}...")
+        webbrowser.open(streamlit_url)
+    return proxy_port, proxy, names
+
 def get_project_root():
     """Get the project root directory, handling both script and exe execution
     
@@ -850,7 +1613,69 @@ def get_project_root():
     
     return project_root
 
-def main():
+def parse_launcher_args(argv=None):
+    """解析启动器参数（未知参数忽略，避免打包后的子进程参数导致退出）"""
+    parser = argparse.ArgumentParser(
+        description="YouTube Chat Application Setup & Start Script",
+        epilog="Subcommands: 'app.py api --help' (headless HTTP API), "
+               "'app.py ingest --help' (batch ingest from a URL list), "
+               "'app.py qa --help' (batch question evaluation)"
+    )
+    parser.add_argument('--reinstall', action='store_true',
+                        help='Reinstall dependencies even if requirements have not changed')
+    parser.add_argument('--supervise', action='store_true',
+                        help='Keep running and restart Streamlit if it crashes, hangs or exceeds --max-rss-mb')
+    parser.add_argument('--max-rss-mb', type=int, default=0,
+                        help='With --supervise: restart Streamlit above this memory use in MB (default: no limit)')
+    parser.add_argument('--supervise-interval', type=float, default=SUPERVISOR_INTERVAL,
+                        help=f'With --supervise: seconds between checks (default: {SUPERVISOR_INTERVAL:.0f})')
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'], default='info',
+                        help='Log level for Streamlit and the app (default: info)')
+    parser.add_argument('--log-max-mb', type=float, default=10,
+                        help='Rotate streamlit.log / streamlit_debug.log at this size in MB (default: 10)')
+    parser.add_argument('--log-backups', type=int, default=3,
+                        help='Rotated log files to keep (default: 3)')
+    parser.add_argument('--no-browser', action='store_true', help='Do not open the browser when Streamlit is ready')
+    parser.add_argument('--profile-imports', action='store_true',
+                        help=f'Record the import time of every module in the Streamlit process ({IMPORT_PROFILE_FILE})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Streamlit worker processes behind a sticky-session proxy (default: 1, no proxy); '
+                             'the LLM concurrency budget is split between them')
+    parser.add_argument('--with-api', action='store_true',
+                        help='Also serve the headless HTTP API next to the Streamlit UI')
+    parser.add_argument('--api-host', default='127.0.0.1', help='Interface for the HTTP API (default: 127.0.0.1)')
+    parser.add_argument('--api-port', type=int, default=8600, help='Port for the HTTP API (default: 8600)')
+    args, unknown = parser.parse_known_args(argv)
+    if unknown:
+        print(f"[WARNING] Ignoring unknown arguments: {' '.join(unknown)}")
+    return args
+
+def start_api_server(host, port):
+    """在后台线程中启动无界面 HTTP API（与 Streamlit UI 共享数据文件和索引）"""
+    try:
+        import api
+        server = api.start_in_thread(host, port, api.ApiConfig(
+            os.path.join(get_project_root(), 'video_data.json'),
+            api.DEFAULT_ENDPOINT,
+            api.DEFAULT_MODEL
+        ))
+        print(f"[SUCCESS] HTTP API started on http://{host}:{server.server_address[1]}")
+        return server
+    except Exception as e:
+        print(f"[ERROR] Failed to start HTTP API: {e}")
+        return None
+
+def main(args=None):
+    global startup_profile
+    if args is None:
+        args = parse_launcher_args([])
+    LOG_SETTINGS.update(
+        max_bytes=int(args.log_max_mb * 1024 * 1024),
+        backup_count=args.log_backups,
+        level=args.log_level
+    )
+    if args.profile_imports:
+        os.environ[IMPORT_PROFILE_ENV] = '1'  # Streamlit 子进程继承
     # 检查是否是子进程（通过环境变量）
     if os.environ.get('STREAMLIT_CHILD_PROCESS') == '1':
         # 这是 Streamlit 子进程，不应该执行主程序逻辑
@@ -878,21 +1703,40 @@ def main():
     print("==========================================")
     print("YouTube Chat Application Setup & Start")
     print("==========================================")
+    startup_profile = StartupProfile()
     # 打包后的 exe 不需要检查 Python、uv 和虚拟环境，因为所有依赖都已打包
     is_frozen = getattr(sys, 'frozen', False)
     if not is_frozen:
         # 仅在开发环境中检查这些
-        check_python()
-        check_uv()
-        check_virtual_env()
+        with startup_profile.phase('check_python'):
+            check_python()
+        with startup_profile.phase('check_uv'):
+            check_uv()
+        with startup_profile.phase('check_virtual_env'):
+            check_virtual_env(force_install=args.reinstall)
     
-    check_required_files()  # 现在使用当前工作目录检查文件
+    with startup_profile.phase('check_required_files'):
+        check_required_files()  # 现在使用当前工作目录检查文件
     
     print()
     print("==========================================")
     print("Starting Services...")
     print("==========================================")
-    streamlit_port = start_streamlit()
+    proxy, worker_names = None, ['streamlit']
+    with startup_profile.phase('start_streamlit'):
+        if args.workers > 1:
+            # --with-api 时 API 在启动器进程中运行，同样分摊一份预算
+            streamlit_port, proxy, worker_names = start_streamlit_workers(
+                args.workers, open_browser=not args.no_browser,
+                budget_share=args.workers + (1 if args.with_api else 0)
+            )
+        else:
+            streamlit_port = start_streamlit(open_browser=not args.no_browser)
+    if args.with_api:
+        with startup_profile.phase('start_api_server'):
+            api_server = start_api_server(args.api_host, args.api_port)
+    else:
+        api_server = None
     print()
     print("==========================================")
     print("Setup Complete!")
@@ -900,14 +1744,20 @@ def main():
     
     # 显示进程状态
     print("\n[INFO] Process Status:")
-    if 'streamlit' in _started_processes:
-        print(f"    {check_process_status('Streamlit', _started_processes['streamlit'])}")
+    for name in worker_names:
+        if name in _started_processes:
+            label = 'Streamlit' if name == 'streamlit' else f"Streamlit worker {name.rsplit('_', 1)[1]}"
+            print(f"    {check_process_status(label, _started_processes[name])}")
     
     print("\nServices:")
     if streamlit_port:
         print(f"    Streamlit UI: http://localhost:{streamlit_port}")
+        if proxy is not None:
+            print(f"    Streamlit workers: {', '.join(str(backend.port) for backend in proxy.backends)} (behind the proxy)")
     else:
         print("    Streamlit UI: Not available (check logs for details)")
+    if api_server:
+        print(f"    HTTP API: http://{args.api_host}:{api_server.server_address[1]}")
     
     # 如果 Streamlit 没有启动，提供调试信息
     if not streamlit_port:
@@ -920,6 +1770,37 @@ def main():
         print("    3. Check if port 8501 is available")
         print("    4. Try manually starting Streamlit to see error messages")
     
+    # 写入本次启动的计时记录，并提示最慢的阶段
+    profile_path = os.path.join(get_project_root(), STARTUP_PROFILE_FILE)
+    print()
+    startup_profile.print_summary(startup_profile.write(profile_path))
+    print(f"[INFO] Startup profile written to {profile_path}")
+    if args.profile_imports:
+        # main.py 和 utils 在第一次打开页面时才导入，退出时再写一次以包含首次渲染
+        import_profile_path = os.path.join(get_project_root(), IMPORT_PROFILE_FILE)
+        log_files = list(_log_launch_offsets)
+        print_import_profile(write_import_profile(import_profile_path, log_files))
+        print(f"[INFO] Import profile written to {import_profile_path} (updated on exit to include the first page render)")
+        atexit.register(write_import_profile, import_profile_path, log_files)
+    
+    if args.supervise:
+        # 监控模式：不等待 Enter，持续监控并在需要时自动重启 Streamlit
+        print("\n[INFO] Supervising Streamlit (press Ctrl+C to exit)...")
+        if proxy is not None:
+            supervisors = [
+                StreamlitSupervisor(proxy.backends[i].port, args.max_rss_mb, args.supervise_interval, name,
+                                    on_restart=lambda port, i=i: proxy.set_backend_port(i, port))
+                for i, name in enumerate(worker_names)
+            ]
+        else:
+            supervisors = [StreamlitSupervisor(streamlit_port or 8501, args.max_rss_mb, args.supervise_interval)]
+        try:
+            run_supervisors(supervisors, args.supervise_interval)
+        except KeyboardInterrupt:
+            restarts = sum(sum(supervisor.restarts.values()) for supervisor in supervisors)
+            print(f"\n\nExiting... (Streamlit restarts: {restarts})")
+        return
+    
     print("\nPress Enter to exit...")
     try:
         input()  # 等待用户按 Enter
@@ -1028,4 +1909,19 @@ if __name__ == '__main__':
             safe_print("[INFO] 已尝试将虚拟环境添加到路径，继续运行...")
             safe_print()
     
-    main()
+    # "app.py api ..." 只启动无界面的 HTTP API（不启动 Streamlit）
+    if len(sys.argv) > 1 and sys.argv[1] == 'api':
+        import api
+        sys.exit(api.main(sys.argv[2:]))
+    
+    # "app.py ingest urls.txt" 批量导入视频（不启动 Streamlit）
+    if len(sys.argv) > 1 and sys.argv[1] == 'ingest':
+        import batch_ingest
+        sys.exit(batch_ingest.main(sys.argv[2:]))
+    
+    # "app.py qa questions.jsonl" 批量问答评测（不启动 Streamlit）
+    if len(sys.argv) > 1 and sys.argv[1] == 'qa':
+        import batch_qa
+        sys.exit(batch_qa.main(sys.argv[2:]))
+    
+    main(parse_launcher_args(sys.argv[1:]))
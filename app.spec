@@ -1,24 +1,36 @@
 # -*- mode: python ; coding: utf-8 -*-
 """
 PyInstaller spec 文件用于打包 Streamlit 应用
+
+打包模式由环境变量 APP_BUILD_MODE 指定（build.py --mode 会设置）：
+    onedir（默认）：输出 dist/app/ 目录，文件直接放在磁盘上，每次启动无需解压
+    onefile：输出单个 exe，每次启动都要解压到新的临时目录
+两种模式都不使用 UPX（压缩后的文件每次启动都要解压）。
 """
 
+import json
 import os
 import site
 from pathlib import Path
 
 block_cipher = None
 
+build_mode = os.environ.get('APP_BUILD_MODE', 'onedir').lower()
+
 # 获取项目根目录
 project_root = Path(SPECPATH)
 
 # 收集所有需要的数据文件
 datas = [
     ('utils', 'utils'),
-    ('aiDAPTIV_Files', 'aiDAPTIV_Files'),
     ('main.py', '.'),  # 将 api.py 打包到根目录
 ]
 
+# aiDAPTIV_Files/Installer 是构建输出目录，不能打包进去（否则会把上一次的构建产物再打包一次）
+for files_dir in sorted((project_root / 'aiDAPTIV_Files').iterdir()):
+    if files_dir.is_dir() and files_dir.name != 'Installer':
+        datas.append((str(files_dir), f'aiDAPTIV_Files/{files_dir.name}'))
+
 # 收集 Streamlit 的所有数据文件（如果已安装）
 try:
     import streamlit
@@ -55,36 +67,47 @@ def collect_metadata_dirs():
 # 添加元数据目录
 datas.extend(collect_metadata_dirs())
 
+# 导入追踪结果（trace_imports.py 生成）：排除从未导入的包，hidden imports 只保留实际用到的模块
+# 设置 APP_TRIM=0 或没有 build_trace.json 时使用下面的手写列表
+hiddenimports = [
+    'streamlit',
+    'streamlit.web.cli',
+    'streamlit.runtime.scriptrunner.magic_funcs',
+    'streamlit.version',
+    'youtube_transcript_api',
+    'youtube_transcript_api._errors',
+    'youtube_transcript_api._transcripts',
+    'requests',
+    'urllib3',
+    'certifi',
+    'charset_normalizer',
+    'idna',
+    'importlib.metadata',
+    'importlib.metadata._adapters',
+    'importlib.metadata._collections',
+    'importlib.metadata._functools',
+    'importlib.metadata._itertools',
+    'importlib.metadata._meta',
+    'importlib.metadata._text',
+]
+excludes = []
+trace_file = project_root / 'build_trace.json'
+if os.environ.get('APP_TRIM', '1') != '0' and trace_file.exists():
+    trace = json.loads(trace_file.read_text(encoding='utf-8'))
+    hiddenimports = sorted(set(trace['hiddenimports']) | {'streamlit.web.cli', 'importlib.metadata'})
+    excludes = trace['excludes']
+    print(f"[INFO] 使用 {trace_file.name}: 排除 {len(excludes)} 个包，hidden imports {len(hiddenimports)} 个")
+
 a = Analysis(
     ['app.py'],
     pathex=[str(project_root)],
     binaries=[],
     datas=datas,
-    hiddenimports=[
-        'streamlit',
-        'streamlit.web.cli',
-        'streamlit.runtime.scriptrunner.magic_funcs',
-        'streamlit.version',
-        'youtube_transcript_api',
-        'youtube_transcript_api._errors',
-        'youtube_transcript_api._transcripts',
-        'requests',
-        'urllib3',
-        'certifi',
-        'charset_normalizer',
-        'idna',
-        'importlib.metadata',
-        'importlib.metadata._adapters',
-        'importlib.metadata._collections',
-        'importlib.metadata._functools',
-        'importlib.metadata._itertools',
-        'importlib.metadata._meta',
-        'importlib.metadata._text',
-    ],
+    hiddenimports=hiddenimports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=excludes,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -93,20 +116,13 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
+exe_options = dict(
     name='app',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
-    runtime_tmpdir=None,
     console=True,  # 不显示控制台窗口
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -116,3 +132,33 @@ exe = EXE(
     icon=None,
 )
 
+if build_mode == 'onefile':
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        [],
+        runtime_tmpdir=None,
+        **exe_options
+    )
+else:
+    # onedir：依赖放在 exe 旁的 _internal 目录中，启动时直接加载
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        **exe_options
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='app',
+    )
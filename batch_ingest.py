@@ -0,0 +1,100 @@
+"""Batch ingest: add every YouTube URL from a list file (or stdin) to the knowledge base
+
+    app.py ingest urls.txt --jobs 16
+    cat urls.txt | python batch_ingest.py -
+
+One URL per line (blank lines and # comments are ignored). Videos already in the
+store are skipped, so an interrupted run can simply be started again. URLs that
+fail are written to a failures file in the same format, ready to be retried.
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+from utils.ingest import ingest_batch, read_url_list
+from utils.llm_client import DEFAULT_ENDPOINT, DEFAULT_MODEL
+from utils.llm_metrics import configure_metrics_log
+
+APP_BASE_DIR = Path(sys.executable).parent if getattr(sys, 'frozen', False) else Path(__file__).parent.resolve()
+DEFAULT_JOBS = 8
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Add YouTube videos from a URL list to the knowledge base")
+    parser.add_argument("urls", help="File with one URL per line, or '-' for stdin")
+    parser.add_argument("--jobs", "-j", type=int, default=DEFAULT_JOBS,
+                        help=f"Videos fetched in parallel (default: {DEFAULT_JOBS})")
+    parser.add_argument("--data", default=str(APP_BASE_DIR / "video_data.json"), help="Path to video_data.json")
+    parser.add_argument("--failures", default=None,
+                        help="Where to write failed URLs (default: <urls>.failed.txt, or ingest_failures.txt for stdin)")
+    parser.add_argument("--keep-fillers", action="store_true", help="Do not remove filler words from transcripts")
+    parser.add_argument("--summarize", action="store_true",
+                        help="Also request a summary per video (warms the model server, slower)")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT,
+                        help="LLM endpoint URL(s), separated by commas (used for embeddings and summaries)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Model name used for API calls")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.urls == '-':
+        urls = read_url_list(sys.stdin)
+        failures_path = Path(args.failures or APP_BASE_DIR / "ingest_failures.txt")
+    else:
+        with open(args.urls, 'r', encoding='utf-8') as f:
+            urls = read_url_list(f)
+        failures_path = Path(args.failures or f"{args.urls}.failed.txt")
+
+    data_path = Path(args.data)
+    configure_metrics_log(data_path.parent / "llm_metrics.jsonl")
+    print(f"[INFO] {len(urls)} URLs, {args.jobs} parallel jobs, store: {data_path}")
+
+    done = 0
+    progress_lock = threading.Lock()
+
+    def report(url, entry, error):
+        nonlocal done
+        with progress_lock:
+            done += 1
+            if error:
+                print(f"[ERROR] ({done}) {url}: {error}")
+            else:
+                print(f"[SUCCESS] ({done}) {entry['title']} ({entry['tokens']} tokens)")
+
+    started = time.monotonic()
+    try:
+        added, skipped, failures = ingest_batch(
+            urls,
+            data_path,
+            data_path.parent / "semantic_index",
+            args.endpoint,
+            args.model,
+            jobs=args.jobs,
+            remove_fillers=not args.keep_fillers,
+            summarize=args.summarize,
+            on_result=report
+        )
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted; finished videos were saved. Run the same command again to resume.")
+        return 130
+    elapsed = time.monotonic() - started
+
+    if failures:
+        with open(failures_path, 'w', encoding='utf-8') as f:
+            for url, error in failures:
+                f.write(f"{url}\t# {error}\n")
+    elif failures_path.exists():
+        failures_path.unlink()
+
+    print(f"[INFO] Added {len(added)}, skipped {len(skipped)} already stored, "
+          f"failed {len(failures)} in {elapsed:.1f}s")
+    if failures:
+        print(f"[INFO] Failed URLs written to {failures_path} (retry with: ingest {failures_path})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Batch question evaluation: run (video, question) pairs concurrently and report latency
+
+    app.py qa questions.jsonl --concurrency 8 --model Llama-3.2-3B-Instruct-Q4_K_M.gguf --model gpt-oss-20b
+
+Questions come from a JSONL file of {"video": ..., "question": ...} objects or a
+text file of "video<TAB>question" lines; video is a stored video ID, URL or title.
+Every pair runs once per --model through the same prompt path as the chat UI.
+Answers and per-request metrics go to a JSONL results file; a throughput and
+latency-percentile summary is printed per model.
+
+Requests still pass the process-wide admission limiter, but its limit is pinned
+to --concurrency so the numbers describe the endpoint at that load. With
+--adaptive the limiter keeps adapting as it does for the UI, and the limit
+it ended at is reported.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from utils.admission import get_limiter
+from utils.llm_client import DEFAULT_ENDPOINT, DEFAULT_MODEL, complete_chat, stream_chat
+from utils.llm_metrics import configure_metrics_log, summarize_metrics
+from utils.video_artifacts import artifacts_dir_for, get_artifacts, question_context
+from utils.video_store import find_video, read_videos, url_key, video_key
+
+APP_BASE_DIR = Path(sys.executable).parent if getattr(sys, 'frozen', False) else Path(__file__).parent.resolve()
+DEFAULT_CONCURRENCY = 4
+
+
+def read_questions(path: str) -> List[Tuple[str, str]]:
+    """(video, question) pairs from JSONL or tab-separated lines; '-' reads stdin"""
+    lines = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    pairs = []
+    with lines:
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                item = json.loads(line)
+                pairs.append((str(item["video"]), item["question"]))
+            else:
+                video, _, question = line.partition('\t')
+                if question:
+                    pairs.append((video.strip(), question.strip()))
+    return pairs
+
+
+def resolve_video(videos: List[dict], reference: str) -> Optional[dict]:
+    """Find a stored video by ID, URL or exact title"""
+    video = find_video(videos, reference) or find_video(videos, url_key(reference))
+    if video is None:
+        video = next((video for video in videos if video.get("title") == reference), None)
+    return video
+
+
+def ask(video: dict, question: str, args, model: str, index_dir: Path) -> dict:
+    """Answer one question the way the chat UI does and return its result row"""
+    context = question_context(get_artifacts(artifacts_dir_for(args.data), video), question, index_dir,
+                               args.endpoint, model, passages=args.context == "passages", k=args.top_k)
+
+    collected = []
+    if args.no_stream:
+        answer = complete_chat(question, context, args.endpoint, model, on_metrics=collected.append,
+                               max_tokens=args.max_tokens)
+    else:
+        answer = "".join(stream_chat(question, context, args.endpoint, model, on_metrics=collected.append,
+                                     max_tokens=args.max_tokens))
+    row = {"video": video_key(video), "title": video.get("title"), "question": question, "answer": answer}
+    row.update(collected[-1].to_dict() if collected else {"model": model, "error": "no metrics recorded"})
+    return row
+
+
+def ask_or_error(video: dict, question: str, args, model: str, index_dir: Path) -> dict:
+    """ask(), recording an exception as an error row so one failure does not end the run"""
+    try:
+        return ask(video, question, args, model, index_dir)
+    except Exception as e:
+        print(f"[ERROR] {video_key(video)}: {question}: {e}")
+        return {"video": video_key(video), "title": video.get("title"), "question": question, "answer": None,
+                "model": model, "error": f"{type(e).__name__}: {e}"}
+
+
+def format_seconds(value) -> str:
+    return "-" if value is None else f"{value:.3f}s"
+
+
+def print_summary(model: str, summary: dict):
+    print(f"\n[INFO] Model: {model}")
+    print(f"    Requests: {summary['requests']} ({summary['errors']} errors) in {summary['wall_s']}s "
+          f"-> {summary['requests_per_s']} req/s, {summary['output_tokens_per_s']} output tokens/s")
+    for name, label in (("queue_s", "Queue"), ("ttft_s", "TTFT"), ("total_s", "Latency")):
+        print(f"    {label:8} p50 {format_seconds(summary[f'{name}_p50'])}  "
+              f"p90 {format_seconds(summary[f'{name}_p90'])}  p99 {format_seconds(summary[f'{name}_p99'])}")
+    print(f"    Decode tokens/s per request: p50 {summary['tokens_per_s_p50']}  p90 {summary['tokens_per_s_p90']}")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run a batch of video questions and report latency")
+    parser.add_argument("questions", help="JSONL or tab-separated question file, or '-' for stdin")
+    parser.add_argument("--model", action="append", dest="models",
+                        help=f"Model to evaluate; repeat to compare models (default: {DEFAULT_MODEL})")
+    parser.add_argument("--concurrency", "-c", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Questions in flight at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Keep the adaptive admission limit instead of pinning it to --concurrency")
+    parser.add_argument("--repeat", type=int, default=1, help="Run every question this many times")
+    parser.add_argument("--output", "-o", default=None,
+                        help="Results JSONL (default: qa_results_<timestamp>.jsonl)")
+    parser.add_argument("--context", choices=["full", "passages"], default="full",
+                        help="Send the full transcript or only the most relevant passages")
+    parser.add_argument("--top-k", type=int, default=5, help="Passages per question with --context passages")
+    parser.add_argument("--max-tokens", type=int, default=1000, help="Maximum answer tokens")
+    parser.add_argument("--no-stream", action="store_true", help="Use non-streaming requests (no TTFT)")
+    parser.add_argument("--data", default=str(APP_BASE_DIR / "video_data.json"), help="Path to video_data.json")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT,
+                        help="LLM endpoint URL(s), separated by commas")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    models = args.models or [DEFAULT_MODEL]
+    data_path = Path(args.data)
+    index_dir = data_path.parent / "semantic_index"
+    output_path = Path(args.output or f"qa_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    configure_metrics_log(data_path.parent / "llm_metrics.jsonl")
+
+    videos = read_videos(data_path)
+    jobs = []
+    for reference, question in read_questions(args.questions):
+        video = resolve_video(videos, reference)
+        if video is None:
+            print(f"[ERROR] Unknown video '{reference}', skipping: {question}")
+            continue
+        jobs.extend([(video, question)] * max(1, args.repeat))
+    if not jobs:
+        print("[ERROR] No questions to run")
+        return 1
+
+    limiter = get_limiter(args.endpoint)
+    if args.adaptive:
+        admission = f"adaptive admission limit starting at {limiter.snapshot()['limit']:g}"
+    else:
+        limiter.pin_limit(args.concurrency)
+        admission = "admission limit pinned to the same value"
+    print(f"[INFO] {len(jobs)} questions x {len(models)} model(s), concurrency {args.concurrency} ({admission})")
+    summaries = {}
+    with open(output_path, 'w', encoding='utf-8') as output, \
+            ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="qa") as executor:
+        for model in models:
+            # Models run one after another so their latencies are not mixed
+            started = time.monotonic()
+            rows = []
+            for row in executor.map(lambda job: ask_or_error(job[0], job[1], args, model, index_dir), jobs):
+                rows.append(row)
+                output.write(json.dumps(row, ensure_ascii=False) + "\n")
+                output.flush()
+            summaries[model] = summarize_metrics(rows, time.monotonic() - started)
+            summaries[model]["admission_limit"] = limiter.snapshot()["limit"]
+            print_summary(model, summaries[model])
+            if args.adaptive:
+                print(f"    Admission limit at the end: {summaries[model]['admission_limit']:g} "
+                      f"(effective concurrency is min(--concurrency, limit))")
+
+    print(f"\n[SUCCESS] Results written to {output_path}")
+    with open(output_path.with_suffix(".summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=2)
+    return 0 if all(summary["errors"] == 0 for summary in summaries.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
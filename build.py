@@ -1,18 +1,40 @@
 """
 使用 uv 创建环境并打包成 exe 的构建脚本
+
+打包模式：
+    onedir（默认）：输出一个目录，程序文件直接放在磁盘上，启动时无需解压，启动快
+    onefile：输出单个 exe，每次启动都要把所有依赖解压到新的临时目录，启动慢
+
+    python build.py                      # onedir
+    python build.py --mode onefile       # 单文件
+    python build.py --compare            # 两种模式都构建，并比较冷启动/热启动时间
+    python build.py --trim               # 追踪导入后裁剪打包，并与未裁剪的构建比较大小和启动时间
+
+app.spec 会读取 trace_imports.py 生成的 build_trace.json（排除从未导入的包），
+设置环境变量 APP_TRIM=0 可以忽略它。
 """
+import argparse
+import json
 import os
 import sys
 import subprocess
 import shutil
+import threading
+import time
 from pathlib import Path
 
+EXE_NAME = 'app.exe' if sys.platform == 'win32' else 'app'
+OUTPUT_DIR = Path('aiDAPTIV_Files/Installer')
+STARTUP_READY_MARKER = 'Streamlit is running on port'
+STARTUP_DONE_MARKER = 'Press Enter to exit'
+STARTUP_TIMEOUT = 180
+
 def check_uv_installed():
     """检查 uv 是否已安装"""
     try:
-        result = subprocess.run(['uv', '--version'], 
-                              capture_output=True, 
-                              text=True, 
+        result = subprocess.run(['uv', '--version'],
+                              capture_output=True,
+                              text=True,
                               check=True)
         print(f"[SUCCESS] uv 已安装: {result.stdout.strip()}")
         return True
@@ -33,7 +55,7 @@ def create_venv_with_uv():
     if venv_path.exists():
         print("[INFO] 虚拟环境已存在，跳过创建")
         return True
-    
+
     print("[INFO] 正在使用 uv 创建虚拟环境...")
     try:
         subprocess.run(['uv', 'venv'], check=True)
@@ -66,254 +88,192 @@ def install_pyinstaller():
         print(f"[ERROR] 安装 PyInstaller 失败: {e}")
         return False
 
-def build_exe():
-    """使用 PyInstaller 打包成 exe"""
-    print("[INFO] 开始打包 exe...")
-    
-    # 确保输出目录存在
-    output_dir = Path('aiDAPTIV_Files/Installer')
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # 使用 spec 文件打包
+def built_executable(dist_dir, mode):
+    """构建产物中可执行文件的路径（onedir 在 dist/app/ 目录内）"""
+    if mode == 'onedir':
+        return Path(dist_dir) / 'app' / EXE_NAME
+    return Path(dist_dir) / EXE_NAME
+
+def copy_to_output(dist_dir, mode):
+    """把构建产物复制到 aiDAPTIV_Files/Installer，返回复制后的可执行文件路径"""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if mode == 'onedir':
+        target_dir = OUTPUT_DIR / 'app'
+        if target_dir.is_dir():
+            shutil.rmtree(target_dir)
+        elif target_dir.exists():
+            target_dir.unlink()
+        shutil.copytree(Path(dist_dir) / 'app', target_dir)
+        print(f"[SUCCESS] 程序目录已复制到: {target_dir}")
+        return target_dir / EXE_NAME
+    target_exe = OUTPUT_DIR / EXE_NAME
+    if target_exe.is_dir():
+        shutil.rmtree(target_exe)  # 非 Windows 平台上 onedir 的目录与 onefile 的文件同名
+    shutil.copy2(built_executable(dist_dir, mode), target_exe)
+    print(f"[SUCCESS] exe 文件已复制到: {target_exe}")
+    return target_exe
+
+def trace_imports():
+    """运行一次脚本化会话，生成 build_trace.json（裁剪列表）"""
+    print("[INFO] 正在追踪导入...")
+    try:
+        subprocess.run(['uv', 'run', 'python', 'trace_imports.py'], check=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] 导入追踪失败: {e}")
+        return False
+
+def build_exe(mode='onedir', dist_dir='dist', trim=True):
+    """使用 PyInstaller 打包（onedir 或 onefile，均不使用 UPX 压缩），返回可执行文件路径
+
+    trim=False 时 app.spec 忽略 build_trace.json，使用完整的依赖。
+    """
+    print(f"[INFO] 开始打包 ({mode})...")
+
+    # 使用 spec 文件打包（打包模式通过环境变量传给 app.spec）
     spec_file = Path('app.spec')
     if spec_file.exists():
         print(f"[INFO] 使用 {spec_file} 进行打包...")
-        try:
-            subprocess.run(['uv', 'run', 'pyinstaller', 'app.spec', '--clean'], check=True)
-            print("[SUCCESS] 打包完成")
-            
-            # 检查输出文件
-            dist_exe = Path('dist/app.exe')
-            if dist_exe.exists():
-                # 复制到目标目录
-                target_exe = output_dir / 'app.exe'
-                shutil.copy2(dist_exe, target_exe)
-                print(f"[SUCCESS] exe 文件已复制到: {target_exe}")
-                return True
-            else:
-                print("[ERROR] 未找到生成的 exe 文件")
-                return False
-        except subprocess.CalledProcessError as e:
-            print(f"[ERROR] 打包失败: {e}")
-            return False
+        cmd = ['uv', 'run', 'pyinstaller', 'app.spec', '--clean', '--noconfirm', '--distpath', str(dist_dir)]
     else:
         print("[ERROR] 未找到 app.spec 文件")
         print("[INFO] 使用基本配置进行打包...")
-        try:
-            # 基本打包命令
-            cmd = [
-                'uv', 'run', 'pyinstaller',
-                '--onefile',
-                '--noconsole',
-                '--name=app',
-                '--add-data=utils;utils',
-                '--add-data=aiDAPTIV_Files;aiDAPTIV_Files',
-                '--hidden-import=streamlit',
-                '--hidden-import=youtube_transcript_api',
-                '--hidden-import=requests',
-                '--hidden-import=importlib.metadata',
-                '--collect-all=streamlit',
-                '--collect-metadata=streamlit',
-                '--collect-metadata=youtube-transcript-api',
-                '--collect-metadata=requests',
-                'app.py'
-            ]
-            subprocess.run(cmd, check=True)
-            print("[SUCCESS] 打包完成")
-            
-            # 复制到目标目录
-            dist_exe = Path('dist/app.exe')
-            if dist_exe.exists():
-                target_exe = output_dir / 'app.exe'
-                shutil.copy2(dist_exe, target_exe)
-                print(f"[SUCCESS] exe 文件已复制到: {target_exe}")
-                return True
-            return False
-        except subprocess.CalledProcessError as e:
-            print(f"[ERROR] 打包失败: {e}")
-            return False
+        # 基本打包命令
+        cmd = [
+            'uv', 'run', 'pyinstaller',
+            f'--{mode}',
+            '--noupx',  # UPX 压缩的文件每次启动都要解压，还容易被杀毒软件扫描
+            '--noconsole',
+            '--noconfirm',
+            '--name=app',
+            f'--distpath={dist_dir}',
+            f'--add-data=utils{os.pathsep}utils',
+            # aiDAPTIV_Files/Installer 是构建输出目录，不打包进去
+            *[f'--add-data={files_dir}{os.pathsep}{files_dir.as_posix()}'
+              for files_dir in sorted(Path('aiDAPTIV_Files').iterdir())
+              if files_dir.is_dir() and files_dir.name != 'Installer'],
+            '--hidden-import=streamlit',
+            '--hidden-import=youtube_transcript_api',
+            '--hidden-import=requests',
+            '--hidden-import=importlib.metadata',
+            '--collect-all=streamlit',
+            '--collect-metadata=streamlit',
+            '--collect-metadata=youtube-transcript-api',
+            '--collect-metadata=requests',
+            'app.py'
+        ]
+    env = dict(os.environ, APP_BUILD_MODE=mode, APP_TRIM='1' if trim else '0')
+    try:
+        subprocess.run(cmd, check=True, env=env)
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] 打包失败: {e}")
+        return None
+    print("[SUCCESS] 打包完成")
 
-def cleanup():
-    """清理临时文件"""
-    print("[INFO] 清理临时文件...")
-    dirs_to_remove = ['build', '__pycache__']
-    for dir_name in dirs_to_remove:
-        dir_path = Path(dir_name)
-        if dir_path.exists():
-            shutil.rmtree(dir_path)
-            print(f"[INFO] 已删除: {dir_name}")
+    # 检查输出文件
+    if not built_executable(dist_dir, mode).exists():
+        print(f"[ERROR] 未找到生成的可执行文件: {built_executable(dist_dir, mode)}")
+        return None
+    return copy_to_output(dist_dir, mode)
 
-def main():
-    """主函数"""
-    print("=" * 60)
-    print("开始构建流程...")
-    print("=" * 60)
-    
-    # 1. 检查 uv
-    if not check_uv_installed():
-        sys.exit(1)
-    
-    # 2. 创建虚拟环境
-    if not create_venv_with_uv():
-        sys.exit(1)
-    
-    # 3. 安装依赖
-    if not install_dependencies():
-        sys.exit(1)
-    
-    # 4. 安装 PyInstaller
-    if not install_pyinstaller():
-        sys.exit(1)
-    
-    # 5. 打包 exe
-    if not build_exe():
-        sys.exit(1)
-    
-    # 6. 清理
-    cleanup()
-    
-    print("=" * 60)
-    print("[SUCCESS] 构建完成！")
-    print(f"[INFO] exe 文件位置: aiDAPTIV_Files/Installer/app.exe")
-    print("=" * 60)
+def dir_size(path):
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
 
-if __name__ == '__main__':
-    main()
+def launch_once(executable, timeout=STARTUP_TIMEOUT):
+    """启动一次打包后的程序，返回从启动到 Streamlit 就绪的秒数和启动器自身计时（失败返回 None）
 
-"""
-使用 uv 创建环境并打包成 exe 的构建脚本
-"""
-import os
-import sys
-import subprocess
-import shutil
-from pathlib import Path
+    启动器计时来自程序写入的 startup_profile.json；两者之差主要是解压和解释器启动的时间。
+    """
+    executable = Path(executable).resolve()
+    profile_path = executable.parent / 'startup_profile.json'
+    if profile_path.exists():
+        profile_path.unlink()
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [str(executable), '--no-browser', '--log-level', 'warning'],
+        cwd=str(executable.parent),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+    finished = threading.Event()
+    ready_at = []
 
-def check_uv_installed():
-    """检查 uv 是否已安装"""
-    try:
-        result = subprocess.run(['uv', '--version'], 
-                              capture_output=True, 
-                              text=True, 
-                              check=True)
-        print(f"[SUCCESS] uv 已安装: {result.stdout.strip()}")
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("[ERROR] uv 未安装")
-        print("[INFO] 正在安装 uv...")
-        try:
-            subprocess.run([sys.executable, '-m', 'pip', 'install', 'uv'], check=True)
-            print("[SUCCESS] uv 安装成功")
-            return True
-        except subprocess.CalledProcessError:
-            print("[ERROR] 无法安装 uv，请手动安装: pip install uv")
-            return False
+    def watch_output():
+        for line in process.stdout:
+            if STARTUP_READY_MARKER in line and not ready_at:
+                ready_at.append(time.monotonic())
+            if STARTUP_READY_MARKER in line or STARTUP_DONE_MARKER in line:
+                finished.set()  # 就绪，或启动器已放弃等待
+        finished.set()  # 进程已退出
 
-def create_venv_with_uv():
-    """使用 uv 创建虚拟环境"""
-    venv_path = Path('.venv')
-    if venv_path.exists():
-        print("[INFO] 虚拟环境已存在，跳过创建")
-        return True
-    
-    print("[INFO] 正在使用 uv 创建虚拟环境...")
-    try:
-        subprocess.run(['uv', 'venv'], check=True)
-        print("[SUCCESS] 虚拟环境创建成功")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] 创建虚拟环境失败: {e}")
-        return False
+    threading.Thread(target=watch_output, daemon=True).start()
+    finished.wait(timeout)
+    wall_s = ready_at[0] - started if ready_at else None
 
-def install_dependencies():
-    """使用 uv 安装依赖"""
-    print("[INFO] 正在安装依赖...")
+    # 等待启动器写入计时记录，然后按 Enter 退出
+    deadline = time.monotonic() + 10
+    while process.poll() is None and not profile_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.1)
     try:
-        # 使用 uv pip install 安装依赖
-        subprocess.run(['uv', 'pip', 'install', '-r', 'requirements.txt'], check=True)
-        print("[SUCCESS] 依赖安装成功")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] 安装依赖失败: {e}")
-        return False
+        process.stdin.write('\n')
+        process.stdin.flush()
+        process.wait(timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        process.kill()
+        process.wait()
 
-def install_pyinstaller():
-    """安装 PyInstaller"""
-    print("[INFO] 正在安装 PyInstaller...")
+    if wall_s is None:
+        return None
+    launcher_s = None
     try:
-        subprocess.run(['uv', 'pip', 'install', 'pyinstaller'], check=True)
-        print("[SUCCESS] PyInstaller 安装成功")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] 安装 PyInstaller 失败: {e}")
-        return False
+        launcher_s = json.loads(profile_path.read_text(encoding='utf-8'))['total_s']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {'wall_s': round(wall_s, 3), 'launcher_s': launcher_s}
 
-def build_exe():
-    """使用 PyInstaller 打包成 exe"""
-    print("[INFO] 开始打包 exe...")
-    
-    # 确保输出目录存在
-    output_dir = Path('aiDAPTIV_Files/Installer')
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # 使用 spec 文件打包
-    spec_file = Path('app.spec')
-    if spec_file.exists():
-        print(f"[INFO] 使用 {spec_file} 进行打包...")
-        try:
-            subprocess.run(['uv', 'run', 'pyinstaller', 'app.spec', '--clean'], check=True)
-            print("[SUCCESS] 打包完成")
-            
-            # 检查输出文件
-            dist_exe = Path('dist/app.exe')
-            if dist_exe.exists():
-                # 复制到目标目录
-                target_exe = output_dir / 'app.exe'
-                shutil.copy2(dist_exe, target_exe)
-                print(f"[SUCCESS] exe 文件已复制到: {target_exe}")
-                return True
-            else:
-                print("[ERROR] 未找到生成的 exe 文件")
-                return False
-        except subprocess.CalledProcessError as e:
-            print(f"[ERROR] 打包失败: {e}")
-            return False
-    else:
-        print("[ERROR] 未找到 app.spec 文件")
-        print("[INFO] 使用基本配置进行打包...")
-        try:
-            # 基本打包命令
-            cmd = [
-                'uv', 'run', 'pyinstaller',
-                '--onefile',
-                '--noconsole',
-                '--name=app',
-                '--add-data=utils;utils',
-                '--add-data=aiDAPTIV_Files;aiDAPTIV_Files',
-                '--hidden-import=streamlit',
-                '--hidden-import=youtube_transcript_api',
-                '--hidden-import=requests',
-                '--hidden-import=importlib.metadata',
-                '--collect-all=streamlit',
-                '--collect-metadata=streamlit',
-                '--collect-metadata=youtube-transcript-api',
-                '--collect-metadata=requests',
-                'app.py'
-            ]
-            subprocess.run(cmd, check=True)
-            print("[SUCCESS] 打包完成")
-            
-            # 复制到目标目录
-            dist_exe = Path('dist/app.exe')
-            if dist_exe.exists():
-                target_exe = output_dir / 'app.exe'
-                shutil.copy2(dist_exe, target_exe)
-                print(f"[SUCCESS] exe 文件已复制到: {target_exe}")
-                return True
-            return False
-        except subprocess.CalledProcessError as e:
-            print(f"[ERROR] 打包失败: {e}")
-            return False
+def measure_startup(executable, runs=5):
+    """多次启动，第一次为冷启动（构建/复制后首次运行），其余为热启动"""
+    results = []
+    for i in range(runs):
+        result = launch_once(executable)
+        label = 'cold' if i == 0 else 'warm'
+        if result is None:
+            print(f"[ERROR] 第 {i + 1} 次启动失败或超时")
+            continue
+        print(f"[INFO] 第 {i + 1} 次启动 ({label}): {result['wall_s']:.2f}s")
+        results.append(dict(result, run=i + 1, kind=label))
+    warm = sorted(r['wall_s'] for r in results if r['kind'] == 'warm')
+    return {
+        'executable': str(executable),
+        'size_mb': round(dir_size(Path(executable).parent if Path(executable).parent.name == 'app'
+                                  else executable) / 1024 / 1024, 1),
+        'cold_s': next((r['wall_s'] for r in results if r['kind'] == 'cold'), None),
+        'warm_median_s': warm[len(warm) // 2] if warm else None,
+        'runs': results,
+    }
+
+def print_comparison(report):
+    print("=" * 60)
+    print(f"{'模式':<10}{'大小 (MB)':>12}{'冷启动 (s)':>14}{'热启动中位数 (s)':>20}")
+    for mode, result in report.items():
+        cold = f"{result['cold_s']:.2f}" if result['cold_s'] is not None else '-'
+        warm = f"{result['warm_median_s']:.2f}" if result['warm_median_s'] is not None else '-'
+        print(f"{mode:<10}{result['size_mb']:>12}{cold:>14}{warm:>20}")
+    print("=" * 60)
+
+def print_trim_delta(full, trimmed):
+    """裁剪前后的大小和启动时间差"""
+    print(f"[INFO] 裁剪后大小: {trimmed['size_mb']} MB（{trimmed['size_mb'] - full['size_mb']:+.1f} MB）")
+    for key, label in (('cold_s', '冷启动'), ('warm_median_s', '热启动中位数')):
+        if full[key] is not None and trimmed[key] is not None:
+            print(f"[INFO] {label}: {trimmed[key]:.2f}s（{trimmed[key] - full[key]:+.2f}s）")
 
 def cleanup():
     """清理临时文件"""
@@ -325,40 +285,83 @@ def cleanup():
             shutil.rmtree(dir_path)
             print(f"[INFO] 已删除: {dir_name}")
 
-def main():
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="使用 uv 创建环境并用 PyInstaller 打包")
+    parser.add_argument('--mode', choices=['onedir', 'onefile'], default='onedir',
+                        help='打包模式（默认 onedir：启动时无需解压）')
+    parser.add_argument('--compare', action='store_true',
+                        help='两种模式都构建，并比较大小、冷启动和热启动时间')
+    parser.add_argument('--trim', action='store_true',
+                        help='先追踪导入生成 build_trace.json，再分别构建未裁剪和裁剪版本并比较')
+    parser.add_argument('--measure', type=int, default=0, metavar='RUNS',
+                        help='构建后启动 RUNS 次测量启动时间（--compare/--trim 默认 5 次）')
+    parser.add_argument('--skip-setup', action='store_true', help='跳过虚拟环境和依赖安装步骤')
+    return parser
+
+def main(argv=None):
     """主函数"""
+    args = build_arg_parser().parse_args(argv)
     print("=" * 60)
     print("开始构建流程...")
     print("=" * 60)
-    
-    # 1. 检查 uv
-    if not check_uv_installed():
-        sys.exit(1)
-    
-    # 2. 创建虚拟环境
-    if not create_venv_with_uv():
-        sys.exit(1)
-    
-    # 3. 安装依赖
-    if not install_dependencies():
-        sys.exit(1)
-    
-    # 4. 安装 PyInstaller
-    if not install_pyinstaller():
-        sys.exit(1)
-    
-    # 5. 打包 exe
-    if not build_exe():
+
+    if not args.skip_setup:
+        # 1. 检查 uv
+        if not check_uv_installed():
+            sys.exit(1)
+
+        # 2. 创建虚拟环境
+        if not create_venv_with_uv():
+            sys.exit(1)
+
+        # 3. 安装依赖
+        if not install_dependencies():
+            sys.exit(1)
+
+        # 4. 安装 PyInstaller
+        if not install_pyinstaller():
+            sys.exit(1)
+
+    # 5. 追踪导入（--trim）
+    if args.trim and not trace_imports():
         sys.exit(1)
-    
-    # 6. 清理
+
+    # 6. 打包（--compare 时两种模式分别输出到 dist/onefile 和 dist/onedir，
+    #    --trim 时未裁剪和裁剪版本分别输出到 dist/full 和 dist/trimmed）
+    if args.compare:
+        builds = [(mode, mode, True) for mode in ('onefile', 'onedir')]
+    elif args.trim:
+        builds = [('full', args.mode, False), ('trimmed', args.mode, True)]
+    else:
+        builds = [(args.mode, args.mode, True)]
+    runs = args.measure or (5 if args.compare or args.trim else 0)
+    report = {}
+    executable = None
+    for label, mode, trim in builds:
+        dist_dir = os.path.join('dist', label) if len(builds) > 1 else 'dist'
+        executable = build_exe(mode, dist_dir, trim)
+        if executable is None:
+            sys.exit(1)
+        if runs:
+            print(f"[INFO] 测量 {label} 启动时间（{runs} 次）...")
+            report[label] = measure_startup(executable, runs)
+
+    # 7. 清理
     cleanup()
-    
+
+    if report:
+        print_comparison(report)
+        if args.trim and {'full', 'trimmed'} <= report.keys():
+            print_trim_delta(report['full'], report['trimmed'])
+        report_path = Path('dist') / 'startup_report.json'
+        report_path.parent.mkdir(exist_ok=True)
+        report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"[INFO] 启动时间报告: {report_path}")
+
     print("=" * 60)
     print("[SUCCESS] 构建完成！")
-    print(f"[INFO] exe 文件位置: aiDAPTIV_Files/Installer/app.exe")
+    print(f"[INFO] 程序位置: {executable}")
     print("=" * 60)
 
 if __name__ == '__main__':
     main()
-
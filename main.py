@@ -1,11 +1,21 @@
 import streamlit as st
-import json
 import os
 import sys
+import uuid
 from pathlib import Path
-import requests
 from datetime import datetime
-from utils.parsing_yt import fetch_video_data
+from utils.llm_client import DEFAULT_ENDPOINT, DEFAULT_MODEL
+from utils.coalesce import coalesced_stream_chat
+from utils.endpoint_pool import get_pool
+from utils.admission import get_limiter
+from utils.llm_metrics import LLMCallMetrics, configure_metrics_log
+from utils.semantic_index import remove_video_from_indexes
+from utils.video_artifacts import get_artifacts, question_context, remove_artifacts
+from utils.extractive_qa import answer_extractive
+from utils.video_store import read_videos, remove_video, video_key
+from utils.ingest import IngestError, ingest_video
+from utils.chat_history import ChatHistory, prune_spill_dirs
+from utils.warmup import get_warmer
 
 
 st.set_page_config(
@@ -15,172 +25,140 @@ st.set_page_config(
 # 可執行檔所在目錄（打包後）或目前檔案所在目錄（開發環境）
 APP_BASE_DIR = Path(sys.executable).parent if getattr(sys, 'frozen', False) else Path(__file__).parent.resolve()
 VIDEO_DATA_PATH = APP_BASE_DIR / "video_data.json"
+LLM_METRICS_PATH = APP_BASE_DIR / "llm_metrics.jsonl"
+SEMANTIC_INDEX_DIR = APP_BASE_DIR / "semantic_index"
+ARTIFACTS_DIR = APP_BASE_DIR / "artifacts"
+CHAT_HISTORY_DIR = APP_BASE_DIR / "chat_history"
+CHAT_RENDER_WINDOW = 10
+CONTEXT_FULL = "Full transcript"
+CONTEXT_PASSAGES = "Relevant passages (semantic search)"
+MAX_DIAGNOSTIC_ROWS = 50
 
 import logging
-logging.basicConfig(level=logging.DEBUG)
+# 日誌級別由啟動器透過環境變數傳入（預設 INFO，避免每次 rerun 都輸出除錯訊息）
+logging.basicConfig(level=getattr(logging, os.environ.get("YTCHAT_LOG_LEVEL", "INFO").upper(), logging.INFO))
 logger = logging.getLogger(__name__)
 logger.debug(f"VIDEO_DATA_PATH: {VIDEO_DATA_PATH}")
+configure_metrics_log(LLM_METRICS_PATH)
 
 # Initialize session state
 if 'video_data' not in st.session_state:
     st.session_state.video_data = []
 if 'data_path' not in st.session_state:
     st.session_state.data_path = str(VIDEO_DATA_PATH)
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+    prune_spill_dirs(CHAT_HISTORY_DIR)
+if 'chat_histories' not in st.session_state:
+    st.session_state.chat_histories = {}
+if 'chat_window' not in st.session_state:
+    st.session_state.chat_window = CHAT_RENDER_WINDOW
 if 'selected_video' not in st.session_state:
     st.session_state.selected_video = None
 if 'vllm_endpoint' not in st.session_state:
-    st.session_state.vllm_endpoint = "http://localhost:13141/v1/chat/completions" # http://10.102.196.26:18302/v1/chat/completions
+    st.session_state.vllm_endpoint = DEFAULT_ENDPOINT # http://10.102.196.26:18302/v1/chat/completions
 if 'model_name' not in st.session_state:
-    st.session_state.model_name = "Llama-3.2-3B-Instruct-Q4_K_M.gguf" # gpt-oss-20b
-
-def count_tokens(text: str) -> int:
-    """Simple token counter (based on character count estimation)"""
-    # This is a simplified token count, actual applications may need more precise methods
-    return int(len(text.split()) * 1.3)  # Rough estimation
-
-def save_video_data_to_json(video_data: list, file_path: str):
-    """Save video data to JSON file"""
-    try:
-        path_obj = Path(file_path)
-        with open(path_obj, 'w', encoding='utf-8') as f:
-            json.dump(video_data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        st.error(f"Error saving JSON file: {e}")
+    st.session_state.model_name = DEFAULT_MODEL # gpt-oss-20b
+if 'llm_metrics' not in st.session_state:
+    st.session_state.llm_metrics = []
+if 'context_mode' not in st.session_state:
+    st.session_state.context_mode = CONTEXT_FULL
+if 'retrieval_top_k' not in st.session_state:
+    st.session_state.retrieval_top_k = 5
 
 def load_video_data_from_json(file_path: str) -> list:
     """Load video data from JSON file"""
     try:
-        path_obj = Path(file_path)
-        if path_obj.exists():
-            with open(path_obj, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        return read_videos(file_path)
     except Exception as e:
         st.error(f"Error loading JSON file: {e}")
         return []
 
-def call_vllm_api_streaming(question: str, video_context: str, endpoint: str):
-    """Call vLLM API for Q&A with streaming support"""
-    try:
-        # Prepare the prompt with video context
-        system_prompt = """You are a helpful assistant that answers questions based on the provided video transcript. 
-        Please answer the user's question using only the information from the video transcript. 
-        If the answer cannot be found in the transcript, please say so clearly."""
-        
-        user_prompt = f"""Video Transcript:
-{video_context}
-
-Question: {question}
-
-Please answer the question based on the video transcript above."""
+def record_call_metrics(metrics: LLMCallMetrics):
+    """Keep the most recent call metrics for the diagnostics panel"""
+    st.session_state.llm_metrics.append(metrics.to_dict())
+    del st.session_state.llm_metrics[:-MAX_DIAGNOSTIC_ROWS]
 
-        # Prepare the request payload with streaming enabled
-        payload = {
-            "model": st.session_state.model_name,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 1000,
-            "stream": True
-        }
-        
-        # Make the streaming API request
-        response = requests.post(
-            endpoint,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=300,
-            stream=True
-        )
-        
-        if response.status_code == 200:
-            # Process streaming response
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    line = line.decode('utf-8')
-                    if line.startswith('data: '):
-                        data = line[6:]  # Remove 'data: ' prefix
-                        if data.strip() == '[DONE]':
-                            break
-                        try:
-                            chunk = json.loads(data)
-                            if 'choices' in chunk and len(chunk['choices']) > 0:
-                                delta = chunk['choices'][0].get('delta', {})
-                                if 'content' in delta:
-                                    content = delta['content']
-
-                                    # full_response += content
-                                    yield content  # Yield each chunk for real-time display
-                        except json.JSONDecodeError:
-                            continue
-            return full_response
+def queue_position_notifier(placeholder):
+    """Build an admission-queue callback that shows the position in a placeholder"""
+    def show_position(position: int):
+        if position:
+            placeholder.info(f"⏳ The model server is busy. Your position in queue: {position}")
         else:
-            yield f"Error calling vLLM API: {response.status_code} - {response.text}"
-            
-    except requests.exceptions.RequestException as e:
-        yield f"Error connecting to vLLM endpoint: {str(e)}"
-    except Exception as e:
-        yield f"Error processing response: {str(e)}"
+            placeholder.empty()
+    return show_position
 
-def call_vllm_api(question: str, video_context: str, endpoint: str) -> str:
-    """Call vLLM API for Q&A (non-streaming fallback)"""
-    try:
-        # Prepare the prompt with video context
-        system_prompt = """You are a helpful assistant that answers questions based on the provided video transcript. 
-        Please answer the user's question using only the information from the video transcript. 
-        If the answer cannot be found in the transcript, please say so clearly."""
-        
-        user_prompt = f"""Video Transcript:
-{video_context}
+def call_vllm_api_streaming(question: str, video_context: str, endpoint: str, on_queue=None):
+    """Call vLLM API for Q&A with streaming support (identical concurrent questions share one generation)"""
+    yield from coalesced_stream_chat(
+        question,
+        video_context,
+        endpoint,
+        st.session_state.model_name,
+        on_metrics=record_call_metrics,
+        on_queue=on_queue
+    )
 
-Question: {question}
+def build_question_context(question: str, video: dict) -> str:
+    """Transcript context for a question: the full transcript or its most relevant passages"""
+    return question_context(
+        get_artifacts(ARTIFACTS_DIR, video),
+        question,
+        SEMANTIC_INDEX_DIR,
+        st.session_state.vllm_endpoint,
+        st.session_state.model_name,
+        passages=st.session_state.context_mode == CONTEXT_PASSAGES,
+        k=st.session_state.retrieval_top_k
+    )
 
-Please answer the question based on the video transcript above."""
+def simple_qa_search(question: str, video: dict) -> str:
+    """Fallback Q&A search: BM25-ranked transcript passages with timestamps (no model server needed)"""
+    artifacts = get_artifacts(ARTIFACTS_DIR, video)
+    # Segment offsets only line up with text normalized at ingest
+    segment_map = video.get('segments') if 'normalization' in video else None
+    return answer_extractive(artifacts, question, k=3, segment_map=segment_map)
 
-        # Prepare the request payload
-        payload = {
-            "model": st.session_state.model_name,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 1000
-        }
-        
-        # Make the API request
-        response = requests.post(
-            endpoint,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=300
+def format_metric(value, unit: str = "") -> str:
+    """Format an optional metric value for display"""
+    if value is None:
+        return "-"
+    return f"{value}{unit}"
+
+def render_diagnostics(metrics_rows: list):
+    """Render recent LLM call metrics as a markdown table"""
+    if not metrics_rows:
+        st.write("No LLM calls recorded in this session yet.")
+        return
+    lines = [
+        "| Time | Model | Status | Queue | TTFT | Total | Tokens/s | Prompt chars | Prompt tokens | Output tokens |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for row in reversed(metrics_rows):
+        status = row["status"] if row["error"] is None else f"{row['status'] or '-'} ⚠️"
+        if row.get("coalesced"):
+            status = f"{status} (shared)"
+        lines.append(
+            f"| {row['timestamp']} | {row['model']} | {status} | {format_metric(row['queue_s'], ' s')} "
+            f"| {format_metric(row['ttft_s'], ' s')} "
+            f"| {format_metric(row['total_s'], ' s')} | {format_metric(row['tokens_per_s'])} "
+            f"| {row['prompt_chars']} | {row['prompt_tokens']} | {row['output_tokens']} |"
         )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            return f"Error calling vLLM API: {response.status_code} - {response.text}"
-            
-    except requests.exceptions.RequestException as e:
-        return f"Error connecting to vLLM endpoint: {str(e)}"
-    except Exception as e:
-        return f"Error processing response: {str(e)}"
+    st.markdown("\n".join(lines))
+    errors = [row for row in metrics_rows if row["error"]]
+    if errors:
+        st.caption(f"Last error: {errors[-1]['error']}")
 
-def simple_qa_search(question: str, video_context: str) -> str:
-    """Fallback Q&A search based on keyword matching"""
-    question_lower = question.lower()
-    context_sentences = video_context.split('.')
-    return f"Based on the video content: {video_context}"
+def get_chat_history(video: dict) -> ChatHistory:
+    """Chat history of this session for a video (bounded in memory, older turns on disk)"""
+    key = video_key(video)
+    if key not in st.session_state.chat_histories:
+        spill_path = CHAT_HISTORY_DIR / st.session_state.session_id / f"{key}.jsonl"
+        st.session_state.chat_histories[key] = ChatHistory(spill_path)
+    return st.session_state.chat_histories[key]
 
 def add_to_chat_history(role: str, content: str):
-    """Add message to chat history"""
-    st.session_state.chat_history.append({
+    """Add message to the selected video's chat history"""
+    get_chat_history(st.session_state.selected_video).append({
         "role": role,
         "content": content,
         "timestamp": datetime.now().strftime("%H:%M:%S")
@@ -200,12 +178,20 @@ with st.sidebar:
     
     # vLLM API Configuration
     st.subheader("🤖 LLM API Settings")
-    vllm_endpoint = st.text_input(
-        "LLM Endpoint", 
+    vllm_endpoint = st.text_area(
+        "LLM Endpoints", 
         value=st.session_state.vllm_endpoint,
-        help="Enter your vLLM API endpoint URL"
+        height=68,
+        help="Enter one or more vLLM API endpoint URLs (one per line). "
+             "Requests go to the least busy healthy endpoint and fail over on errors."
     )
-    st.session_state.vllm_endpoint = vllm_endpoint
+    st.session_state.vllm_endpoint = vllm_endpoint.strip()
+    
+    endpoint_pool = get_pool(st.session_state.vllm_endpoint)
+    if len(endpoint_pool.endpoints) > 1:
+        for endpoint_state in endpoint_pool.snapshot():
+            status_icon = "🟢" if endpoint_state["healthy"] else "🔴"
+            st.caption(f"{status_icon} {endpoint_state['url']} (in flight: {endpoint_state['outstanding']})")
     
     model_name = st.text_input(
         "Model Name", 
@@ -214,52 +200,69 @@ with st.sidebar:
     )
     st.session_state.model_name = model_name
     
+    st.session_state.context_mode = st.radio(
+        "Question context",
+        [CONTEXT_FULL, CONTEXT_PASSAGES],
+        index=[CONTEXT_FULL, CONTEXT_PASSAGES].index(st.session_state.context_mode),
+        help="Send the whole transcript, or only the passages most similar to the question"
+    )
+    if st.session_state.context_mode == CONTEXT_PASSAGES:
+        st.session_state.retrieval_top_k = st.slider(
+            "Passages per question", min_value=1, max_value=20, value=st.session_state.retrieval_top_k
+        )
+    
+    kv_warmup = st.checkbox(
+        "🔥 Warm up model on video selection",
+        value=False,
+        help="When the selected video changes, prefill its transcript in the background (max_tokens=1) "
+             "so the first question is faster on servers with prefix caching. Full transcript context only."
+    )
+    
+    show_diagnostics = st.checkbox(
+        "🩺 Show diagnostics",
+        value=False,
+        help=f"Show per-request latency metrics (also logged to {LLM_METRICS_PATH.name})"
+    )
     
     st.markdown("---")
     
     st.header("📺 Add YouTube Video")
     video_url = st.text_input("YouTube Video URL", placeholder="https://www.youtube.com/watch?v=...")
+    remove_fillers = st.checkbox(
+        "Remove filler words (uh, um, 嗯...)",
+        value=True,
+        help="Whitespace runs and repeated auto-caption fragments are always removed"
+    )
     
     if st.button("➕ Add Video to Knowledge Base", use_container_width=True):
         if video_url:
             try:
-                with st.spinner("Fetching video information..."):
-                    title, transcript = fetch_video_data(video_url)
+                step_placeholder = st.empty()
+                video_entry = ingest_video(
+                    video_url,
+                    st.session_state.data_path,
+                    SEMANTIC_INDEX_DIR,
+                    st.session_state.vllm_endpoint,
+                    st.session_state.model_name,
+                    remove_fillers=remove_fillers,
+                    background_summary=True,  # 摘要在背景產生，完成後出現在影片的摘要區塊
+                    on_step=lambda message: step_placeholder.info(f"⏳ {message}"),
+                    on_metrics=record_call_metrics,
+                    on_queue=queue_position_notifier(st.empty())
+                )
+                step_placeholder.empty()
+                st.session_state.video_data = load_video_data_from_json(st.session_state.data_path)
                 
-                if transcript != "No transcript available for this video.":
-                    # Display fetched title
-                    st.info(f"📺 **Video Title**: {title}")
-                    
-                    # Calculate token count
-                    token_count = count_tokens(transcript)
-                    
-                    # Create data structure matching requirements
-                    video_entry = {
-                        "title": title,
-                        "url": video_url,
-                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "context": transcript,
-                        "tokens": token_count
-                    }
-                    
-                    # Add to session state
-                    st.session_state.video_data.append(video_entry)
-                    
-                    # Save to JSON file
-                    save_video_data_to_json(st.session_state.video_data, st.session_state.data_path)
-                    
-                    # Call vLLM API
-                    if st.session_state.vllm_endpoint:
-                        with st.spinner("Processing video content..."):
-                            summary_question = "Please provide a brief summary of this video content."
-                            call_vllm_api(
-                                summary_question,
-                                transcript,
-                                st.session_state.vllm_endpoint
-                            )
-                    st.success(f"✅ Added video **'{title}'** to knowledge base! (Tokens: {token_count})")
-                else:
-                    st.warning(f"⚠️ Video '{title}' has no available subtitles")
+                # Display fetched title
+                st.info(f"📺 **Video Title**: {video_entry['title']}")
+                stats = video_entry['normalization']
+                st.success(
+                    f"✅ Added video **'{video_entry['title']}'** to knowledge base! (Tokens: {video_entry['tokens']}, "
+                    f"{stats['token_reduction_pct']}% fewer tokens and "
+                    f"{stats['raw_chars'] - stats['chars']} fewer characters after normalization)"
+                )
+            except IngestError as e:
+                st.warning(f"⚠️ {e}")
             except Exception as e:
                 st.error(f"❌ Error adding video: {e}")
         else:
@@ -273,14 +276,19 @@ with st.sidebar:
                 st.write(f"**URL**: {video['url']}")
                 st.write(f"**Added**: {video['timestamp']}")
                 st.write(f"**Tokens**: {video['tokens']}")
+                if 'normalization' in video:
+                    st.write(
+                        f"**Normalized**: {video['normalization']['raw_tokens']} → {video['normalization']['tokens']} tokens "
+                        f"(-{video['normalization']['token_reduction_pct']}%)"
+                    )
                 st.write(f"**Preview**: {video['context'][:100]}...")
                 
                 # Delete button for each video
                 if st.button(f"🗑️ Delete", key=f"delete_{i}", help=f"Delete '{video['title'][:30]}...'"):
-                    # Remove video from session state
-                    st.session_state.video_data.pop(i)
-                    # Save updated data to JSON file
-                    save_video_data_to_json(st.session_state.video_data, st.session_state.data_path)
+                    # Remove video from the JSON file (shared with the headless API) and session state
+                    st.session_state.video_data = remove_video(st.session_state.data_path, video_key(video))
+                    remove_video_from_indexes(SEMANTIC_INDEX_DIR, video_key(video))
+                    remove_artifacts(ARTIFACTS_DIR, video_key(video))
                     st.success(f"✅ Deleted video: {video['title'][:30]}...")
                     st.rerun()
 
@@ -298,16 +306,37 @@ if st.session_state.video_data:
     )
     
     if selected_index is not None:
+        if st.session_state.selected_video is None or \
+                video_key(st.session_state.selected_video) != video_key(st.session_state.video_data[selected_index]):
+            st.session_state.chat_window = CHAT_RENDER_WINDOW
+            # Debounced background prefill of the new video's prefix (replaces any pending warmup)
+            if kv_warmup and st.session_state.vllm_endpoint and st.session_state.context_mode == CONTEXT_FULL:
+                get_warmer().schedule(
+                    st.session_state.session_id,
+                    get_artifacts(ARTIFACTS_DIR, st.session_state.video_data[selected_index])["text"],
+                    st.session_state.vllm_endpoint,
+                    st.session_state.model_name
+                )
         st.session_state.selected_video = st.session_state.video_data[selected_index]
+        chat_history = get_chat_history(st.session_state.selected_video)
         st.info(f"📺 **Selected Video**: {st.session_state.selected_video['title']}")
+        video_summary = get_artifacts(ARTIFACTS_DIR, st.session_state.selected_video).get("summary")
+        if video_summary:
+            with st.expander("📝 Summary"):
+                st.write(video_summary)
         
         # Chat interface
         st.markdown("---")
         
-        # Display chat history
-        if st.session_state.chat_history:
+        # Display the most recent part of the chat history
+        if len(chat_history):
             st.subheader("💬 Chat History")
-            for message in st.session_state.chat_history:
+            hidden = len(chat_history) - st.session_state.chat_window
+            if hidden > 0:
+                if st.button(f"⬆️ Load {min(hidden, CHAT_RENDER_WINDOW)} earlier messages ({hidden} hidden)", key="load_more_chat"):
+                    st.session_state.chat_window += CHAT_RENDER_WINDOW
+                    st.rerun()
+            for message in chat_history.window(st.session_state.chat_window):
                 if message["role"] == "user":
                     st.markdown(f"**You** ({message['timestamp']}): {message['content']}")
                 else:
@@ -323,18 +352,23 @@ if st.session_state.video_data:
                 if user_question and st.session_state.selected_video:
                     # Add user question to chat history
                     add_to_chat_history("user", user_question)
+                    get_warmer().cancel(st.session_state.session_id)
                     
                     # Get answer from video content
                     if st.session_state.vllm_endpoint:
-                        # Create a placeholder for streaming response
+                        # Create placeholders for queue feedback and the streaming response
+                        queue_placeholder = st.empty()
                         response_placeholder = st.empty()
                         full_response = ""
                         
+                        prompt_context = build_question_context(user_question, st.session_state.selected_video)
+                        
                         # Stream the response
                         for chunk in call_vllm_api_streaming(
                             user_question, 
-                            st.session_state.selected_video['context'],
-                            st.session_state.vllm_endpoint
+                            prompt_context,
+                            st.session_state.vllm_endpoint,
+                            on_queue=queue_position_notifier(queue_placeholder)
                         ):
                             if chunk:
                                 full_response += chunk
@@ -344,7 +378,7 @@ if st.session_state.video_data:
                         add_to_chat_history("assistant", full_response)
                     else:
                         # Fallback search
-                        answer = simple_qa_search(user_question, st.session_state.selected_video['context'])
+                        answer = simple_qa_search(user_question, st.session_state.selected_video)
                         add_to_chat_history("assistant", answer)
                     
                     # Rerun to update the chat display
@@ -352,7 +386,18 @@ if st.session_state.video_data:
         
         with col2:
             if st.button("Clear Chat", use_container_width=True):
-                st.session_state.chat_history = []
+                chat_history.clear()
+                st.session_state.chat_window = CHAT_RENDER_WINDOW
                 st.rerun()
 else:
-    st.info("No videos available. Please add some YouTube videos from the sidebar first.")
\ No newline at end of file
+    st.info("No videos available. Please add some YouTube videos from the sidebar first.")
+
+# Diagnostics panel for recent LLM calls
+if show_diagnostics:
+    with st.expander("📊 LLM Diagnostics", expanded=True):
+        limiter_state = get_limiter(st.session_state.vllm_endpoint).snapshot()
+        st.caption(
+            f"Admission control: limit {limiter_state['limit']}, in flight {limiter_state['in_flight']}, "
+            f"queued {limiter_state['queued']} ({limiter_state['queued_background']} background), baseline latency {format_metric(limiter_state['baseline_latency'], ' s')}"
+        )
+        render_diagnostics(st.session_state.llm_metrics)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The repo is not an installed package: make `utils` importable from the tests
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from utils.admission import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PROCESS_SHARE_ENV, AdaptiveLimiter,
+                             get_limiter)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.01)
+
+
+def acquire_in_thread(limiter, admitted, name, **kwargs):
+    def run():
+        limiter.acquire(**kwargs)
+        admitted.append(name)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_interactive_requests_jump_ahead_of_queued_background_work():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    limiter.acquire()
+    admitted = []
+    background = acquire_in_thread(limiter, admitted, "background", priority=PRIORITY_BACKGROUND)
+    wait_until(lambda: limiter.snapshot()["queued"] == 1)
+    interactive = acquire_in_thread(limiter, admitted, "interactive", priority=PRIORITY_INTERACTIVE)
+    wait_until(lambda: limiter.snapshot()["queued"] == 2)
+
+    limiter.release()
+    interactive.join(2)
+    assert admitted == ["interactive"]
+    limiter.release()
+    background.join(2)
+    assert admitted == ["interactive", "background"]
+
+
+def test_background_work_leaves_a_slot_for_interactive_requests():
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=2, max_limit=2)
+    limiter.acquire()
+    with pytest.raises(TimeoutError):
+        limiter.acquire(priority=PRIORITY_BACKGROUND, timeout=0.2)
+    limiter.acquire(timeout=0.2)
+    assert limiter.snapshot()["in_flight"] == 2
+    assert limiter.snapshot()["queued"] == 0
+
+
+def test_background_admissions_are_rate_limited():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=4, max_limit=4, background_rate=0.0, background_burst=1)
+    limiter.acquire(priority=PRIORITY_BACKGROUND, timeout=0.2)
+    with pytest.raises(TimeoutError):
+        limiter.acquire(priority=PRIORITY_BACKGROUND, timeout=0.2)
+
+
+def test_slot_is_returned_when_the_admitted_callback_raises():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    limiter.acquire()
+    errors = []
+
+    def on_wait(position):
+        if position == 0:
+            raise RuntimeError("script stopped")
+
+    def run():
+        try:
+            limiter.acquire(on_wait=on_wait)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    wait_until(lambda: limiter.snapshot()["queued"] == 1)
+    limiter.release()
+    thread.join(2)
+    assert len(errors) == 1
+    assert limiter.snapshot()["in_flight"] == 0
+
+
+def test_failures_shrink_the_limit_and_pinning_stops_adaptation():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=1, max_limit=8)
+    for _ in range(4):
+        limiter.acquire()
+    for _ in range(4):
+        limiter.release(ok=False)
+    assert limiter.limit < 4
+
+    limiter.pin_limit(3)
+    for _ in range(6):
+        limiter.acquire()
+        limiter.release(ok=False)
+    assert limiter.limit == 3
+
+
+def test_limits_are_divided_between_processes(monkeypatch):
+    monkeypatch.setenv(PROCESS_SHARE_ENV, "4")
+    limiter = get_limiter("http://share-test-a/v1/chat/completions,http://share-test-b/v1/chat/completions")
+    assert limiter.max_limit == 8
+    assert limiter.min_limit == 1
+    assert limiter.limit == 1
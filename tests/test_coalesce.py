@@ -0,0 +1,80 @@
+import threading
+import time
+
+from utils.coalesce import StreamCoalescer, coalesce_key
+from utils.llm_metrics import LLMCallMetrics
+
+KEY = coalesce_key("What is this about?", "transcript", "http://endpoint", "model", {})
+
+
+class FakeUpstream:
+    """start() callable for StreamCoalescer.subscribe that records how it was used"""
+
+    def __init__(self, chunks=None, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.started = 0
+        self.gate = threading.Event()
+        self.closed = threading.Event()
+
+    def __call__(self, on_metrics, on_queue):
+        self.started += 1
+
+        def generate():
+            try:
+                self.gate.wait(2)
+                count = 0
+                while self.chunks is None or count < len(self.chunks):
+                    yield self.chunks[count] if self.chunks else f"chunk{count} "
+                    count += 1
+                    time.sleep(self.delay)
+                on_metrics(LLMCallMetrics(endpoint="http://endpoint", model="model", streaming=True))
+            finally:
+                self.closed.set()
+
+        return generate()
+
+
+def consume_in_thread(stream, results, name):
+    thread = threading.Thread(target=lambda: results.__setitem__(name, "".join(stream)), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_identical_questions_share_one_generation():
+    coalescer = StreamCoalescer()
+    upstream = FakeUpstream(chunks=["Hello", " ", "world"])
+    metrics = []
+    results = {}
+    threads = [
+        consume_in_thread(coalescer.subscribe(KEY, upstream, on_metrics=metrics.append), results, name)
+        for name in ("first", "second")
+    ]
+    while coalescer._flights.get(KEY) is None or coalescer._flights[KEY].subscribers < 2:
+        time.sleep(0.01)
+    upstream.gate.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert results == {"first": "Hello world", "second": "Hello world"}
+    assert upstream.started == 1
+    assert sorted(m.coalesced for m in metrics) == [False, True]
+    assert coalescer.in_flight() == 0
+
+
+def test_upstream_is_cancelled_when_every_subscriber_leaves():
+    coalescer = StreamCoalescer()
+    upstream = FakeUpstream(delay=0.01)
+    upstream.gate.set()
+    stream = coalescer.subscribe(KEY, upstream)
+    assert next(stream).startswith("chunk")
+    stream.close()
+
+    assert upstream.closed.wait(2)
+    assert coalescer.in_flight() == 0
+
+    # A later identical question starts a fresh generation instead of joining the cancelled one
+    replacement = FakeUpstream(chunks=["again"])
+    replacement.gate.set()
+    assert "".join(coalescer.subscribe(KEY, replacement)) == "again"
+    assert replacement.started == 1
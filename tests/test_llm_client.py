@@ -0,0 +1,88 @@
+import types
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from utils import endpoint_pool, llm_client  # noqa: E402
+
+CHUNK = b'data: {"choices": [{"delta": {"content": "x"}}]}'
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, lines=()):
+        self.status_code = status_code
+        self.lines = list(lines)
+        self.text = ""
+        self.closed = False
+
+    def iter_lines(self):
+        yield from self.lines
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fake_requests(monkeypatch, responses):
+    """Route requests.post to responses[url] (a FakeResponse or an exception to raise)"""
+    calls = []
+
+    def post(url, **kwargs):
+        calls.append(url)
+        result = responses[url]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(llm_client, "requests", types.SimpleNamespace(post=post, exceptions=requests.exceptions))
+    return calls
+
+
+def test_stream_response_is_closed_when_the_consumer_stops_early(monkeypatch):
+    url = "http://close-test/v1/chat/completions"
+    response = FakeResponse(lines=[CHUNK] * 100)
+    fake_requests(monkeypatch, {url: response})
+    metrics = []
+
+    stream = llm_client.stream_chat("q", "context", url, "model", on_metrics=metrics.append)
+    assert next(stream) == "x"
+    stream.close()
+
+    assert response.closed
+    assert metrics[0].error == "cancelled"
+    assert llm_client.get_limiter(url).snapshot()["in_flight"] == 0
+
+
+@pytest.mark.parametrize("failure", [requests.exceptions.ConnectionError("refused"), FakeResponse(status_code=503)])
+def test_requests_fail_over_to_the_next_endpoint(monkeypatch, failure):
+    monkeypatch.setattr(endpoint_pool.EndpointPool, "check_health", lambda self: None)
+    name = type(failure).__name__
+    down, up = f"http://{name}-a/v1/chat/completions", f"http://{name}-b/v1/chat/completions"
+    calls = fake_requests(monkeypatch, {down: failure, up: FakeResponse(lines=[CHUNK, b"data: [DONE]"])})
+    setting = f"{down},{up}"
+
+    assert "".join(llm_client.stream_chat("q", "context", setting, "model")) == "x"
+    assert calls == [down, up]
+    pool = llm_client.get_pool(setting)
+    assert {ep["url"]: ep["outstanding"] for ep in pool.snapshot()} == {down: 0, up: 0}
+    if isinstance(failure, FakeResponse):
+        assert failure.closed
+
+
+def test_replaced_pools_stop_their_health_checks(monkeypatch):
+    monkeypatch.setattr(endpoint_pool.EndpointPool, "check_health", lambda self: None)
+    pools = [
+        endpoint_pool.get_pool(f"http://evict-{i}-a/v1/chat/completions,http://evict-{i}-b/v1/chat/completions")
+        for i in range(endpoint_pool.MAX_POOLS + 2)
+    ]
+    assert len(endpoint_pool._pools) == endpoint_pool.MAX_POOLS
+    for pool in pools[:2]:
+        pool._health_thread.join(2)
+        assert not pool._health_thread.is_alive()
+    assert all(pool._health_thread.is_alive() for pool in pools[2:])
@@ -0,0 +1,129 @@
+import os
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils import semantic_index  # noqa: E402
+from utils.semantic_index import HashingEmbedder, SemanticIndex  # noqa: E402
+
+TEXTS = {
+    "alpha": "alpha beta gamma " * 150,
+    "delta": "delta epsilon zeta " * 150,
+    "kappa": "kappa lambda mu " * 150,
+}
+
+
+def top_video(index, embedder, query, videos=None):
+    hits = index.search(embedder.embed([query])[0], k=1, videos=videos)
+    return (hits[0][1]["video"], hits[0][0]) if hits else (None, 0.0)
+
+
+def stored_videos(directory):
+    index = SemanticIndex(directory)
+    index.search(np.zeros(HashingEmbedder().dim, dtype=np.float32), k=1)
+    return {video: len(rows) for video, rows in index._by_video.items()}
+
+
+def test_add_search_and_remove(tmp_path):
+    embedder = HashingEmbedder()
+    index = SemanticIndex(tmp_path)
+    added = {video: index.add_video(video, text, embedder) for video, text in TEXTS.items()}
+    assert all(count > 0 for count in added.values())
+    assert index.add_video("alpha", TEXTS["alpha"], embedder) == 0
+    assert index.is_indexed("alpha", TEXTS["alpha"])
+    assert top_video(index, embedder, "delta epsilon")[0] == "delta"
+
+    index.remove_video("delta")
+    assert stored_videos(tmp_path) == {"alpha": added["alpha"], "kappa": added["kappa"]}
+    assert top_video(index, embedder, "kappa lambda", videos=["kappa"])[1] > 0.5
+
+
+def test_instances_in_different_processes_stay_consistent(tmp_path):
+    # Two instances on one directory stand in for two processes (UI worker and API)
+    embedder = HashingEmbedder()
+    first, second = SemanticIndex(tmp_path), SemanticIndex(tmp_path)
+    first.add_video("alpha", TEXTS["alpha"], embedder)
+    second.add_video("delta", TEXTS["delta"], embedder)
+    first.add_video("kappa", TEXTS["kappa"], embedder)
+
+    video, score = top_video(second, embedder, "kappa lambda", videos=["kappa"])
+    assert video == "kappa" and score > 0.5
+    video, score = top_video(first, embedder, "delta epsilon", videos=["delta"])
+    assert video == "delta" and score > 0.5
+
+    second.remove_video("alpha")
+    assert set(stored_videos(tmp_path)) == {"delta", "kappa"}
+    assert top_video(first, embedder, "kappa lambda", videos=["kappa"])[1] > 0.5
+    assert first.video_rows("alpha") == []
+
+
+def test_interrupted_append_is_cut_back_on_disk(tmp_path):
+    embedder = HashingEmbedder()
+    index = SemanticIndex(tmp_path)
+    count = index.add_video("alpha", TEXTS["alpha"], embedder)
+    with open(tmp_path / "chunks.jsonl", "ab") as f:
+        f.write(b'{"video": "orphan", "chunk": 0, "start": 0, "end": 5, "hash": "x"}\n{"video": "ha')
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\0" * 6)
+
+    recovered = SemanticIndex(tmp_path)
+    assert stored_videos(tmp_path) == {"alpha": count}
+    assert os.path.getsize(tmp_path / "vectors.f32") == count * 4 * embedder.dim
+    # The next append lines up with its vectors
+    recovered.add_video("delta", TEXTS["delta"], embedder)
+    assert top_video(SemanticIndex(tmp_path), embedder, "delta epsilon", videos=["delta"])[1] > 0.5
+
+
+def test_interrupted_rewrite_is_finished_on_next_access(tmp_path, monkeypatch):
+    embedder = HashingEmbedder()
+    index = SemanticIndex(tmp_path)
+    for video, text in TEXTS.items():
+        index.add_video(video, text, embedder)
+
+    real_replace = os.replace
+    calls = []
+
+    def replace_once(src, dst):
+        calls.append(dst)
+        if len(calls) > 1:
+            raise OSError("power cut")
+        real_replace(src, dst)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(semantic_index.os, "replace", replace_once)
+        with pytest.raises(OSError):
+            index.remove_video("delta")
+
+    assert set(stored_videos(tmp_path)) == {"alpha", "kappa"}
+    assert not (tmp_path / "rewrite.pending").exists()
+    assert top_video(SemanticIndex(tmp_path), embedder, "kappa lambda", videos=["kappa"])[1] > 0.5
+
+
+def test_search_does_not_wait_for_a_slow_embedding(tmp_path):
+    embedder = HashingEmbedder()
+    index = SemanticIndex(tmp_path)
+    index.add_video("alpha", TEXTS["alpha"], embedder)
+
+    release = threading.Event()
+
+    class SlowEmbedder(HashingEmbedder):
+        def embed(self, texts):
+            release.wait(5)
+            return super().embed(texts)
+
+    writer = threading.Thread(target=index.add_video, args=("delta", TEXTS["delta"], SlowEmbedder()), daemon=True)
+    writer.start()
+    try:
+        searched = []
+        reader = threading.Thread(
+            target=lambda: searched.append(top_video(index, embedder, "alpha beta")), daemon=True
+        )
+        reader.start()
+        reader.join(2)
+        assert searched and searched[0][0] == "alpha"
+    finally:
+        release.set()
+        writer.join(5)
+    assert index.video_rows("delta")
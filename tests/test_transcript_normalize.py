@@ -0,0 +1,13 @@
+from utils.transcript_normalize import remove_filler_words
+
+
+def test_removes_fillers():
+    assert remove_filler_words("So um, the uh model is Hmm. fast 嗯，好") == "So the model is fast 好"
+    assert remove_filler_words("Um, we start here") == "we start here"
+
+
+def test_keeps_real_words_that_look_like_fillers():
+    assert remove_filler_words("take her to the ER room") == "take her to the ER room"
+    assert remove_filler_words("Ah Ping said er is a suffix") == "Ah Ping said er is a suffix"
+    assert remove_filler_words("UM and UH are universities, umbrella, summary") == \
+        "UM and UH are universities, umbrella, summary"
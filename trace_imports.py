@@ -0,0 +1,195 @@
+"""
+打包前的导入追踪：记录一次脚本化会话中实际用到的模块，生成 app.spec 使用的裁剪列表
+
+    uv run python trace_imports.py            # 生成 build_trace.json
+    python build.py --trim                    # 追踪 + 裁剪前后分别打包并比较大小和启动时间
+
+追踪内容：
+    1. 启动器和命令行入口（app.py、api.py、batch_ingest.py、batch_qa.py）以及启动脚本导入的 streamlit.web.cli
+    2. 真实运行一次 `streamlit run main.py`（服务器、健康检查、首页），通过 sitecustomize 记录子进程导入的模块
+    3. 用 streamlit.testing 的 AppTest 执行 main.py 的会话（脚本本身的导入），
+       并加载 utils/lazy_import.py 中登记的所有延迟导入模块
+
+输出 build_trace.json：
+    excludes       已安装但从未导入的第三方包（以及不需要的标准库大包），打包时排除
+    hiddenimports  PyInstaller 静态分析找不到的模块：main.py 作为数据文件打包，其导入不会被分析；
+                   以及通过 importlib.import_module 动态导入的模块
+"""
+import builtins
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.resolve()
+TRACE_FILE = PROJECT_ROOT / 'build_trace.json'
+FIRST_PARTY = ('app', 'api', 'batch_ingest', 'batch_qa', 'main', 'utils', 'trace_imports')
+# 无论是否导入都保留（打包本身需要，或只在特定路径中使用）
+ALWAYS_KEEP = {'streamlit', 'PyInstaller', '_pyinstaller_hooks_contrib', 'altgraph', 'setuptools', 'pkg_resources'}
+# 可以安全排除的标准库大包（仅在追踪中未被导入时排除）
+STDLIB_EXCLUDE_CANDIDATES = ['tkinter', 'turtle', 'turtledemo', 'idlelib', 'lib2to3', 'pydoc_data',
+                             'unittest', 'test', 'ensurepip', 'venv', 'distutils', 'curses', 'xmlrpc']
+
+def install_hooks(output_path, interval=None):
+    """记录导入：第一方代码的导入语句和所有 importlib.import_module 调用；退出时（或定期）写入 output_path"""
+    first_party_imports = set()
+    dynamic_imports = set()
+    original_import = builtins.__import__
+    original_import_module = importlib.import_module
+    root = str(PROJECT_ROOT)
+
+    def is_first_party(module_globals):
+        filename = (module_globals or {}).get('__file__') or ''
+        return filename.startswith(root) and '.venv' not in filename
+
+    def traced_import(name, globals=None, locals=None, fromlist=(), level=0):
+        module = original_import(name, globals, locals, fromlist, level)
+        if level == 0 and is_first_party(globals):
+            first_party_imports.add(name)
+            for item in fromlist or ():
+                if f'{name}.{item}' in sys.modules:
+                    first_party_imports.add(f'{name}.{item}')
+        return module
+
+    def traced_import_module(name, package=None):
+        module = original_import_module(name, package)
+        dynamic_imports.add(module.__name__)
+        return module
+
+    builtins.__import__ = traced_import
+    importlib.import_module = traced_import_module
+
+    def dump():
+        data = {
+            'modules': sorted(sys.modules),
+            'first_party_imports': sorted(first_party_imports),
+            'dynamic_imports': sorted(dynamic_imports),
+        }
+        tmp_path = f'{output_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, output_path)
+
+    import atexit
+    atexit.register(dump)
+    if interval:
+        # 子进程可能被强制结束（Windows 上 terminate 不会执行 atexit），所以定期写入
+        def dump_periodically():
+            while True:
+                time.sleep(interval)
+                try:
+                    dump()
+                except Exception:
+                    pass
+        threading.Thread(target=dump_periodically, daemon=True).start()
+    return dump
+
+def trace_streamlit_server(port=8765, timeout=60):
+    """真实启动一次 Streamlit 服务器并请求首页，返回子进程的导入记录"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'server_trace.json')
+        with open(os.path.join(tmp_dir, 'sitecustomize.py'), 'w', encoding='utf-8') as f:
+            f.write(f"import sys\nsys.path.insert(0, {str(PROJECT_ROOT)!r})\n"
+                    f"import trace_imports\ntrace_imports.install_hooks({output_path!r}, interval=0.5)\n")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [tmp_dir, os.environ.get('PYTHONPATH')])))
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', 'main.py', '--server.headless', 'true',
+             '--server.port', str(port), '--global.developmentMode', 'false'],
+            cwd=str(PROJECT_ROOT), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                try:
+                    for path in ('/_stcore/health', '/'):
+                        urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=2).read()
+                    break
+                except OSError:
+                    time.sleep(0.2)
+            else:
+                print(f"[WARNING] Streamlit 服务器未在 {timeout}s 内就绪，服务器部分的追踪可能不完整")
+            time.sleep(1.0)  # 等待一次定期写入
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        with open(output_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+def trace_session():
+    """在当前进程中追踪启动器入口和 main.py 的 AppTest 会话"""
+    output_path = os.path.join(tempfile.mkdtemp(), 'session_trace.json')
+    dump = install_hooks(output_path)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    # 启动器和命令行入口（打包后由 app.py 导入）
+    for module in ('app', 'api', 'batch_ingest', 'batch_qa', 'streamlit.web.cli'):
+        importlib.import_module(module)
+    # AppTest 自身的依赖不计入（运行时不需要）
+    before_apptest = set(sys.modules)
+    from streamlit.testing.v1 import AppTest
+    apptest_only = set(sys.modules) - before_apptest
+    at = AppTest.from_file(str(PROJECT_ROOT / 'main.py'), default_timeout=60)
+    at.run()
+    for checkbox in at.checkbox:
+        checkbox.check().run()
+    # utils 中延迟导入的模块（numpy、requests 等）在这次会话中不一定用到，全部加载以免被排除
+    from utils.lazy_import import load_all
+    load_all()
+    dump()
+    with open(output_path, 'r', encoding='utf-8') as f:
+        trace = json.load(f)
+    trace['apptest_only'] = sorted(apptest_only)
+    return trace
+
+def top_level(names):
+    return {name.split('.')[0] for name in names}
+
+def installed_top_level_packages():
+    """已安装的第三方顶层包名（来自包元数据）"""
+    import importlib.metadata
+    return {name for name in importlib.metadata.packages_distributions() if not name.startswith('_')} \
+        | {'_pyinstaller_hooks_contrib'}
+
+def build_trace():
+    print("[INFO] 追踪启动器入口和 main.py 会话...")
+    session = trace_session()
+    print("[INFO] 追踪 Streamlit 服务器启动...")
+    server = trace_streamlit_server()
+
+    apptest_only = set(session['apptest_only'])
+    reached = (set(session['modules']) - apptest_only) | set(server['modules'])
+    reached_top = top_level(reached)
+    installed = installed_top_level_packages()
+    excludes = sorted((installed - reached_top - ALWAYS_KEEP)
+                      | {name for name in STDLIB_EXCLUDE_CANDIDATES if name not in reached_top})
+
+    first_party = set(session['first_party_imports']) | set(server['first_party_imports'])
+    dynamic = set(session['dynamic_imports']) | set(server['dynamic_imports'])
+    stdlib = set(sys.stdlib_module_names)
+    # 第一方模块本身由 app.spec 作为脚本或数据文件打包，不需要列出
+    hiddenimports = sorted(name for name in (first_party | dynamic) & reached
+                           if name.split('.')[0] not in FIRST_PARTY)
+    trace = {
+        'python': sys.version.split()[0],
+        'reached_modules': len(reached),
+        'reached_packages': sorted(name for name in reached_top - stdlib
+                                   if name not in FIRST_PARTY and not name.startswith('_') and name != 'sitecustomize'),
+        'excludes': excludes,
+        'hiddenimports': hiddenimports,
+    }
+    TRACE_FILE.write_text(json.dumps(trace, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"[SUCCESS] 已导入 {len(reached)} 个模块；排除 {len(excludes)} 个包，"
+          f"hidden imports {len(hiddenimports)} 个 -> {TRACE_FILE.name}")
+    print(f"[INFO] 排除: {', '.join(excludes)}")
+    return trace
+
+if __name__ == '__main__':
+    build_trace()
@@ -0,0 +1,202 @@
+"""Process-wide adaptive (AIMD) admission control and priority scheduling in front of the LLM endpoint"""
+import bisect
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from utils.endpoint_pool import parse_endpoints
+
+INITIAL_LIMIT_PER_ENDPOINT = 2
+MAX_LIMIT_PER_ENDPOINT = 16
+LATENCY_TOLERANCE = 2.0     # latency above baseline * tolerance counts as congestion
+DECREASE_FACTOR = 0.7
+WAIT_POLL_INTERVAL = 0.5
+
+# Priority classes: lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+BACKGROUND_RESERVED_SLOTS = 1   # slots kept free for interactive requests
+BACKGROUND_RATE = 0.2           # background admissions per second
+BACKGROUND_BURST = 2
+
+QueueCallback = Optional[Callable[[int], None]]
+
+# Number of processes sharing each endpoint's budget (set by the launcher for --workers)
+PROCESS_SHARE_ENV = "YTCHAT_LIMITER_SHARE"
+
+
+class AdaptiveLimiter:
+    """Priority admission queue whose concurrency limit follows observed latency
+
+    The limit grows by 1/limit per uncongested completion while it is fully used
+    (additive increase) and shrinks by DECREASE_FACTOR at most once per window of
+    completions when latency exceeds the baseline or a request fails
+    (multiplicative decrease).
+
+    Waiting requests are served by priority class, FIFO within a class, so
+    interactive questions jump ahead of queued background work. Background
+    requests additionally leave BACKGROUND_RESERVED_SLOTS free and are
+    rate-limited by a token bucket, so they only use spare capacity.
+    """
+
+    def __init__(self, initial_limit: int = INITIAL_LIMIT_PER_ENDPOINT, min_limit: int = 1,
+                 max_limit: int = MAX_LIMIT_PER_ENDPOINT, background_rate: float = BACKGROUND_RATE,
+                 background_burst: int = BACKGROUND_BURST):
+        self._cond = threading.Condition()
+        self._queue = []    # sorted (priority, seq, ticket)
+        self._seq = itertools.count()
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self._baseline: Optional[float] = None
+        self._since_decrease = 0
+        self.background_rate = background_rate
+        self.background_burst = background_burst
+        self._background_tokens = float(background_burst)
+        self._background_refilled = time.monotonic()
+
+    def _slots(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def _can_admit(self, entry: tuple) -> bool:
+        if self._queue[0] is not entry:
+            return False
+        if entry[0] == PRIORITY_INTERACTIVE:
+            return self.in_flight < self._slots()
+        # Background work only takes spare capacity and is rate-limited
+        reserved = BACKGROUND_RESERVED_SLOTS if self._slots() > BACKGROUND_RESERVED_SLOTS else 0
+        if self.in_flight >= self._slots() - reserved:
+            return False
+        now = time.monotonic()
+        self._background_tokens = min(
+            self.background_burst,
+            self._background_tokens + (now - self._background_refilled) * self.background_rate
+        )
+        self._background_refilled = now
+        return self._background_tokens >= 1.0
+
+    def acquire(self, on_wait: QueueCallback = None, timeout: Optional[float] = None,
+                priority: int = PRIORITY_INTERACTIVE):
+        """Block until admitted; on_wait(position) reports the queue position, then 0 once admitted"""
+        entry = (priority, next(self._seq), object())
+        reported = None
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            bisect.insort(self._queue, entry)
+            # Let waiters re-check their position now that the order changed
+            self._cond.notify_all()
+            try:
+                while not self._can_admit(entry):
+                    position = self._queue.index(entry) + 1
+                    if on_wait and position != reported:
+                        reported = position
+                        # Run the UI callback without holding the lock
+                        self._cond.release()
+                        try:
+                            on_wait(position)
+                        finally:
+                            self._cond.acquire()
+                        continue
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise TimeoutError("Timed out waiting for an LLM slot")
+                    self._cond.wait(WAIT_POLL_INTERVAL)
+                self._queue.pop(0)
+                if priority != PRIORITY_INTERACTIVE:
+                    self._background_tokens -= 1.0
+                self.in_flight += 1
+            finally:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                # The next ticket may be admissible too
+                self._cond.notify_all()
+        if on_wait and reported is not None:
+            try:
+                on_wait(0)
+            except BaseException:
+                # The caller never receives the slot (e.g. Streamlit stopped the script
+                # inside the callback), so give it back instead of leaking it
+                with self._cond:
+                    self.in_flight = max(0, self.in_flight - 1)
+                    self._cond.notify_all()
+                raise
+
+    def release(self, latency: Optional[float] = None, ok: bool = True):
+        """Return a slot and feed the observed latency into the limit"""
+        with self._cond:
+            saturated = self.in_flight >= self._slots()
+            self.in_flight = max(0, self.in_flight - 1)
+            self._since_decrease += 1
+            if not ok:
+                self._decrease()
+            elif latency is not None:
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    # Let the baseline drift up slowly so it tracks model/hardware changes
+                    self._baseline = self._baseline * 0.99 + latency * 0.01
+                if latency > self._baseline * LATENCY_TOLERANCE:
+                    self._decrease()
+                elif saturated:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def pin_limit(self, limit: int):
+        """Hold the limit at `limit` slots, without adaptation (load tests that set their own concurrency)"""
+        with self._cond:
+            self.min_limit = self.max_limit = max(1, limit)
+            self.limit = float(self.min_limit)
+            self._cond.notify_all()
+
+    def _decrease(self):
+        if self._since_decrease >= self._slots():
+            self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+            self._since_decrease = 0
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queued": len(self._queue),
+                "queued_background": sum(1 for entry in self._queue if entry[0] != PRIORITY_INTERACTIVE),
+                "baseline_latency": round(self._baseline, 3) if self._baseline is not None else None,
+            }
+
+
+_limiters: Dict[Tuple[str, ...], AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def process_share() -> int:
+    """How many processes split the endpoint budget (1 unless the launcher says otherwise)"""
+    try:
+        return max(1, int(os.environ.get(PROCESS_SHARE_ENV, "1")))
+    except ValueError:
+        return 1
+
+
+def get_limiter(endpoint_setting: str) -> AdaptiveLimiter:
+    """Return the process-wide limiter for an endpoint setting
+
+    Capacity scales with pool size and is divided by process_share(), so several
+    UI workers together stay within the budget of one process.
+    """
+    urls = tuple(parse_endpoints(endpoint_setting))
+    with _limiters_lock:
+        limiter = _limiters.get(urls)
+        if limiter is None:
+            count = max(1, len(urls))
+            share = process_share()
+            max_limit = max(1, MAX_LIMIT_PER_ENDPOINT * count // share)
+            limiter = AdaptiveLimiter(
+                initial_limit=min(max_limit, max(1, INITIAL_LIMIT_PER_ENDPOINT * count // share)),
+                min_limit=max(1, count // share),
+                max_limit=max_limit,
+                background_rate=BACKGROUND_RATE / share
+            )
+            _limiters[urls] = limiter
+        return limiter
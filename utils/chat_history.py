@@ -0,0 +1,66 @@
+"""Bounded per-video chat history: recent turns in memory, older turns spilled to disk"""
+import json
+import shutil
+import time
+from collections import deque
+from pathlib import Path
+from typing import List
+
+MAX_IN_MEMORY_MESSAGES = 40
+SPILL_RETENTION_DAYS = 7
+
+
+class ChatHistory:
+    """Chat log of one session for one video"""
+
+    def __init__(self, spill_path: Path, max_in_memory: int = MAX_IN_MEMORY_MESSAGES):
+        self.spill_path = Path(spill_path)
+        self.max_in_memory = max_in_memory
+        self.recent: List[dict] = []
+        self.spilled = 0
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.recent)
+
+    def append(self, message: dict):
+        self.recent.append(message)
+        if len(self.recent) > self.max_in_memory:
+            # Spill the older half in one write so appends stay cheap
+            overflow = len(self.recent) - self.max_in_memory // 2
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for old in self.recent[:overflow]:
+                    f.write(json.dumps(old, ensure_ascii=False) + "\n")
+            self.spilled += overflow
+            del self.recent[:overflow]
+
+    def window(self, count: int) -> List[dict]:
+        """The last count messages, reading spilled ones from disk only when needed"""
+        if count <= len(self.recent):
+            return self.recent[len(self.recent) - count:]
+        older = []
+        needed = min(count - len(self.recent), self.spilled)
+        if needed and self.spill_path.exists():
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                older = [json.loads(line) for line in deque(f, maxlen=needed)]
+        return older + self.recent
+
+    def clear(self):
+        self.recent = []
+        self.spilled = 0
+        if self.spill_path.exists():
+            self.spill_path.unlink()
+
+
+def prune_spill_dirs(root: Path, max_age_days: int = SPILL_RETENTION_DAYS):
+    """Remove spilled history of sessions untouched for max_age_days"""
+    root = Path(root)
+    if not root.exists():
+        return
+    cutoff = time.time() - max_age_days * 86400
+    for session_dir in root.iterdir():
+        try:
+            if session_dir.is_dir() and session_dir.stat().st_mtime < cutoff:
+                shutil.rmtree(session_dir, ignore_errors=True)
+        except OSError:
+            pass
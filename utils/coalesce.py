@@ -0,0 +1,157 @@
+"""Single-flight coalescing of identical in-flight streaming questions"""
+import copy
+import hashlib
+import re
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.admission import PRIORITY_INTERACTIVE, QueueCallback
+from utils.llm_client import DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, MetricsCallback, stream_chat
+from utils.llm_metrics import LLMCallMetrics
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r'\s+', ' ', question.casefold()).strip()
+    return re.sub(r'[\s?？!！.。,，]+$', '', question)
+
+
+def coalesce_key(question: str, video_context: str, endpoint: str, model: str, params: dict) -> Tuple:
+    """Key identical generations: same transcript, question, model, endpoint and sampling parameters"""
+    context_digest = hashlib.sha1(video_context.encode('utf-8')).hexdigest()
+    return (
+        context_digest,
+        normalize_question(question),
+        model,
+        endpoint,
+        params.get("temperature", DEFAULT_TEMPERATURE),
+        params.get("max_tokens", DEFAULT_MAX_TOKENS),
+    )
+
+
+class Flight:
+    """One upstream generation whose chunks are buffered for every subscriber"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks: List[str] = []
+        self.done = False
+        self.queue_position = 0
+        self.metrics: Optional[LLMCallMetrics] = None
+        self.subscribers = 0
+
+
+class StreamCoalescer:
+    """Registry of in-flight generations keyed by coalesce_key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple, Flight] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def subscribe(self, key: Tuple, start: Callable[..., Iterator[str]],
+                  on_metrics: MetricsCallback = None, on_queue: QueueCallback = None) -> Iterator[str]:
+        """Stream the generation for key, starting it with start(on_metrics, on_queue) if none is running"""
+        # Registration happens on first iteration, so an unconsumed generator holds no subscription
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight()
+                self._flights[key] = flight
+            with flight.cond:
+                flight.subscribers += 1
+        if leader:
+            threading.Thread(
+                target=self._run, args=(key, flight, start), name="CoalescedStream", daemon=True
+            ).start()
+        yield from self._follow(key, flight, leader, on_metrics, on_queue)
+
+    def _run(self, key: Tuple, flight: Flight, start: Callable[..., Iterator[str]]):
+        """Drive the upstream stream in a worker thread so no single session owns it"""
+
+        def keep_metrics(metrics: LLMCallMetrics):
+            flight.metrics = metrics
+
+        def publish_position(position: int):
+            with flight.cond:
+                flight.queue_position = position
+                flight.cond.notify_all()
+
+        upstream = start(keep_metrics, publish_position)
+        try:
+            for chunk in upstream:
+                with flight.cond:
+                    if flight.subscribers == 0:
+                        break  # Everyone left; stop generating
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        finally:
+            upstream.close()
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    def _follow(self, key: Tuple, flight: Flight, leader: bool,
+                on_metrics: MetricsCallback, on_queue: QueueCallback) -> Iterator[str]:
+        index = 0
+        reported_position = 0
+        finished = False
+        try:
+            while True:
+                with flight.cond:
+                    while index >= len(flight.chunks) and not flight.done \
+                            and flight.queue_position == reported_position:
+                        flight.cond.wait()
+                    new_chunks = flight.chunks[index:]
+                    index += len(new_chunks)
+                    position = flight.queue_position
+                    done = flight.done and index >= len(flight.chunks)
+                if on_queue and position != reported_position:
+                    on_queue(position)
+                reported_position = position
+                for chunk in new_chunks:
+                    yield chunk
+                if done:
+                    finished = True
+                    break
+            if finished and on_metrics and flight.metrics is not None:
+                metrics = flight.metrics
+                if not leader:
+                    metrics = copy.copy(metrics)
+                    metrics.coalesced = True
+                on_metrics(metrics)
+        finally:
+            with flight.cond:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.done
+            if abandoned:
+                # Later identical questions must not join a flight that is being cancelled
+                with self._lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+
+
+_coalescer = StreamCoalescer()
+
+
+def coalesced_stream_chat(question: str, video_context: str, endpoint: str, model: str,
+                          on_metrics: MetricsCallback = None, on_queue: QueueCallback = None,
+                          priority: int = PRIORITY_INTERACTIVE, **params) -> Iterator[str]:
+    """Like stream_chat, but identical concurrent questions share one upstream generation"""
+    key = coalesce_key(question, video_context, endpoint, model, params)
+
+    def start(upstream_on_metrics, upstream_on_queue):
+        return stream_chat(
+            question, video_context, endpoint, model,
+            on_metrics=upstream_on_metrics, on_queue=upstream_on_queue,
+            priority=priority, **params
+        )
+
+    return _coalescer.subscribe(key, start, on_metrics=on_metrics, on_queue=on_queue)
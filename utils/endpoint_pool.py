@@ -0,0 +1,163 @@
+"""Pool of OpenAI-compatible endpoints with least-outstanding routing, health checks and failover"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+HEALTH_CHECK_INTERVAL = 10      # seconds between background probes
+HEALTH_CHECK_TIMEOUT = 3
+FAILURE_THRESHOLD = 2           # consecutive failures before an endpoint is taken out of rotation
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_POOLS = 4                   # endpoint settings kept alive; older ones stop their health checks
+
+
+class Endpoint:
+    """Routing state for a single chat completions URL"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_acquired = 0.0
+
+
+def parse_endpoints(text: str) -> List[str]:
+    """Split the sidebar endpoint setting (newline or comma separated) into unique URLs"""
+    urls = []
+    for url in re.split(r'[\s,]+', text or ""):
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def health_url(endpoint_url: str) -> str:
+    """Derive the model listing URL used as a health probe from a chat completions URL"""
+    if endpoint_url.endswith("/chat/completions"):
+        return endpoint_url[:-len("/chat/completions")] + "/models"
+    return endpoint_url.rstrip("/") + "/models"
+
+
+class EndpointPool:
+    """Thread-safe set of endpoints shared by every session in the process"""
+
+    def __init__(self, urls: List[str]):
+        self._lock = threading.Lock()
+        self.endpoints: Dict[str, Endpoint] = {url: Endpoint(url) for url in urls}
+        self._health_thread: Optional[threading.Thread] = None
+        self._health_stop = threading.Event()
+
+    def candidates(self) -> List[str]:
+        """Healthy endpoints by fewest outstanding requests, unhealthy ones last as a last resort"""
+        with self._lock:
+            ordered = sorted(
+                self.endpoints.values(),
+                key=lambda ep: (not ep.healthy, ep.outstanding, ep.last_acquired)
+            )
+            return [ep.url for ep in ordered]
+
+    def acquire(self, url: str):
+        with self._lock:
+            endpoint = self.endpoints[url]
+            endpoint.outstanding += 1
+            endpoint.last_acquired = time.monotonic()
+
+    def release(self, url: str, ok: bool = True, error: Optional[str] = None):
+        with self._lock:
+            endpoint = self.endpoints[url]
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if ok:
+                self._mark(endpoint, True)
+            else:
+                self._mark(endpoint, False, error)
+
+    def _mark(self, endpoint: Endpoint, ok: bool, error: Optional[str] = None):
+        if ok:
+            endpoint.consecutive_failures = 0
+            endpoint.healthy = True
+            endpoint.last_error = None
+        else:
+            endpoint.consecutive_failures += 1
+            endpoint.last_error = error
+            if endpoint.consecutive_failures >= FAILURE_THRESHOLD:
+                endpoint.healthy = False
+
+    def snapshot(self) -> List[dict]:
+        """Current routing state for display"""
+        with self._lock:
+            return [
+                {
+                    "url": ep.url,
+                    "healthy": ep.healthy,
+                    "outstanding": ep.outstanding,
+                    "last_error": ep.last_error,
+                }
+                for ep in self.endpoints.values()
+            ]
+
+    def check_health(self):
+        """Probe every endpoint once and update its health"""
+        for url in list(self.endpoints):
+            try:
+                response = requests.get(health_url(url), timeout=HEALTH_CHECK_TIMEOUT)
+                ok = response.status_code < 500
+                error = None if ok else f"HTTP {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                ok, error = False, str(e)
+            with self._lock:
+                endpoint = self.endpoints[url]
+                if ok:
+                    self._mark(endpoint, True)
+                else:
+                    # A failed probe takes the endpoint out of rotation immediately
+                    endpoint.consecutive_failures = max(endpoint.consecutive_failures, FAILURE_THRESHOLD - 1)
+                    self._mark(endpoint, False, error)
+
+    def start_health_checks(self, interval: float = HEALTH_CHECK_INTERVAL):
+        """Start the background health probe thread (once per pool)"""
+        if self._health_thread is not None:
+            return
+
+        def _loop():
+            while not self._health_stop.is_set():
+                self.check_health()
+                self._health_stop.wait(interval)
+
+        self._health_thread = threading.Thread(target=_loop, name="EndpointHealthCheck", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        """Stop the probe thread (it exits after the probe in progress, if any)"""
+        self._health_stop.set()
+
+
+_pools: "OrderedDict[Tuple[str, ...], EndpointPool]" = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def get_pool(endpoint_setting: str) -> EndpointPool:
+    """Return the process-wide pool for an endpoint setting, creating it on first use
+
+    Only the MAX_POOLS most recently used settings are kept, so editing the sidebar
+    setting does not leave a health-check thread behind for every value typed.
+    Requests still holding an evicted pool finish normally.
+    """
+    urls = tuple(parse_endpoints(endpoint_setting))
+    with _pools_lock:
+        pool = _pools.get(urls)
+        if pool is None:
+            pool = EndpointPool(list(urls))
+            _pools[urls] = pool
+            if len(urls) > 1:
+                pool.start_health_checks()
+            while len(_pools) > MAX_POOLS:
+                _pools.popitem(last=False)[1].stop_health_checks()
+        else:
+            _pools.move_to_end(urls)
+        return pool
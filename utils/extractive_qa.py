@@ -0,0 +1,136 @@
+"""Local extractive question answering: BM25 over transcript sentences, no model server needed"""
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.lazy_import import lazy_import
+from utils.text_utils import tokenize
+from utils.transcript_normalize import segment_start_at
+
+np = lazy_import("numpy")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+CONTEXT_SENTENCES = 1       # neighbours included on each side of a hit
+MAX_CACHED_INDEXES = 32
+
+
+class SentenceIndex:
+    """BM25 scorer over the sentence postings stored in a video's artifacts"""
+
+    def __init__(self, artifacts: dict):
+        self.postings = artifacts["postings"]
+        self.doc_lengths = np.asarray(artifacts["sentence_terms"], dtype=np.float32)
+        self.count = len(self.doc_lengths)
+        average = float(self.doc_lengths.mean()) if self.count else 1.0
+        # Per-sentence length normalisation is shared by all terms
+        self.norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / max(average, 1e-6))
+        self._arrays: Dict[str, Tuple["np.ndarray", "np.ndarray"]] = {}
+
+    def _term(self, term: str) -> Optional[Tuple["np.ndarray", "np.ndarray"]]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            entries = self.postings.get(term)
+            if not entries:
+                return None
+            matrix = np.asarray(entries, dtype=np.int64)
+            arrays = (matrix[:, 0], matrix[:, 1].astype(np.float32))
+            self._arrays[term] = arrays
+        return arrays
+
+    def scores(self, question: str) -> "np.ndarray":
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in set(tokenize(question)):
+            arrays = self._term(term)
+            if arrays is None:
+                continue
+            rows, frequencies = arrays
+            idf = math.log(1 + (self.count - rows.size + 0.5) / (rows.size + 0.5))
+            scores[rows] += idf * frequencies * (BM25_K1 + 1) / (frequencies + self.norm[rows])
+        return scores
+
+    def top(self, question: str, k: int) -> List[Tuple[int, float]]:
+        """Up to k (sentence, score) pairs with a positive score, best first"""
+        scores = self.scores(question)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+
+_indexes: "OrderedDict[tuple, SentenceIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_sentence_index(artifacts: dict) -> SentenceIndex:
+    """Cached scorer for one version of a video's artifacts"""
+    key = (artifacts["video"], artifacts["source_hash"], artifacts["version"])
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = SentenceIndex(artifacts)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def extract_passages(artifacts: dict, question: str, k: int = 3,
+                     segment_map: Optional[List[list]] = None) -> List[dict]:
+    """Best-matching sentences with their neighbours, in transcript order
+
+    Each passage has start/end offsets, its score, text and, when a segment map
+    is available, the start time in seconds.
+    """
+    sentences = artifacts["sentences"]
+    hits = get_sentence_index(artifacts).top(question, k)
+    ranges = []
+    for sentence, score in sorted(hits):
+        first = max(0, sentence - CONTEXT_SENTENCES)
+        last = min(len(sentences) - 1, sentence + CONTEXT_SENTENCES)
+        if ranges and first <= ranges[-1][1] + 1:
+            ranges[-1] = [ranges[-1][0], max(ranges[-1][1], last), max(ranges[-1][2], score)]
+        else:
+            ranges.append([first, last, score])
+    text = artifacts["text"]
+    passages = []
+    for first, last, score in ranges:
+        start, end = sentences[first][0], sentences[last][1]
+        passages.append({
+            "start": start,
+            "end": end,
+            "score": round(score, 3),
+            "text": text[start:end],
+            "time": segment_start_at(segment_map, start) if segment_map else None,
+        })
+    return passages
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def answer_extractive(artifacts: dict, question: str, k: int = 3, segment_map: Optional[List[list]] = None) -> str:
+    """Markdown answer quoting the most relevant transcript passages with timestamps"""
+    return format_extractive_answer(artifacts, extract_passages(artifacts, question, k=k, segment_map=segment_map))
+
+
+def format_extractive_answer(artifacts: dict, passages: List[dict]) -> str:
+    """Markdown answer for passages already returned by extract_passages"""
+    if not passages:
+        opening = artifacts["text"][:500]
+        return f"No passage of the video matched the question. The video begins: \"{opening}...\""
+    lines = ["Most relevant passages from the video:"]
+    for passage in sorted(passages, key=lambda passage: -passage["score"]):
+        stamp = f"**[{format_timestamp(passage['time'])}]** " if passage["time"] is not None else ""
+        lines.append(f"- {stamp}{passage['text'].strip()}")
+    return "\n".join(lines)
@@ -0,0 +1,195 @@
+"""Shared add-video pipeline: fetch, normalize, store, index and (optionally) summarize"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from utils.admission import PRIORITY_BACKGROUND
+from utils.llm_client import MetricsCallback, complete_chat
+from utils.parsing_yt import TranscriptError, fetch_video_segments
+from utils.semantic_index import index_video
+from utils.text_utils import count_tokens
+from utils.transcript_normalize import normalization_stats, normalize_segments
+from utils.video_artifacts import artifacts_dir_for, chunk_spans, save_artifacts, save_summary, text_hash
+from utils.video_store import find_video, read_videos, upsert_video, upsert_videos, url_key, video_key
+
+SUMMARY_QUESTION = "Please provide a brief summary of this video content."
+BATCH_FLUSH_EVERY = 20          # entries per store write during batch ingest
+BATCH_FLUSH_SECONDS = 10.0
+
+logger = logging.getLogger("ytchat.ingest")
+
+
+class IngestError(Exception):
+    """The video could not be added (e.g. no transcript available)"""
+
+
+def build_video_entry(video_url: str, remove_fillers: bool = True) -> dict:
+    """Fetch a video and build its normalized store entry (not saved)"""
+    try:
+        title, segments = fetch_video_segments(video_url)
+    except TranscriptError as e:
+        raise IngestError(str(e)) from e
+    if not segments:
+        raise IngestError(f"Video '{title}' has no available subtitles")
+
+    raw_transcript = " ".join(segment["text"] for segment in segments)
+    transcript, segment_map = normalize_segments(segments, remove_fillers=remove_fillers)
+    return {
+        "title": title,
+        "url": video_url,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "context": transcript,
+        "tokens": count_tokens(transcript),
+        "text_hash": text_hash(transcript),
+        "segments": segment_map,
+        "normalization": normalization_stats(raw_transcript, transcript)
+    }
+
+
+def ingest_video(video_url: str, data_path, index_dir: Path, endpoint: str, model: str,
+                 remove_fillers: bool = True, summarize: bool = True, background_summary: bool = False,
+                 on_step: Optional[Callable[[str], None]] = None,
+                 on_metrics: MetricsCallback = None, on_queue=None) -> dict:
+    """Add one video to the store, its artifacts and the semantic index; returns the stored entry
+
+    The summary request runs at background priority so it never delays chat;
+    the summary is kept in the video's artifacts. With background_summary the
+    video is returned as soon as it is indexed and the summary is written to its
+    artifacts later by a daemon thread (on_metrics and on_queue are not used for it).
+    """
+    def step(message: str):
+        if on_step:
+            on_step(message)
+
+    step("Fetching video information...")
+    entry = build_video_entry(video_url, remove_fillers=remove_fillers)
+
+    step("Saving to knowledge base...")
+    upsert_video(data_path, entry)
+
+    step("Indexing transcript...")
+    _index(entry, data_path, index_dir, endpoint, model)
+
+    if summarize and endpoint:
+        if background_summary:
+            threading.Thread(target=_summarize_later, args=(entry, data_path, endpoint, model),
+                             name="video-summary", daemon=True).start()
+        else:
+            step("Processing video content...")
+            _summarize(entry, data_path, endpoint, model, on_metrics=on_metrics, on_queue=on_queue)
+    return entry
+
+
+def _index(entry: dict, data_path, index_dir: Path, endpoint: str, model: str):
+    artifacts = save_artifacts(artifacts_dir_for(data_path), entry)
+    index_video(index_dir, video_key(entry), artifacts["text"], endpoint, model, chunks=chunk_spans(artifacts))
+
+
+def _summarize(entry: dict, data_path, endpoint: str, model: str,
+               on_metrics: MetricsCallback = None, on_queue=None, keep: Callable[[], bool] = lambda: True):
+    """Summarize the video and store the summary in its artifacts (unless keep() says it was deleted)"""
+    failed = []
+
+    def check(metrics):
+        if metrics.error:
+            failed.append(metrics.error)
+        if on_metrics:
+            on_metrics(metrics)
+
+    summary = complete_chat(
+        SUMMARY_QUESTION,
+        entry["context"],
+        endpoint,
+        model,
+        on_metrics=check,
+        on_queue=on_queue,
+        priority=PRIORITY_BACKGROUND
+    )
+    if not failed and keep():
+        save_summary(artifacts_dir_for(data_path), entry, summary)
+
+
+def _summarize_later(entry: dict, data_path, endpoint: str, model: str):
+    try:
+        _summarize(entry, data_path, endpoint, model,
+                   keep=lambda: find_video(read_videos(data_path), video_key(entry)) is not None)
+    except Exception:
+        logger.exception("Background summary of %s failed", entry.get("url"))
+
+
+def read_url_list(lines: Iterable[str]) -> List[str]:
+    """URLs from a list file: first token per line; blank lines and # comments skipped, duplicates dropped"""
+    urls = []
+    seen = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        url = line.split()[0]
+        if url_key(url) not in seen:
+            seen.add(url_key(url))
+            urls.append(url)
+    return urls
+
+
+def ingest_batch(urls: List[str], data_path, index_dir: Path, endpoint: str, model: str,
+                 jobs: int = 8, remove_fillers: bool = True, summarize: bool = False,
+                 on_result: Optional[Callable[[str, Optional[dict], Optional[str]], None]] = None
+                 ) -> Tuple[List[dict], List[str], List[Tuple[str, str]]]:
+    """Ingest many URLs in parallel; returns (added entries, skipped URLs, [(url, error)])
+
+    URLs whose video is already stored are skipped, so an interrupted run can simply
+    be repeated. Fetching and indexing run in worker threads; finished entries are
+    written to the store in batches to avoid rewriting the file once per video.
+    """
+    stored = {video_key(video) for video in read_videos(data_path)}
+    skipped = [url for url in urls if url_key(url) in stored]
+    pending_urls = [url for url in urls if url_key(url) not in stored]
+
+    def prepare(url: str) -> dict:
+        entry = build_video_entry(url, remove_fillers=remove_fillers)
+        _index(entry, data_path, index_dir, endpoint, model)
+        if summarize and endpoint:
+            _summarize(entry, data_path, endpoint, model)
+        return entry
+
+    added, failures, unsaved = [], [], []
+    last_flush = time.monotonic()
+
+    def flush():
+        nonlocal last_flush
+        if unsaved:
+            upsert_videos(data_path, unsaved)
+            added.extend(unsaved)
+            unsaved.clear()
+        last_flush = time.monotonic()
+
+    executor = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="ingest")
+    futures = {executor.submit(prepare, url): url for url in pending_urls}
+    try:
+        remaining = set(futures)
+        while remaining:
+            done, remaining = wait(remaining, timeout=BATCH_FLUSH_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    failures.append((url, str(e)))
+                    if on_result:
+                        on_result(url, None, str(e))
+                    continue
+                unsaved.append(entry)
+                if on_result:
+                    on_result(url, entry, None)
+            if len(unsaved) >= BATCH_FLUSH_EVERY or time.monotonic() - last_flush >= BATCH_FLUSH_SECONDS:
+                flush()
+    finally:
+        # On interruption keep whatever finished; queued URLs are picked up by the next run
+        executor.shutdown(wait=False, cancel_futures=True)
+        flush()
+    return added, skipped, failures
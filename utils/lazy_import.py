@@ -0,0 +1,67 @@
+"""Deferred imports for heavy dependencies that the first page render does not need
+
+``np = lazy_import("numpy")`` binds a placeholder module; the real import runs on
+first attribute access and its namespace is copied onto the placeholder, so later
+lookups cost the same as with a normal import. numpy, requests and
+youtube_transcript_api are only needed once a question is scored, an endpoint is
+called or a video is added, so deferring them keeps them off the cold start path.
+
+Every lazy module is registered in LAZY_MODULES; ``load_all()`` imports them so
+the packaging import trace (trace_imports.py) still sees them.
+"""
+import importlib
+import threading
+import types
+from typing import Dict
+
+LAZY_MODULES: Dict[str, "LazyModule"] = {}
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports the real module on first attribute access"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            with _lock:
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        # Only reached for names not copied yet (before the first load, or
+        # attributes the real module creates lazily itself)
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Placeholder for module `name`; one shared instance per module name"""
+    with _lock:
+        module = LAZY_MODULES.get(name)
+        if module is None:
+            module = LAZY_MODULES[name] = LazyModule(name)
+    return module
+
+
+def is_loaded(name: str) -> bool:
+    module = LAZY_MODULES.get(name)
+    return module is not None and module.__dict__["_lazy_module"] is not None
+
+
+def load_all():
+    """Import every registered lazy module (used by the import trace)"""
+    for module in list(LAZY_MODULES.values()):
+        module._load()
@@ -0,0 +1,292 @@
+"""Prompt builders and OpenAI-compatible chat completion calls shared by the UI and tools"""
+import json
+from typing import Callable, Iterator, List, Optional
+
+from utils.admission import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, QueueCallback, get_limiter
+from utils.endpoint_pool import RETRYABLE_STATUS, EndpointPool, get_pool
+from utils.lazy_import import lazy_import
+from utils.llm_metrics import LLMCallMetrics, record_metrics
+from utils.text_utils import count_tokens
+
+requests = lazy_import("requests")
+
+SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided video transcript.
+        Please answer the user's question using only the information from the video transcript.
+        If the answer cannot be found in the transcript, please say so clearly."""
+
+DEFAULT_ENDPOINT = "http://localhost:13141/v1/chat/completions"
+DEFAULT_MODEL = "Llama-3.2-3B-Instruct-Q4_K_M.gguf"
+DEFAULT_TEMPERATURE = 0.7
+DEFAULT_MAX_TOKENS = 1000
+CONNECT_TIMEOUT = 5
+REQUEST_TIMEOUT = 300
+
+MetricsCallback = Optional[Callable[[LLMCallMetrics], None]]
+
+
+def build_user_prompt(question: str, video_context: str) -> str:
+    """Build the user message with the transcript placed before the question"""
+    return f"""Video Transcript:
+{video_context}
+
+Question: {question}
+
+Please answer the question based on the video transcript above."""
+
+
+def build_messages(question: str, video_context: str) -> List[dict]:
+    """Build the chat messages for a transcript question"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_prompt(question, video_context)}
+    ]
+
+
+def build_payload(question: str, video_context: str, model: str, stream: bool = False,
+                  temperature: float = DEFAULT_TEMPERATURE, max_tokens: int = DEFAULT_MAX_TOKENS) -> dict:
+    """Build the chat completion request payload"""
+    payload = {
+        "model": model,
+        "messages": build_messages(question, video_context),
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    if stream:
+        payload["stream"] = True
+        # Ask the server to report usage in the final chunk (ignored by servers without support)
+        payload["stream_options"] = {"include_usage": True}
+    return payload
+
+
+def _new_metrics(payload: dict, endpoint: str, streaming: bool) -> LLMCallMetrics:
+    prompt_text = "".join(message["content"] for message in payload["messages"])
+    return LLMCallMetrics(
+        endpoint=endpoint,
+        model=payload["model"],
+        streaming=streaming,
+        prompt_chars=len(prompt_text),
+        prompt_tokens=count_tokens(prompt_text)
+    )
+
+
+def _apply_usage(metrics: LLMCallMetrics, usage: Optional[dict]):
+    """Prefer server-reported token counts over local estimates"""
+    if not usage:
+        return
+    if usage.get("prompt_tokens"):
+        metrics.prompt_tokens = usage["prompt_tokens"]
+    if usage.get("completion_tokens"):
+        metrics.output_tokens = usage["completion_tokens"]
+
+
+def _open_response(pool: EndpointPool, payload: dict, stream: bool):
+    """POST to the least loaded endpoint, failing over to the next one on errors or timeouts
+
+    Returns (url, response); the caller owns the lease on url and must release it.
+    """
+    candidates = pool.candidates()
+    for index, url in enumerate(candidates):
+        is_last = index == len(candidates) - 1
+        pool.acquire(url)
+        try:
+            response = requests.post(
+                url,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=(CONNECT_TIMEOUT, REQUEST_TIMEOUT),
+                stream=stream
+            )
+        except requests.exceptions.RequestException as e:
+            pool.release(url, ok=False, error=str(e))
+            if is_last:
+                raise
+            continue
+        if response.status_code in RETRYABLE_STATUS and not is_last:
+            pool.release(url, ok=False, error=f"HTTP {response.status_code}")
+            response.close()
+            continue
+        return url, response
+    raise requests.exceptions.ConnectionError("No LLM endpoint configured")
+
+
+def _is_endpoint_ok(metrics: LLMCallMetrics) -> bool:
+    """Whether a finished call counts against the endpoint's health"""
+    if metrics.error == "cancelled":
+        return True
+    if metrics.status is None or metrics.status in RETRYABLE_STATUS or metrics.status >= 500:
+        return False
+    # A 200 that broke mid-stream is an endpoint failure; 4xx errors are the request's fault
+    return not (metrics.status == 200 and metrics.error)
+
+
+def _congestion_latency(metrics: LLMCallMetrics) -> Optional[float]:
+    """TTFT normalised per 1k prompt tokens, so long transcripts do not look like congestion"""
+    if metrics.ttft_s is None:
+        return None
+    return metrics.ttft_s / max(1.0, metrics.prompt_tokens / 1000)
+
+
+def _report(metrics: LLMCallMetrics, on_metrics: MetricsCallback):
+    record_metrics(metrics)
+    if on_metrics:
+        on_metrics(metrics)
+
+
+def stream_chat(question: str, video_context: str, endpoint: str, model: str,
+                on_metrics: MetricsCallback = None, on_queue: QueueCallback = None,
+                priority: int = PRIORITY_INTERACTIVE, **params) -> Iterator[str]:
+    """Stream an answer chunk by chunk, recording metrics when the stream ends
+
+    endpoint may list several URLs; requests are routed through the shared endpoint pool
+    after admission by the process-wide limiter (on_queue receives the queue position,
+    priority selects the scheduling class).
+    """
+    payload = build_payload(question, video_context, model, stream=True, **params)
+    metrics = _new_metrics(payload, endpoint, streaming=True)
+    pool = get_pool(endpoint)
+    limiter = get_limiter(endpoint)
+    limiter.acquire(on_wait=on_queue, priority=priority)
+    metrics.mark_admitted()
+    url = None
+    response = None
+    usage = None
+    try:
+        url, response = _open_response(pool, payload, stream=True)
+        metrics.endpoint = url
+        metrics.status = response.status_code
+
+        if response.status_code == 200:
+            for line in response.iter_lines():
+                if line:
+                    line = line.decode('utf-8')
+                    if line.startswith('data: '):
+                        data = line[6:]  # Remove 'data: ' prefix
+                        if data.strip() == '[DONE]':
+                            break
+                        try:
+                            chunk = json.loads(data)
+                            usage = chunk.get('usage') or usage
+                            if 'choices' in chunk and len(chunk['choices']) > 0:
+                                delta = chunk['choices'][0].get('delta', {})
+                                content = delta.get('content')
+                                if content:
+                                    metrics.mark_first_token()
+                                    metrics.output_chars += len(content)
+                                    metrics.output_tokens += 1  # One delta is roughly one token
+                                    yield content  # Yield each chunk for real-time display
+                        except json.JSONDecodeError:
+                            continue
+            _apply_usage(metrics, usage)
+            metrics.finish()
+        else:
+            metrics.finish(error=response.text[:200])
+            yield f"Error calling vLLM API: {response.status_code} - {response.text}"
+
+    except requests.exceptions.RequestException as e:
+        metrics.finish(error=str(e))
+        yield f"Error connecting to vLLM endpoint: {str(e)}"
+    except Exception as e:
+        metrics.finish(error=str(e))
+        yield f"Error processing response: {str(e)}"
+    finally:
+        if metrics.total_s is None:
+            # Consumer stopped iterating early (e.g. Streamlit rerun)
+            metrics.finish(error="cancelled")
+        if response is not None:
+            # Drop the connection instead of leaving the server generating for nobody
+            response.close()
+        endpoint_ok = _is_endpoint_ok(metrics)
+        if url is not None:
+            pool.release(url, ok=endpoint_ok, error=metrics.error)
+        limiter.release(_congestion_latency(metrics), ok=endpoint_ok)
+        _report(metrics, on_metrics)
+
+
+def complete_chat(question: str, video_context: str, endpoint: str, model: str,
+                  on_metrics: MetricsCallback = None, on_queue: QueueCallback = None,
+                  priority: int = PRIORITY_INTERACTIVE, **params) -> str:
+    """Request a complete (non-streaming) answer and record its metrics"""
+    payload = build_payload(question, video_context, model, **params)
+    metrics = _new_metrics(payload, endpoint, streaming=False)
+    pool = get_pool(endpoint)
+    limiter = get_limiter(endpoint)
+    limiter.acquire(on_wait=on_queue, priority=priority)
+    metrics.mark_admitted()
+    url = None
+    try:
+        url, response = _open_response(pool, payload, stream=False)
+        metrics.endpoint = url
+        metrics.status = response.status_code
+
+        if response.status_code == 200:
+            result = response.json()
+            content = result["choices"][0]["message"]["content"]
+            metrics.output_chars = len(content)
+            metrics.output_tokens = count_tokens(content)
+            _apply_usage(metrics, result.get("usage"))
+            metrics.finish()
+            return content
+        else:
+            metrics.finish(error=response.text[:200])
+            return f"Error calling vLLM API: {response.status_code} - {response.text}"
+
+    except requests.exceptions.RequestException as e:
+        metrics.finish(error=str(e))
+        return f"Error connecting to vLLM endpoint: {str(e)}"
+    except Exception as e:
+        metrics.finish(error=str(e))
+        return f"Error processing response: {str(e)}"
+    finally:
+        endpoint_ok = _is_endpoint_ok(metrics)
+        if url is not None:
+            pool.release(url, ok=endpoint_ok, error=metrics.error)
+        limiter.release(_congestion_latency(metrics), ok=endpoint_ok)
+        _report(metrics, on_metrics)
+
+
+def warm_prefix(video_context: str, endpoint: str, model: str,
+                cancelled: Callable[[], bool] = lambda: False) -> bool:
+    """Prefill the system + transcript prefix with a max_tokens=1 request at background priority
+
+    On servers with prefix caching the next real question about this transcript reuses
+    the cached KV blocks. Returns True when the prefill completed. cancelled() is polled
+    after admission and while waiting for the first chunk; a cancelled request is
+    abandoned by closing its connection.
+    """
+    payload = build_payload("", video_context, model, stream=True, max_tokens=1)
+    metrics = _new_metrics(payload, endpoint, streaming=True)
+    pool = get_pool(endpoint)
+    limiter = get_limiter(endpoint)
+    limiter.acquire(priority=PRIORITY_BACKGROUND)
+    metrics.mark_admitted()
+    url = None
+    try:
+        if cancelled():
+            metrics.finish(error="cancelled")
+            return False
+        url, response = _open_response(pool, payload, stream=True)
+        metrics.endpoint = url
+        metrics.status = response.status_code
+        with response:
+            if response.status_code != 200:
+                metrics.finish(error=response.text[:200])
+                return False
+            for line in response.iter_lines():
+                if cancelled():
+                    metrics.finish(error="cancelled")
+                    return False
+                if line:
+                    # The first chunk arrives once the prefix has been prefilled
+                    metrics.mark_first_token()
+                    break
+        metrics.finish()
+        return True
+    except Exception as e:
+        metrics.finish(error=str(e))
+        return False
+    finally:
+        endpoint_ok = _is_endpoint_ok(metrics)
+        if url is not None:
+            pool.release(url, ok=endpoint_ok, error=metrics.error)
+        limiter.release(_congestion_latency(metrics), ok=endpoint_ok)
+        _report(metrics, None)
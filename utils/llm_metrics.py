@@ -0,0 +1,114 @@
+"""Per-request LLM call metrics (TTFT, latency, tokens/s) and the rotating JSONL log."""
+import json
+import logging
+import math
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+METRICS_BACKUP_COUNT = 3
+
+_metrics_logger = logging.getLogger("ytchat.llm_metrics")
+_metrics_logger.propagate = False
+_metrics_logger.setLevel(logging.INFO)
+_metrics_lock = threading.Lock()
+_metrics_path: Optional[str] = None
+
+
+@dataclass
+class LLMCallMetrics:
+    """Timing and size figures for a single chat completion request"""
+    endpoint: str
+    model: str
+    streaming: bool
+    prompt_chars: int = 0
+    prompt_tokens: int = 0
+    output_chars: int = 0
+    output_tokens: int = 0
+    status: Optional[int] = None
+    error: Optional[str] = None
+    queue_s: Optional[float] = None
+    ttft_s: Optional[float] = None
+    total_s: Optional[float] = None
+    tokens_per_s: Optional[float] = None
+    coalesced: bool = False
+    timestamp: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def mark_admitted(self):
+        """Record time spent in the admission queue; TTFT and latency are measured from here"""
+        now = time.perf_counter()
+        self.queue_s = round(now - self._started, 4)
+        self._started = now
+
+    def mark_first_token(self):
+        """Record time to first token (only the first call counts)"""
+        if self.ttft_s is None:
+            self.ttft_s = round(time.perf_counter() - self._started, 4)
+
+    def finish(self, status: Optional[int] = None, error: Optional[str] = None):
+        """Close the measurement and derive total latency and decode throughput"""
+        self.total_s = round(time.perf_counter() - self._started, 4)
+        if status is not None:
+            self.status = status
+        if error is not None:
+            self.error = error
+        # Decode rate excludes prefill: measure from the first token when streaming
+        decode_s = self.total_s - (self.ttft_s or 0.0) if self.streaming else self.total_s
+        if self.output_tokens and decode_s > 0:
+            self.tokens_per_s = round(self.output_tokens / decode_s, 2)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("_started", None)
+        return data
+
+
+def configure_metrics_log(path: str, max_bytes: int = METRICS_MAX_BYTES, backup_count: int = METRICS_BACKUP_COUNT):
+    """Attach the rotating JSONL file handler (idempotent per path)"""
+    global _metrics_path
+    with _metrics_lock:
+        if _metrics_path == str(path):
+            return
+        for handler in list(_metrics_logger.handlers):
+            _metrics_logger.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _metrics_logger.addHandler(handler)
+        _metrics_path = str(path)
+
+
+def record_metrics(metrics: LLMCallMetrics):
+    """Append one metrics record to the JSONL log (no-op until configured)"""
+    if _metrics_logger.handlers:
+        _metrics_logger.info(json.dumps(metrics.to_dict(), ensure_ascii=False))
+
+
+def percentile(values, pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of numbers (None when empty)"""
+    ordered = sorted(value for value in values if value is not None)
+    if not ordered:
+        return None
+    rank = max(1, min(len(ordered), math.ceil(pct / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize_metrics(rows, wall_s: float) -> dict:
+    """Throughput and latency percentiles over metrics dicts of one batch run"""
+    ok = [row for row in rows if row.get("error") is None]
+    summary = {
+        "requests": len(rows),
+        "errors": len(rows) - len(ok),
+        "wall_s": round(wall_s, 3),
+        "requests_per_s": round(len(rows) / wall_s, 3) if wall_s > 0 else None,
+        "output_tokens_per_s": round(sum(row["output_tokens"] for row in ok) / wall_s, 2) if wall_s > 0 else None,
+    }
+    for name in ("queue_s", "ttft_s", "total_s", "tokens_per_s"):
+        for pct in (50, 90, 99):
+            summary[f"{name}_p{pct}"] = percentile([row.get(name) for row in ok], pct)
+    return summary
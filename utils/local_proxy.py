@@ -0,0 +1,200 @@
+"""Sticky-session reverse proxy in front of several local Streamlit worker processes
+
+Each client connection is routed by its ``ytchat_worker`` cookie, or to the
+least busy worker that is up when the cookie is missing or points at a worker
+that is down; the first response on the connection then sets the cookie.
+After the request head the connection is relayed byte for byte, so keep-alive
+requests and websocket upgrades (``/_stcore/stream``) stay on the same worker
+and the browser session keeps talking to the process that holds its state.
+"""
+import asyncio
+import itertools
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+COOKIE_NAME = "ytchat_worker"
+MAX_HEAD_BYTES = 64 * 1024
+CONNECT_TIMEOUT = 5.0
+DOWN_SECONDS = 5.0          # a worker that refused a connection is skipped this long
+RELAY_CHUNK = 64 * 1024
+
+_COOKIE_RE = re.compile(rb"(?:^|;)\s*" + COOKIE_NAME.encode() + rb"=(\d+)")
+_BAD_GATEWAY = (b"HTTP/1.1 502 Bad Gateway\r\nContent-Type: text/plain\r\nContent-Length: 32\r\n"
+                b"Connection: close\r\n\r\nNo Streamlit worker is available")
+
+
+class Backend:
+    """One Streamlit worker and its live connection count"""
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.active = 0
+        self.total = 0
+        self.down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+
+def _cookie_worker(head: bytes) -> Optional[int]:
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"cookie":
+            match = _COOKIE_RE.search(value)
+            if match:
+                return int(match.group(1))
+    return None
+
+
+def _with_cookie(head: bytes, index: int) -> bytes:
+    """Response head with the worker cookie added before the blank line"""
+    cookie = f"Set-Cookie: {COOKIE_NAME}={index}; Path=/; HttpOnly; SameSite=Lax\r\n".encode()
+    return head[:-2] + cookie + b"\r\n"
+
+
+async def _relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            data = await reader.read(RELAY_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+
+
+class LocalProxy:
+    """Sticky reverse proxy over a fixed set of worker slots; a slot's port may change on restart"""
+
+    def __init__(self, ports: List[int], listen_port: int, listen_host: Optional[str] = None):
+        self.backends = [Backend(port) for port in ports]
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self._round_robin = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def set_backend_port(self, index: int, port: int):
+        """Point a worker slot at a new port (after the supervisor restarted it)"""
+        backend = self.backends[index]
+        backend.port = port
+        backend.down_until = 0.0
+
+    def snapshot(self) -> List[dict]:
+        return [{"port": backend.port, "active": backend.active, "total": backend.total,
+                 "available": backend.available} for backend in self.backends]
+
+    def _choose(self, head: bytes, exclude: set) -> Optional[int]:
+        index = _cookie_worker(head)
+        if index is not None and index < len(self.backends) and index not in exclude \
+                and self.backends[index].available:
+            return index
+        candidates = [i for i, backend in enumerate(self.backends) if i not in exclude and backend.available]
+        if not candidates:
+            candidates = [i for i in range(len(self.backends)) if i not in exclude]
+        if not candidates:
+            return None
+        fewest = min(self.backends[i].active for i in candidates)
+        least_busy = [i for i in candidates if self.backends[i].active == fewest]
+        return least_busy[next(self._round_robin) % len(least_busy)]
+
+    async def _connect(self, head: bytes) -> Tuple[Optional[int], Optional[asyncio.StreamReader],
+                                                    Optional[asyncio.StreamWriter]]:
+        tried = set()
+        while True:
+            index = self._choose(head, tried)
+            if index is None:
+                return None, None, None
+            backend = self.backends[index]
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(backend.host, backend.port), CONNECT_TIMEOUT)
+                return index, reader, writer
+            except (OSError, asyncio.TimeoutError):
+                backend.down_until = time.monotonic() + DOWN_SECONDS
+                tried.add(index)
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        upstream_writer = None
+        backend = None
+        try:
+            try:
+                head = await client_reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            index, upstream_reader, upstream_writer = await self._connect(head)
+            if index is None:
+                client_writer.write(_BAD_GATEWAY)
+                await client_writer.drain()
+                return
+            backend = self.backends[index]
+            backend.active += 1
+            backend.total += 1
+            set_cookie = _cookie_worker(head) != index
+
+            upstream_writer.write(head)
+            await upstream_writer.drain()
+            upload = asyncio.ensure_future(_relay(client_reader, upstream_writer))
+
+            async def download():
+                try:
+                    response_head = await upstream_reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                client_writer.write(_with_cookie(response_head, index) if set_cookie else response_head)
+                await client_writer.drain()
+                await _relay(upstream_reader, client_writer)
+
+            downloaded = asyncio.ensure_future(download())
+            # Either side closing ends the relay; the other direction is cancelled
+            _, pending = await asyncio.wait({upload, downloaded}, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if backend is not None:
+                backend.active -= 1
+            for writer in (upstream_writer, client_writer):
+                if writer is not None:
+                    writer.close()
+
+    async def _serve(self, started: threading.Event):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.listen_host, self.listen_port,
+                                                  limit=MAX_HEAD_BYTES)
+        started.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def stop(self):
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+
+def start_proxy_in_thread(ports: List[int], listen_port: int, listen_host: Optional[str] = None) -> LocalProxy:
+    """Serve the proxy from a daemon thread; returns once it is listening"""
+    proxy = LocalProxy(ports, listen_port, listen_host)
+    started = threading.Event()
+    errors = []
+
+    def run():
+        try:
+            asyncio.run(proxy._serve(started))
+        except Exception as e:
+            errors.append(e)
+            started.set()
+
+    threading.Thread(target=run, name="local-proxy", daemon=True).start()
+    started.wait()
+    if errors:
+        raise errors[0]
+    return proxy
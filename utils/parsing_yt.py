@@ -1,12 +1,22 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-import streamlit as st
-import requests
+import logging
 import re
-from typing import Tuple
+from typing import List, Tuple
 import os 
+from utils.lazy_import import lazy_import
+
+# 加入影片時才需要，延遲到第一次使用時再匯入
+youtube_transcript_api = lazy_import("youtube_transcript_api")
+requests = lazy_import("requests")
 # os.environ['REQUESTS_CA_BUNDLE'] = './phison-new.pem'
 # os.environ['SSL_CERT_FILE'] = './phison-new.pem'
 
+# 不依賴 Streamlit：API 與批次工具也會呼叫，錯誤以例外回報給呼叫端
+logger = logging.getLogger("ytchat.parsing_yt")
+
+
+class TranscriptError(Exception):
+    """無法取得影片字幕（網址無效或沒有可用字幕）"""
+
 
 def extract_video_id(video_url: str) -> str:
     """從YouTube URL提取視頻ID"""
@@ -37,7 +47,7 @@ def get_youtube_title(video_id: str) -> str:
                 if title and title != "YouTube":
                     return title
     except Exception as e:
-        st.warning(f"方法1獲取視頻標題失敗: {e}")
+        logger.warning("方法1獲取視頻標題失敗: %s", e)
     
     try:
         # 方法2: 嘗試從YouTube API獲取標題
@@ -48,46 +58,53 @@ def get_youtube_title(video_id: str) -> str:
             if 'title' in data:
                 return data['title']
     except Exception as e:
-        st.warning(f"方法2獲取視頻標題失敗: {e}")
+        logger.warning("方法2獲取視頻標題失敗: %s", e)
     
     # 如果所有方法都失敗，返回默認格式
     return f"YouTube Video {video_id}"
 
-def fetch_video_data(video_url: str) -> Tuple[str, str]:
-    """獲取YouTube視頻數據"""
+def fetch_transcript_segments(video_id: str) -> List[dict]:
+    """獲取字幕片段（含 text、start、duration），依序嘗試英文、中文與其他語言"""
     try:
-        video_id = extract_video_id(video_url)
-        
-        # 獲取視頻標題
-        title = get_youtube_title(video_id)
-        
-        # 獲取字幕 
-        transcript = None
-        transcript_text = ""
-        
+        # 嘗試獲取英文字幕
+        transcript = youtube_transcript_api.YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
+        logger.info("已獲取英文字幕: %s", video_id)
+    except Exception:
         try:
-            # 嘗試獲取英文字幕
-            transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-            transcript_text = " ".join([entry["text"] for entry in transcript])
-            st.info("📝 已獲取英文字幕")
-        except Exception:
+            transcript = youtube_transcript_api.YouTubeTranscriptApi.get_transcript(video_id, languages=['zh', 'zh-cn', 'zh-tw', 'zh-TW'])
+            logger.info("已獲取中文字幕: %s", video_id)
+        except Exception as e2:
+            # st.warning(f"中英文字幕不可用: {e2}")
             try:
-                transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['zh', 'zh-cn', 'zh-tw', 'zh-TW'])
-                transcript_text = " ".join([entry["text"] for entry in transcript])
-                st.info("📝 已獲取中文字幕")
-            except Exception as e2:
-                # st.warning(f"中英文字幕不可用: {e2}")
-                try:
-                    # 如果中英文字幕都不可用，嘗試獲取任何可用的字幕
-                    transcript = YouTubeTranscriptApi.get_transcript(video_id)
-                    transcript_text = " ".join([entry["text"] for entry in transcript])
-                    st.info("📝 已獲取其他語言字幕")
-                except Exception as e3:
-                    st.warning(f"無法獲取任何字幕: {e2}")
-                    raise Exception(f"無法獲取任何字幕: {e3}")
-        
-        return title, transcript_text
-    except Exception as e:
-        st.error(f"Error fetching video data: {e}")
-        return "Unknown", "No transcript available for this video."
+                # 如果中英文字幕都不可用，嘗試獲取任何可用的字幕
+                transcript = youtube_transcript_api.YouTubeTranscriptApi.get_transcript(video_id)
+                logger.info("已獲取其他語言字幕: %s", video_id)
+            except Exception as e3:
+                raise TranscriptError(f"無法獲取任何字幕: {e3}") from e3
+    return [
+        {"text": entry["text"], "start": entry.get("start", 0.0), "duration": entry.get("duration", 0.0)}
+        for entry in transcript
+    ]
 
+def fetch_video_segments(video_url: str) -> Tuple[str, List[dict]]:
+    """獲取YouTube視頻標題與字幕片段（網址無效或沒有字幕時拋出 TranscriptError）"""
+    try:
+        video_id = extract_video_id(video_url)
+    except ValueError as e:
+        raise TranscriptError(f"無效的 YouTube 網址: {video_url}") from e
+    
+    # 獲取視頻標題
+    title = get_youtube_title(video_id)
+    
+    # 獲取字幕 
+    return title, fetch_transcript_segments(video_id)
+
+def fetch_video_data(video_url: str) -> Tuple[str, str]:
+    """獲取YouTube視頻數據"""
+    try:
+        title, segments = fetch_video_segments(video_url)
+    except TranscriptError:
+        return "Unknown", "No transcript available for this video."
+    if not segments:
+        return title, "No transcript available for this video."
+    return title, " ".join(segment["text"] for segment in segments)
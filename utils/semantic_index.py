@@ -0,0 +1,460 @@
+"""Embedding-based semantic index over transcript chunks
+
+Vectors live in one contiguous float32 file per embedder (memory-mapped for
+search) with a JSONL row table beside it. Chunks are embedded through the
+endpoint's OpenAI-compatible /v1/embeddings route, falling back to a local
+feature-hashing embedder when that route is unavailable.
+"""
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.endpoint_pool import parse_endpoints
+from utils.lazy_import import lazy_import
+from utils.text_utils import tokenize
+from utils.video_store import file_lock
+
+np = lazy_import("numpy")
+requests = lazy_import("requests")
+
+CHUNK_CHARS = 800
+CHUNK_OVERLAP = 100
+EMBED_BATCH_SIZE = 32
+EMBED_TIMEOUT = 60
+HASH_DIM = 512
+SEARCH_BATCH_ROWS = 65536
+REMOTE_RETRY_AFTER = 300    # seconds before retrying an endpoint whose embeddings route failed
+
+
+class EmbeddingUnavailable(Exception):
+    """The remote embeddings route cannot be used"""
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, int]]:
+    """Split text into overlapping (start, end) character spans, breaking at whitespace when possible"""
+    spans = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(length, start + size)
+        if end < length:
+            space = text.rfind(' ', start + size // 2, end)
+            if space > 0:
+                end = space
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return spans
+
+
+def chunk_records(text: str) -> List[Tuple[int, int, str]]:
+    """(start, end, content hash) of every chunk of text, as stored in the index"""
+    return [(start, end, _chunk_hash(text[start:end])) for start, end in chunk_text(text)]
+
+
+def embeddings_url(endpoint_url: str) -> str:
+    """Derive the embeddings route from a chat completions URL"""
+    if endpoint_url.endswith("/chat/completions"):
+        return endpoint_url[:-len("/chat/completions")] + "/embeddings"
+    return endpoint_url.rstrip("/") + "/embeddings"
+
+
+def _normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder:
+    """Local fallback: signed feature hashing of words and CJK unigrams/bigrams"""
+
+    def __init__(self, dim: int = HASH_DIM):
+        self.dim = dim
+        self.id = f"hash-v1-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        tokens = tokenize(text)
+        features = list(tokens)
+        features.extend(a + b for a, b in zip(tokens, tokens[1:]) if len(a) == 1 and len(b) == 1)
+        return features
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode('utf-8')) for feature in self._features(text)),
+                dtype=np.uint32
+            )
+            if hashes.size == 0:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs)
+        # Sublinear term frequency keeps repeated filler from dominating
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        return _normalize_rows(matrix)
+
+
+_remote_failures: Dict[str, float] = {}
+
+
+class RemoteEmbedder:
+    """OpenAI-compatible /v1/embeddings client"""
+
+    def __init__(self, url: str, model: str):
+        self.url = url
+        self.model = model
+        slug = re.sub(r'[^\w.-]+', '_', model)[:60] or "default"
+        self.id = f"remote-{slug}"
+
+    def available(self) -> bool:
+        failed_at = _remote_failures.get(self.url)
+        return failed_at is None or time.monotonic() - failed_at > REMOTE_RETRY_AFTER
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        rows = []
+        try:
+            for offset in range(0, len(texts), EMBED_BATCH_SIZE):
+                batch = texts[offset:offset + EMBED_BATCH_SIZE]
+                response = requests.post(
+                    self.url, json={"model": self.model, "input": batch}, timeout=EMBED_TIMEOUT
+                )
+                if response.status_code != 200:
+                    raise EmbeddingUnavailable(f"HTTP {response.status_code}")
+                data = sorted(response.json()["data"], key=lambda item: item["index"])
+                rows.extend(item["embedding"] for item in data)
+        except (requests.exceptions.RequestException, KeyError, ValueError, TypeError) as e:
+            _remote_failures[self.url] = time.monotonic()
+            raise EmbeddingUnavailable(str(e))
+        except EmbeddingUnavailable:
+            _remote_failures[self.url] = time.monotonic()
+            raise
+        return _normalize_rows(np.asarray(rows, dtype=np.float32))
+
+
+def select_embedder(endpoint_setting: str, model: str):
+    """Remote embeddings from the first configured endpoint if usable, otherwise local hashing"""
+    urls = parse_endpoints(endpoint_setting)
+    if urls:
+        remote = RemoteEmbedder(embeddings_url(urls[0]), model)
+        if remote.available():
+            return remote
+    return HashingEmbedder()
+
+
+class SemanticIndex:
+    """Append-only float32 matrix of chunk vectors for one embedder
+
+    The UI workers, the API and the batch tools share an index directory, so every
+    operation runs under a file lock and first catches the row table up with what
+    other processes wrote. The vectors are only mapped while the lock is held.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.rows_path = self.directory / "chunks.jsonl"
+        self.info_path = self.directory / "index.json"
+        self.journal_path = self.directory / "rewrite.pending"
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self.rows: List[dict] = []
+        self._row_ends: List[int] = []     # byte offset in chunks.jsonl where each row ends
+        self._by_video: Dict[str, List[int]] = {}
+        self._matrix: Optional["np.ndarray"] = None
+        self._rows_file: Optional[Tuple[int, int]] = None     # (inode, size) of chunks.jsonl as last read
+
+    @contextmanager
+    def _locked(self):
+        """Hold the index lock with the row table in sync with the files (not reentrant)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.rows_path, self._lock):
+            try:
+                self._refresh()
+                yield
+            finally:
+                # Other processes may append to or replace the file once the lock is released
+                self._release_matrix()
+
+    def _refresh(self):
+        if self.journal_path.exists():
+            self._finish_rewrite()
+        if self.dim is None and self.info_path.exists():
+            self.dim = json.loads(self.info_path.read_text(encoding='utf-8'))["dim"]
+        try:
+            stat = self.rows_path.stat()
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and self._rows_file is not None and stat.st_ino == self._rows_file[0] \
+                and stat.st_size >= self._rows_file[1]:
+            if stat.st_size > self._rows_file[1]:
+                # Another process appended rows
+                self._add_rows(*self._read_rows(self._rows_file[1]))
+        else:
+            self._load()
+        self._repair()
+
+    def _load(self):
+        """Read the whole row table (first use, or the files were rewritten)"""
+        self.rows, self._row_ends, self._by_video = [], [], {}
+        if self.rows_path.exists():
+            self._add_rows(*self._read_rows(0))
+
+    def _read_rows(self, offset: int) -> Tuple[List[dict], List[int]]:
+        """Complete rows after byte offset, with the offset at which each one ends"""
+        with open(self.rows_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        rows, ends = [], []
+        for line in data.split(b'\n')[:-1]:    # the last piece is empty or a half-written row
+            offset += len(line) + 1
+            if line.strip():
+                rows.append(json.loads(line))
+                ends.append(offset)
+        return rows, ends
+
+    def _add_rows(self, rows: List[dict], ends: List[int]):
+        for row in rows:
+            self._by_video.setdefault(row["video"], []).append(len(self.rows))
+            self.rows.append(row)
+        self._row_ends.extend(ends)
+
+    def _repair(self):
+        """Cut both files back to the rows that have vectors (an append was interrupted)"""
+        row_bytes = 4 * (self.dim or 0)
+        stored = self.vectors_path.stat().st_size // row_bytes if row_bytes and self.vectors_path.exists() else 0
+        count = min(len(self.rows), stored)
+        rows_size = self._row_ends[count - 1] if count else 0
+        if self.rows_path.exists() and self.rows_path.stat().st_size != rows_size:
+            os.truncate(self.rows_path, rows_size)
+        if self.vectors_path.exists() and self.vectors_path.stat().st_size != count * row_bytes:
+            self._release_matrix()
+            os.truncate(self.vectors_path, count * row_bytes)
+        if count < len(self.rows):
+            rows, ends = self.rows[:count], self._row_ends[:count]
+            self.rows, self._row_ends, self._by_video = [], [], {}
+            self._add_rows(rows, ends)
+        self._rows_file = (self.rows_path.stat().st_ino, rows_size) if self.rows_path.exists() else None
+
+    def _finish_rewrite(self):
+        """Complete a rewrite interrupted after both replacement files were written"""
+        for path in (self.vectors_path, self.rows_path):
+            tmp_path = path.with_suffix(".tmp")
+            if tmp_path.exists():
+                os.replace(tmp_path, path)
+        self.journal_path.unlink()
+        self._rows_file = None
+
+    def matrix(self) -> "np.ndarray":
+        """Memory-mapped (rows, dim) view of all vectors; only use it while holding the index lock"""
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[0] != len(self.rows):
+                self._release_matrix()
+                if not self.rows:
+                    return np.zeros((0, self.dim or 1), dtype=np.float32)
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                         shape=(len(self.rows), self.dim))
+            return self._matrix
+
+    def _release_matrix(self):
+        """Unmap the vectors file (Windows cannot replace or extend a file that is still mapped)"""
+        mapping = getattr(self._matrix, "_mmap", None)
+        self._matrix = None     # the array holds a buffer export; the mapping only closes once it is gone
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                pass    # A view is still alive; the mapping closes when it is garbage collected
+
+    def video_rows(self, video: str) -> List[int]:
+        return self._by_video.get(video, [])
+
+    def is_indexed(self, video: str, text: str, chunks: Optional[List[Tuple[int, int, str]]] = None) -> bool:
+        """True when the rows of video are exactly the chunks of text
+
+        chunks are precomputed chunk_records(text), which saves rechunking and hashing the text.
+        """
+        digests = {digest for _, _, digest in (chunks or chunk_records(text))}
+        with self._locked():
+            known = {self.rows[i]["hash"] for i in self.video_rows(video)}
+        return known == digests
+
+    def _current_hashes(self, video: str, chunks: List[Tuple[int, int, str]]) -> set:
+        """Hashes already indexed for video, after dropping its rows if the transcript changed"""
+        known = {self.rows[i]["hash"] for i in self.video_rows(video)}
+        if known - {digest for _, _, digest in chunks}:
+            # The transcript changed: stale rows would point at wrong offsets
+            self._rewrite_without(video)
+            known = set()
+        return known
+
+    def add_video(self, video: str, text: str, embedder, chunks: Optional[List[Tuple[int, int, str]]] = None) -> int:
+        """Embed and append the chunks of text not yet indexed for video; returns rows added
+
+        Embedding (possibly a slow remote call) runs without the lock; the rows are
+        checked again before appending in case another writer indexed them meanwhile.
+        """
+        chunks = chunks or chunk_records(text)
+        with self._locked():
+            known = self._current_hashes(video, chunks)
+        pending = []
+        for chunk_index, (start, end, digest) in enumerate(chunks):
+            if digest not in known:
+                known.add(digest)
+                pending.append({"video": video, "chunk": chunk_index, "start": start, "end": end, "hash": digest})
+        if not pending:
+            return 0
+        vectors = embedder.embed([text[row["start"]:row["end"]] for row in pending])
+
+        with self._locked():
+            known = self._current_hashes(video, chunks)
+            fresh = [i for i, row in enumerate(pending) if row["hash"] not in known]
+            if not fresh:
+                return 0
+            pending = [pending[i] for i in fresh]
+            vectors = vectors[fresh]
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self.info_path.write_text(json.dumps({"embedder": embedder.id, "dim": self.dim}), encoding='utf-8')
+            elif vectors.shape[1] != self.dim:
+                raise EmbeddingUnavailable(f"Embedding dimension changed ({vectors.shape[1]} != {self.dim})")
+            lines = [(json.dumps(row) + "\n").encode('utf-8') for row in pending]
+            offset = self._rows_file[1] if self._rows_file else 0
+            ends = list(itertools.accumulate((len(line) for line in lines), initial=offset))[1:]
+            # Row table first: rows without vectors are cut off on load, never the reverse
+            with open(self.rows_path, 'ab') as f:
+                f.write(b"".join(lines))
+            with open(self.vectors_path, 'ab') as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            self._add_rows(pending, ends)
+            self._rows_file = (self.rows_path.stat().st_ino, ends[-1])
+            return len(pending)
+
+    def remove_video(self, video: str):
+        """Rewrite the index without the rows of a deleted video"""
+        with self._locked():
+            if video in self._by_video:
+                self._rewrite_without(video)
+
+    def _rewrite_without(self, video: str):
+        keep = [i for i, row in enumerate(self.rows) if row["video"] != video]
+        vectors = np.array(self.matrix()[keep]) if keep else np.zeros((0, self.dim or 1), dtype=np.float32)
+        self._release_matrix()
+        self.vectors_path.with_suffix(".tmp").write_bytes(vectors.tobytes())
+        with open(self.rows_path.with_suffix(".tmp"), 'wb') as f:
+            f.write(b"".join((json.dumps(self.rows[i]) + "\n").encode('utf-8') for i in keep))
+        # The journal marks both replacement files as complete, so a rewrite cut short
+        # between the two replaces is finished on the next access instead of mixing files
+        self.journal_path.write_bytes(b"")
+        os.replace(self.vectors_path.with_suffix(".tmp"), self.vectors_path)
+        os.replace(self.rows_path.with_suffix(".tmp"), self.rows_path)
+        self.journal_path.unlink()
+        self._rows_file = None
+        self._refresh()
+
+    def search(self, query: "np.ndarray", k: int = 5, videos: Optional[List[str]] = None) -> List[Tuple[float, dict]]:
+        """Top-k rows by cosine similarity (vectors are unit length, so a dot product)
+
+        Runs under the index lock so the vectors and row table cannot change
+        (in this or another process) halfway through.
+        """
+        with self._locked():
+            return self._search(query, k, videos)
+
+    def _search(self, query: "np.ndarray", k: int, videos: Optional[List[str]]) -> List[Tuple[float, dict]]:
+        matrix = self.matrix()
+        if matrix.shape[0] == 0:
+            return []
+        if videos is not None:
+            candidates = np.array(sorted(i for video in videos for i in self.video_rows(video)), dtype=np.int64)
+            if candidates.size == 0:
+                return []
+        else:
+            candidates = np.arange(matrix.shape[0])
+        query = query.astype(np.float32).reshape(-1)
+        scores = np.empty(candidates.size, dtype=np.float32)
+        for offset in range(0, candidates.size, SEARCH_BATCH_ROWS):
+            batch = candidates[offset:offset + SEARCH_BATCH_ROWS]
+            if batch[-1] - batch[0] + 1 == batch.size:
+                block = matrix[batch[0]:batch[-1] + 1]    # contiguous slice avoids a copy
+            else:
+                block = matrix[batch]
+            scores[offset:offset + batch.size] = block @ query
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.rows[candidates[i]]) for i in top]
+
+
+def _chunk_hash(chunk: str) -> str:
+    return hashlib.sha1(chunk.encode('utf-8')).hexdigest()
+
+
+_indexes: Dict[str, SemanticIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: Path, embedder_id: str) -> SemanticIndex:
+    """Process-wide index instance for one embedder under root"""
+    directory = Path(root) / embedder_id
+    with _indexes_lock:
+        index = _indexes.get(str(directory))
+        if index is None:
+            index = SemanticIndex(directory)
+            _indexes[str(directory)] = index
+        return index
+
+
+def index_video(root: Path, video: str, text: str, endpoint_setting: str, model: str,
+                chunks: Optional[List[Tuple[int, int, str]]] = None) -> Tuple[str, int]:
+    """Embed a video's transcript chunks, falling back to local hashing; returns (embedder id, rows added)"""
+    embedder = select_embedder(endpoint_setting, model)
+    try:
+        return embedder.id, get_index(root, embedder.id).add_video(video, text, embedder, chunks)
+    except EmbeddingUnavailable:
+        embedder = HashingEmbedder()
+        return embedder.id, get_index(root, embedder.id).add_video(video, text, embedder, chunks)
+
+
+def search_video(root: Path, video: str, text: str, question: str, endpoint_setting: str, model: str,
+                 k: int = 5, chunks: Optional[List[Tuple[int, int, str]]] = None) -> List[dict]:
+    """Top-k transcript passages of one video for a question, indexing the video first if needed"""
+    for embedder in (select_embedder(endpoint_setting, model), HashingEmbedder()):
+        try:
+            index = get_index(root, embedder.id)
+            if not index.is_indexed(video, text, chunks):
+                index.add_video(video, text, embedder, chunks)
+            query = embedder.embed([question])[0]
+        except EmbeddingUnavailable:
+            continue
+        hits = index.search(query, k=k, videos=[video])
+        return [
+            {"start": row["start"], "end": row["end"], "score": score, "text": text[row["start"]:row["end"]]}
+            for score, row in hits
+        ]
+    return []
+
+
+def remove_video_from_indexes(root: Path, video: str):
+    """Drop a deleted video's rows from every embedder's index under root"""
+    root = Path(root)
+    if not root.exists():
+        return
+    for directory in root.iterdir():
+        if (directory / "chunks.jsonl").exists():
+            get_index(root, directory.name).remove_video(video)
+
+
+def build_passage_context(passages: List[dict]) -> str:
+    """Join retrieved passages in transcript order for use as the prompt context"""
+    ordered = sorted(passages, key=lambda passage: passage["start"])
+    return "\n...\n".join(passage["text"].strip() for passage in ordered)
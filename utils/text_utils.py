@@ -0,0 +1,54 @@
+import re
+from typing import List
+
+_CJK = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af'
+TOKEN_RE = re.compile(rf'[{_CJK}]|[^\W{_CJK}]+', re.UNICODE)
+
+
+def count_tokens(text: str) -> int:
+    """Simple token counter (based on character count estimation)"""
+    # This is a simplified token count, actual applications may need more precise methods
+    return int(len(text.split()) * 1.3)  # Rough estimation
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; CJK characters are single tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+_SENTENCE_END_RE = re.compile(r'[.!?。！？]+["\')\]」』]*(?:\s+|$)|[。！？]')
+MAX_SENTENCE_WORDS = 40
+MAX_SENTENCE_CHARS = 120     # for text without spaces (CJK)
+
+
+def split_sentences(text: str) -> List[tuple]:
+    """(start, end) spans of sentences; unpunctuated runs (auto-captions) are cut into word windows"""
+    spans = []
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        spans.extend(_window(text, start, match.end()))
+        start = match.end()
+    if start < len(text):
+        spans.extend(_window(text, start, len(text)))
+    return spans
+
+
+def _window(text: str, start: int, end: int) -> List[tuple]:
+    """Split one long span into windows of at most MAX_SENTENCE_WORDS words (or MAX_SENTENCE_CHARS)"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start >= end:
+        return []
+    piece = text[start:end]
+    if ' ' not in piece:
+        return [(position, min(end, position + MAX_SENTENCE_CHARS))
+                for position in range(start, end, MAX_SENTENCE_CHARS)]
+    words = [match.span() for match in re.finditer(r'\S+', piece)]
+    if len(words) <= MAX_SENTENCE_WORDS:
+        return [(start, end)]
+    return [
+        (start + words[i][0], start + words[min(i + MAX_SENTENCE_WORDS, len(words)) - 1][1])
+        for i in range(0, len(words), MAX_SENTENCE_WORDS)
+    ]
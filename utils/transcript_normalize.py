@@ -0,0 +1,129 @@
+"""Transcript normalization: whitespace, rolling-caption overlaps and filler words
+
+Normalized text keeps a segment map of [char offset in normalized text,
+segment start seconds, original segment index] so passages can be traced
+back to their place in the video.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from utils.text_utils import count_tokens
+
+# Longest overlap (in words) checked between consecutive caption segments
+MAX_OVERLAP_WORDS = 30
+MIN_OVERLAP_WORDS = 2
+MIN_OVERLAP_CHARS = 4       # for segments without spaces (CJK)
+
+# "er" and "ah" are left out: they collide with real words and abbreviations ("ER", "Ah" the name)
+FILLER_WORDS = ["uh", "uhm", "um", "umm", "erm", "hmm", "嗯", "呃"]
+# Lowercase or sentence-initial only, so all-caps abbreviations ("UM", "UH") are kept
+_FILLER_RE = re.compile(
+    r'(?<![\w\'-])(?:' + '|'.join(
+        re.escape(form) for word in FILLER_WORDS if word.isascii() for form in (word, word.capitalize())
+    ) + r')(?![\w\'-])[,.]?'
+)
+_CJK_FILLER_RE = re.compile('(?:' + '|'.join(word for word in FILLER_WORDS if not word.isascii()) + ')[，,]?')
+_WHITESPACE_RE = re.compile(r'\s+')
+_PUNCT_RE = re.compile(r'[^\w]+')
+
+
+def collapse_whitespace(text: str) -> str:
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def remove_filler_words(text: str) -> str:
+    text = _FILLER_RE.sub('', text)
+    text = _CJK_FILLER_RE.sub('', text)
+    return collapse_whitespace(text)
+
+
+def _word_key(word: str) -> str:
+    return _PUNCT_RE.sub('', word.casefold())
+
+
+def _overlap_words(previous: List[str], current: List[str]) -> int:
+    """Length of the longest suffix of previous that is a prefix of current"""
+    longest = min(MAX_OVERLAP_WORDS, len(previous), len(current))
+    previous_keys = [_word_key(word) for word in previous[-longest:]]
+    current_keys = [_word_key(word) for word in current[:longest]]
+    for size in range(longest, 0, -1):
+        if previous_keys[-size:] == current_keys[:size]:
+            # Short overlaps are usually genuine repetition unless they cover the whole segment
+            if size >= MIN_OVERLAP_WORDS or size == len(current):
+                return size
+            return 0
+    return 0
+
+
+def _overlap_chars(previous: str, current: str) -> int:
+    longest = min(len(previous), len(current), MAX_OVERLAP_WORDS * 4)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if previous[-size:] == current[:size]:
+            return size
+    return 0
+
+
+def strip_overlap(previous: str, current: str) -> str:
+    """Drop the part of current that repeats the end of previous (rolling auto-captions)"""
+    if not previous or not current:
+        return current
+    if ' ' not in current.strip() and ' ' not in previous[-MAX_OVERLAP_WORDS * 4:].strip():
+        return current[_overlap_chars(previous, current):]
+    words = current.split(' ')
+    return ' '.join(words[_overlap_words(previous.split(' '), words):])
+
+
+def normalize_segments(segments: List[dict], remove_fillers: bool = True) -> Tuple[str, List[list]]:
+    """Normalize caption segments into one text plus its segment map"""
+    parts = []
+    segment_map = []
+    offset = 0
+    previous = ""
+    for index, segment in enumerate(segments):
+        text = collapse_whitespace(segment.get("text", ""))
+        if remove_fillers:
+            text = remove_filler_words(text)
+        text = strip_overlap(previous, text).strip()
+        if not text:
+            continue
+        if parts:
+            offset += 1     # joining space
+        segment_map.append([offset, round(float(segment.get("start", 0.0)), 2), index])
+        parts.append(text)
+        offset += len(text)
+        previous = text
+    return " ".join(parts), segment_map
+
+
+def normalize_text(text: str, remove_fillers: bool = True) -> str:
+    """Normalize a plain transcript string (no segment map available)"""
+    text = collapse_whitespace(text)
+    return remove_filler_words(text) if remove_fillers else text
+
+
+def normalization_stats(raw_text: str, normalized_text: str) -> dict:
+    """Token and character counts before and after normalization"""
+    raw_tokens = count_tokens(raw_text)
+    tokens = count_tokens(normalized_text)
+    reduction = round(100.0 * (raw_tokens - tokens) / raw_tokens, 1) if raw_tokens else 0.0
+    return {
+        "raw_tokens": raw_tokens,
+        "tokens": tokens,
+        "token_reduction_pct": reduction,
+        "raw_chars": len(raw_text),
+        "chars": len(normalized_text),
+    }
+
+
+def segment_start_at(segment_map: Optional[List[list]], char_offset: int) -> Optional[float]:
+    """Start time (seconds) of the segment containing char_offset in normalized text"""
+    if not segment_map:
+        return None
+    low, high = 0, len(segment_map) - 1
+    while low < high:
+        mid = (low + high + 1) // 2
+        if segment_map[mid][0] <= char_offset:
+            low = mid
+        else:
+            high = mid - 1
+    return segment_map[low][1]
@@ -0,0 +1,160 @@
+"""Versioned per-video artifacts derived at ingest: text, chunks, sentences, keyword postings, summary
+
+Question time reads these instead of re-deriving them from the raw context.
+An artifact is rebuilt lazily (on first use) when ARTIFACT_VERSION or the
+chunking parameters change, or when the video's text no longer matches it;
+only the affected video is rebuilt. The summary survives rebuilds as long as
+the text is unchanged.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.semantic_index import CHUNK_CHARS, CHUNK_OVERLAP, build_passage_context, chunk_records, search_video
+from utils.text_utils import count_tokens, split_sentences, tokenize
+from utils.transcript_normalize import normalize_text
+from utils.video_store import video_key
+
+ARTIFACT_VERSION = 2
+ARTIFACT_PARAMS = {"chunk_chars": CHUNK_CHARS, "chunk_overlap": CHUNK_OVERLAP}
+
+_cache: Dict[str, Tuple[float, dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def artifacts_dir_for(data_path) -> Path:
+    """Artifacts live beside the video store"""
+    return Path(data_path).parent / "artifacts"
+
+
+def _source_hash(video: dict) -> str:
+    # Entries ingested with normalization record their text hash; older ones are hashed here
+    return video.get("text_hash") or text_hash(video["context"])
+
+
+def _is_current(artifacts: dict, source_hash: str) -> bool:
+    return (artifacts.get("version") == ARTIFACT_VERSION
+            and artifacts.get("params") == ARTIFACT_PARAMS
+            and artifacts.get("source_hash") == source_hash)
+
+
+def build_artifacts(video: dict, summary: Optional[str] = None) -> dict:
+    """Derive all artifacts of a stored video entry"""
+    # Entries stored before ingest normalization are normalized here
+    text = video["context"] if "normalization" in video else normalize_text(video["context"])
+    chunks = [[start, end, digest, count_tokens(text[start:end])] for start, end, digest in chunk_records(text)]
+    # Sentence-level keyword postings (term -> [[sentence, term frequency], ...]) for BM25
+    sentences = split_sentences(text)
+    sentence_terms = []
+    postings: Dict[str, List[List[int]]] = {}
+    for sentence_index, (start, end) in enumerate(sentences):
+        terms = tokenize(text[start:end])
+        sentence_terms.append(len(terms))
+        for term, frequency in Counter(terms).items():
+            postings.setdefault(term, []).append([sentence_index, frequency])
+    return {
+        "version": ARTIFACT_VERSION,
+        "params": ARTIFACT_PARAMS,
+        "video": video_key(video),
+        "source_hash": _source_hash(video),
+        "text": text,
+        "tokens": count_tokens(text),
+        "chunks": chunks,
+        "sentences": [list(span) for span in sentences],
+        "sentence_terms": sentence_terms,
+        "postings": postings,
+        "summary": summary,
+    }
+
+
+def _path(artifacts_dir: Path, key: str) -> Path:
+    return Path(artifacts_dir) / f"{key}.json"
+
+
+def _write(path: Path, artifacts: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + f".{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(artifacts, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    with _cache_lock:
+        _cache[str(path)] = (path.stat().st_mtime, artifacts)
+
+
+def _read(path: Path) -> Optional[dict]:
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(str(path))
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            artifacts = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _cache_lock:
+        _cache[str(path)] = (mtime, artifacts)
+    return artifacts
+
+
+def save_artifacts(artifacts_dir: Path, video: dict, summary: Optional[str] = None) -> dict:
+    """Build and persist the artifacts of a video (at ingest)"""
+    artifacts = build_artifacts(video, summary)
+    _write(_path(artifacts_dir, artifacts["video"]), artifacts)
+    return artifacts
+
+
+def get_artifacts(artifacts_dir: Path, video: dict) -> dict:
+    """Current artifacts of a video, rebuilding them if missing or out of date"""
+    path = _path(artifacts_dir, video_key(video))
+    source_hash = _source_hash(video)
+    artifacts = _read(path)
+    if artifacts is not None and _is_current(artifacts, source_hash):
+        return artifacts
+    summary = artifacts.get("summary") if artifacts and artifacts.get("source_hash") == source_hash else None
+    artifacts = build_artifacts(video, summary)
+    try:
+        _write(path, artifacts)
+    except OSError:
+        pass    # Read-only location: still answer from the rebuilt artifacts
+    return artifacts
+
+
+def save_summary(artifacts_dir: Path, video: dict, summary: str):
+    artifacts = dict(get_artifacts(artifacts_dir, video))
+    artifacts["summary"] = summary
+    _write(_path(artifacts_dir, artifacts["video"]), artifacts)
+
+
+def remove_artifacts(artifacts_dir: Path, key: str):
+    path = _path(artifacts_dir, key)
+    with _cache_lock:
+        _cache.pop(str(path), None)
+    if path.exists():
+        path.unlink()
+
+
+def chunk_spans(artifacts: dict) -> List[Tuple[int, int, str]]:
+    """Chunk records in the form the semantic index expects"""
+    return [(start, end, digest) for start, end, digest, _ in artifacts["chunks"]]
+
+
+def question_context(artifacts: dict, question: str, index_dir: Path, endpoint: str, model: str,
+                     passages: bool = False, k: int = 5) -> str:
+    """Prompt context for a question: the full text, or its k most relevant passages"""
+    if not passages:
+        return artifacts["text"]
+    hits = search_video(index_dir, artifacts["video"], artifacts["text"], question, endpoint, model,
+                        k=k, chunks=chunk_spans(artifacts))
+    return build_passage_context(hits) if hits else artifacts["text"]
@@ -0,0 +1,138 @@
+"""Helpers for the on-disk video knowledge base (video_data.json)
+
+The file is shared by the Streamlit UI, the headless API and the batch
+tools, so every read-modify-write goes through a cross-process lock and
+files are replaced atomically.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, List, Optional
+
+_VIDEO_ID_PATTERNS = [
+    r'[?&]v=([\w-]{6,})',
+    r'youtu\.be/([\w-]{6,})',
+    r'/shorts/([\w-]{6,})',
+]
+
+_thread_lock = threading.RLock()
+
+
+def video_key(video: dict) -> str:
+    """Stable identifier for a stored video: the YouTube ID, or a URL digest as fallback"""
+    return url_key(video.get("url", ""))
+
+
+def url_key(url: str) -> str:
+    """video_key for a URL that has not been stored yet"""
+    for pattern in _VIDEO_ID_PATTERNS:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+@contextmanager
+def store_lock(path):
+    """Exclusive lock on the store across threads and processes (lock file beside it)"""
+    with file_lock(path, _thread_lock):
+        yield
+
+
+@contextmanager
+def file_lock(path, thread_lock):
+    """Exclusive lock on path across threads (thread_lock) and processes (path + '.lock')
+
+    The process-level lock is not reentrant: a thread must not take it twice.
+    """
+    lock_path = Path(str(path) + ".lock")
+    with thread_lock:
+        with open(lock_path, 'a+b') as lock_file:
+            if sys.platform == 'win32':
+                import msvcrt
+                lock_file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+                try:
+                    yield
+                finally:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def read_videos(path) -> List[dict]:
+    """Read the store (empty list when missing)"""
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_videos(videos: List[dict], path):
+    """Write the store atomically (temp file + replace)"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(videos, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def update_videos(path, change: Callable[[List[dict]], Optional[List[dict]]]) -> List[dict]:
+    """Apply change to the stored list under the lock and save it; returns the new list"""
+    with store_lock(path):
+        videos = read_videos(path)
+        result = change(videos)
+        if result is not None:
+            videos = result
+        write_videos(videos, path)
+        return videos
+
+
+def upsert_video(path, entry: dict) -> List[dict]:
+    """Add a video, replacing any stored entry with the same key"""
+    return upsert_videos(path, [entry])
+
+
+def upsert_videos(path, entries: List[dict]) -> List[dict]:
+    """Add several videos in one locked write, replacing entries with the same keys"""
+    def _upsert(videos):
+        positions = {video_key(video): index for index, video in enumerate(videos)}
+        for entry in entries:
+            key = video_key(entry)
+            if key in positions:
+                videos[positions[key]] = entry
+            else:
+                positions[key] = len(videos)
+                videos.append(entry)
+        return videos
+
+    return update_videos(path, _upsert)
+
+
+def remove_video(path, key: str) -> List[dict]:
+    """Delete every stored entry with the given key"""
+    return update_videos(path, lambda videos: [video for video in videos if video_key(video) != key])
+
+
+def find_video(videos: List[dict], key: str) -> Optional[dict]:
+    for video in videos:
+        if video_key(video) == key:
+            return video
+    return None
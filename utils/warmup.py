@@ -0,0 +1,70 @@
+"""Debounced, cancellable KV-cache warmup of the transcript prefix when a video is selected"""
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.llm_client import warm_prefix
+
+WARMUP_DELAY_S = 1.5        # selection must stay unchanged this long before warming
+WARM_TTL_S = 300.0          # a prefix warmed this recently is assumed to still be cached
+
+
+class PrefixWarmer:
+    """One pending or running warmup per owner (e.g. a UI session); a new schedule cancels the old one"""
+
+    def __init__(self, delay: float = WARMUP_DELAY_S, ttl: float = WARM_TTL_S):
+        self.delay = delay
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._active: Dict[str, threading.Event] = {}
+        self._warmed: Dict[Tuple[str, str, str], float] = {}
+
+    def schedule(self, owner: str, video_context: str, endpoint: str, model: str) -> bool:
+        """Warm the prefix after the debounce delay unless rescheduled or cancelled; False if skipped"""
+        key = (endpoint, model, hashlib.sha1(video_context.encode('utf-8')).hexdigest())
+        with self._lock:
+            previous = self._active.pop(owner, None)
+            if previous:
+                previous.set()
+            warmed_at = self._warmed.get(key)
+            if warmed_at is not None and time.monotonic() - warmed_at < self.ttl:
+                return False
+            cancel = threading.Event()
+            self._active[owner] = cancel
+
+        def run():
+            if cancel.wait(self.delay):
+                return
+            if warm_prefix(video_context, endpoint, model, cancelled=cancel.is_set):
+                with self._lock:
+                    self._warmed[key] = time.monotonic()
+            with self._lock:
+                if self._active.get(owner) is cancel:
+                    del self._active[owner]
+
+        threading.Thread(target=run, name="kv-warmup", daemon=True).start()
+        return True
+
+    def cancel(self, owner: str):
+        with self._lock:
+            cancel = self._active.pop(owner, None)
+        if cancel:
+            cancel.set()
+
+    def is_active(self, owner: str) -> bool:
+        with self._lock:
+            return owner in self._active
+
+
+_warmer: Optional[PrefixWarmer] = None
+_warmer_lock = threading.Lock()
+
+
+def get_warmer() -> PrefixWarmer:
+    """Process-wide warmer shared by all sessions"""
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = PrefixWarmer()
+        return _warmer